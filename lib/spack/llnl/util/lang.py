@@ -11,6 +11,7 @@
 import functools
 import inspect
 from datetime import datetime, timedelta
+from ordereddict_backport import OrderedDict
 from six import string_types
 import sys
 
@@ -211,6 +212,38 @@ def _memoized_function(*args):
     return _memoized_function
 
 
+class LRUCache(object):
+    """Mapping with a maximum number of entries.
+
+    When the cache is full, adding an entry evicts the one that was least
+    recently read or written.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __getitem__(self, key):
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+
 def list_modules(directory, **kwargs):
     """Lists all of the modules, excluding ``__init__.py``, in a
        particular directory.  Listed packages have no particular
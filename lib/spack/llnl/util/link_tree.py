@@ -11,7 +11,7 @@
 import shutil
 import filecmp
 
-from llnl.util.filesystem import traverse_tree, mkdirp, touch
+from llnl.util.filesystem import mkdirp, touch
 import llnl.util.tty as tty
 
 __all__ = ['LinkTree']
@@ -44,6 +44,67 @@ def __init__(self, source_root):
             raise IOError("No such file or directory: '%s'", source_root)
 
         self._root = source_root
+        self._entries = None
+
+    def scan(self):
+        """Walk the source tree, unless it was walked already.
+
+        The result is reused by all the other methods, so the source tree
+        is only read once per LinkTree object.
+
+        Returns:
+            (list): ``(relative path, is directory)`` pairs for the source
+                root and everything below it, in pre-order. Symbolic links
+                to directories are treated as files.
+        """
+        if self._entries is None:
+            entries = []
+            self._walk('', entries)
+            self._entries = entries
+        return self._entries
+
+    def _walk(self, rel_path, entries):
+        entries.append((rel_path, True))
+        source_path = os.path.join(self._root, rel_path)
+        for f in os.listdir(source_path):
+            source_child = os.path.join(source_path, f)
+            rel_child = os.path.join(rel_path, f)
+            if (os.path.isdir(source_child) and
+                    not os.path.islink(source_child)):
+                self._walk(rel_child, entries)
+            else:
+                entries.append((rel_child, False))
+
+    def _traverse(self, dest_root, ignore, follow_nonexisting=True,
+                  exists=os.path.exists):
+        """Like ``traverse_tree``, but on the result of ``scan()``.
+
+        Yields ``(source, dest, is directory)`` tuples in pre-order.
+        """
+        ignore = ignore or (lambda x: False)
+        skip = None
+        for rel_path, is_dir in self.scan():
+            # Entries below a skipped directory come right after it
+            if skip is not None:
+                if rel_path.startswith(skip):
+                    continue
+                skip = None
+
+            src = os.path.join(self._root, rel_path)
+            dest = os.path.join(dest_root, rel_path)
+            if is_dir:
+                # Don't descend into ignored directories, nor into ones
+                # that do not exist in dest when follow_nonexisting is unset
+                if ignore(rel_path) or (
+                        rel_path and not follow_nonexisting and
+                        not exists(dest)):
+                    if not rel_path:
+                        return
+                    skip = os.path.join(rel_path, '')
+                    continue
+            elif ignore(rel_path):
+                continue
+            yield src, dest, is_dir
 
     def find_conflict(self, dest_root, ignore=None,
                       ignore_file_conflicts=False):
@@ -60,28 +121,41 @@ def find_conflict(self, dest_root, ignore=None,
         if conflicts:
             return conflicts[0]
 
-    def find_dir_conflicts(self, dest_root, ignore):
+    def find_dir_conflicts(self, dest_root, ignore,
+                           exists=os.path.exists, isdir=os.path.isdir):
+        """Find files in dest that block directories from src, and
+        directories in dest that block files from src.
+
+        The ``exists`` and ``isdir`` predicates are used to query dest,
+        so that callers who know its contents can avoid probing it.
+        """
         conflicts = []
-        kwargs = {'follow_nonexisting': False, 'ignore': ignore}
-        for src, dest in traverse_tree(self._root, dest_root, **kwargs):
-            if os.path.isdir(src):
-                if os.path.exists(dest) and not os.path.isdir(dest):
+        for src, dest, is_dir in self._traverse(
+                dest_root, ignore, follow_nonexisting=False, exists=exists):
+            if is_dir:
+                if exists(dest) and not isdir(dest):
                     conflicts.append("File blocks directory: %s" % dest)
-            elif os.path.exists(dest) and os.path.isdir(dest):
+            elif exists(dest) and isdir(dest):
                 conflicts.append("Directory blocks directory: %s" % dest)
         return conflicts
 
     def get_file_map(self, dest_root, ignore):
         merge_map = {}
-        kwargs = {'follow_nonexisting': True, 'ignore': ignore}
-        for src, dest in traverse_tree(self._root, dest_root, **kwargs):
-            if not os.path.isdir(src):
+        for src, dest, is_dir in self._traverse(dest_root, ignore):
+            if not is_dir:
                 merge_map[src] = dest
         return merge_map
 
     def merge_directories(self, dest_root, ignore):
-        for src, dest in traverse_tree(self._root, dest_root, ignore=ignore):
-            if os.path.isdir(src):
+        """Create the directories of src in dest.
+
+        Returns:
+            (list): all the directories of src in dest
+        """
+        directories = []
+        for src, dest, is_dir in self._traverse(dest_root, ignore):
+            if is_dir:
+                directories.append(dest)
                 if not os.path.exists(dest):
                     mkdirp(dest)
                     continue
@@ -93,24 +167,35 @@ def merge_directories(self, dest_root, ignore):
                 if not os.listdir(dest):
                     marker = os.path.join(dest, empty_file_name)
                     touch(marker)
+        return directories
 
     def unmerge_directories(self, dest_root, ignore):
-        for src, dest in traverse_tree(
-                self._root, dest_root, ignore=ignore, order='post'):
-            if os.path.isdir(src):
-                if not os.path.exists(dest):
-                    continue
-                elif not os.path.isdir(dest):
-                    raise ValueError("File blocks directory: %s" % dest)
+        """Remove the directories of src from dest, if they are empty.
 
-                # remove directory if it is empty.
-                if not os.listdir(dest):
-                    shutil.rmtree(dest, ignore_errors=True)
-
-                # remove empty dir marker if present.
-                marker = os.path.join(dest, empty_file_name)
-                if os.path.exists(marker):
-                    os.remove(marker)
+        Returns:
+            (list): the directories that were removed
+        """
+        removed = []
+
+        # Reversed pre-order visits directories after their contents
+        directories = [(src, dest) for src, dest, is_dir
+                       in self._traverse(dest_root, ignore) if is_dir]
+        for src, dest in reversed(directories):
+            if not os.path.exists(dest):
+                continue
+            elif not os.path.isdir(dest):
+                raise ValueError("File blocks directory: %s" % dest)
+
+            # remove directory if it is empty.
+            if not os.listdir(dest):
+                shutil.rmtree(dest, ignore_errors=True)
+                removed.append(dest)
+
+            # remove empty dir marker if present.
+            marker = os.path.join(dest, empty_file_name)
+            if os.path.exists(marker):
+                os.remove(marker)
+        return removed
 
     def merge(self, dest_root, ignore_conflicts=False, ignore=None,
               link=os.symlink, relative=False):
@@ -41,6 +41,7 @@
 import traceback
 import types
 from six import StringIO
+from six.moves import shlex_quote as cmd_quote
 
 import llnl.util.tty as tty
 from llnl.util.tty.color import cescape, colorize
@@ -95,6 +96,7 @@
 SPACK_DEBUG_LOG_DIR = 'SPACK_DEBUG_LOG_DIR'
 SPACK_CCACHE_BINARY = 'SPACK_CCACHE_BINARY'
 SPACK_SYSTEM_DIRS = 'SPACK_SYSTEM_DIRS'
+SPACK_WRAPPER_CACHE = 'SPACK_WRAPPER_CACHE'
 
 
 # Platform-specific library suffix.
@@ -869,6 +871,77 @@ def setup_package(pkg, dirty, context='build'):
     env.apply_modifications()
 
 
+def _split_wrapper_path(value):
+    """Split a colon separated variable the way ``cc`` does."""
+    # ``IFS=':' read -ra`` drops a single trailing empty field
+    dirs = value.split(':')
+    if dirs[-1] == '':
+        dirs.pop()
+    return dirs
+
+
+def write_wrapper_cache(path):
+    """Write the arguments the compiler wrappers derive from Spack's
+    variables in the current environment to a file sourced by ``cc``.
+
+    These arguments are the same for every compiler invocation of a build,
+    so computing them once here saves splitting, filtering and looping
+    over the dependency directories in the shell each time ``cc`` runs.
+    The wrapper checks that the variables the cache was computed from are
+    unchanged, and computes the arguments itself otherwise.
+
+    Args:
+        path (str): file to write the cache to; ``SPACK_WRAPPER_CACHE``
+            is set to it in the current environment
+    """
+    def get(name):
+        return os.environ.get(name, '')
+
+    spack_env_dirs = _split_wrapper_path(get(SPACK_ENV_PATH)) + ['', '.']
+    filtered_path = [d for d in _split_wrapper_path(get('PATH'))
+                     if d not in spack_env_dirs]
+
+    include_dirs = _split_wrapper_path(get(SPACK_INCLUDE_DIRS))
+    link_dirs = _split_wrapper_path(get(SPACK_LINK_DIRS))
+    rpath_dirs = _split_wrapper_path(get(SPACK_RPATH_DIRS))
+    extra_rpaths = _split_wrapper_path(get('SPACK_COMPILER_EXTRA_RPATHS'))
+    implicit_rpaths = _split_wrapper_path(
+        get('SPACK_COMPILER_IMPLICIT_RPATHS'))
+    spack_rpath_dirs = rpath_dirs + extra_rpaths + implicit_rpaths
+
+    def variable(name, value):
+        return '{0}={1}\n'.format(name, cmd_quote(value))
+
+    def array(name, values):
+        return '{0}=({1})\n'.format(
+            name, ' '.join(cmd_quote(v) for v in values))
+
+    with open(path, 'w') as f:
+        f.write('# Generated by Spack, sourced by the compiler wrappers\n')
+        # Inputs the cache was computed from
+        f.write(variable('cached_path', get('PATH')))
+        f.write(variable('cached_env_path', get(SPACK_ENV_PATH)))
+        f.write(variable('cached_include_dirs', get(SPACK_INCLUDE_DIRS)))
+        f.write(variable('cached_link_dirs', get(SPACK_LINK_DIRS)))
+        f.write(variable('cached_rpath_dirs', get(SPACK_RPATH_DIRS)))
+        f.write(variable(
+            'cached_extra_rpaths', get('SPACK_COMPILER_EXTRA_RPATHS')))
+        f.write(variable(
+            'cached_implicit_rpaths', get('SPACK_COMPILER_IMPLICIT_RPATHS')))
+
+        # Precomputed values
+        f.write(variable('cached_filtered_path', ':'.join(filtered_path)))
+        f.write(array('spack_include_dirs', include_dirs))
+        f.write(array('spack_isystem_args', [
+            arg for d in include_dirs for arg in ('-isystem', d)]))
+        f.write(array('spack_link_dirs', link_dirs + extra_rpaths))
+        f.write(array('spack_rpath_dirs', spack_rpath_dirs))
+        f.write(array('spack_ld_rpath_args', [
+            arg for d in spack_rpath_dirs for arg in ('-rpath', d)]))
+
+    os.environ[SPACK_WRAPPER_CACHE] = path
+
+
 def modifications_from_dependencies(spec, context):
     """Returns the environment modifications that are required by
     the dependencies of a spec and also applies modifications
@@ -332,7 +332,7 @@ def view_file_conflicts(self, view, merge_map):
            __init__.py files for packages in the same namespace.
         """
         conflicts = list(dst for src, dst in merge_map.items()
-                         if os.path.exists(dst))
+                         if view.exists(dst))
 
         if conflicts and self.py_namespace:
             ext_map = view.extensions_layout.extension_map(self.extendee_spec)
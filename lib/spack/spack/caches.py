@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 """Caches used by Spack to store data"""
+import errno
 import os
 
 import llnl.util.lang
@@ -52,6 +53,15 @@ def fetch_cache_location():
     return path
 
 
+def git_cache_location():
+    """Bare repositories shared by git fetches of the same remote.
+
+    These live in the source cache, so that they are removed along with
+    the downloaded archives by ``spack clean --downloads``.
+    """
+    return os.path.join(fetch_cache_location(), '_git')
+
+
 def _fetch_cache():
     path = fetch_cache_location()
     return spack.fetch_strategy.FsCache(path)
@@ -69,7 +79,19 @@ def store(self, fetcher, relative_dest):
         # normally be cached (e.g. the current tip of an hg/git branch)
         dst = os.path.join(self.root, relative_dest)
         mkdirp(os.path.dirname(dst))
-        fetcher.archive(dst)
+
+        # Archive to a temporary file in the same directory and move it in
+        # place, so that concurrent writers and interrupted runs never leave
+        # a partial archive in the mirror. The temporary file keeps the
+        # extension, which some fetchers use to pick the archive format.
+        tmp = os.path.join(os.path.dirname(dst), '.{0}.{1}'.format(
+            os.getpid(), os.path.basename(dst)))
+        try:
+            fetcher.archive(tmp)
+            os.rename(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
     def symlink(self, mirror_ref):
         """Symlink a human readible path in our mirror to the actual
@@ -88,7 +110,12 @@ def symlink(self, mirror_ref):
                 # to https://github.com/spack/spack/pull/13908)
                 os.unlink(cosmetic_path)
             mkdirp(os.path.dirname(cosmetic_path))
-            os.symlink(relative_dst, cosmetic_path)
+            try:
+                os.symlink(relative_dst, cosmetic_path)
+            except OSError as e:
+                # Another process may have created the link concurrently
+                if e.errno != errno.EEXIST:
+                    raise
 
 
 #: Spack's local cache for downloaded source archives
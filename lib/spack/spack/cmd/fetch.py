@@ -3,12 +3,16 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+from __future__ import division, print_function
+
 import llnl.util.tty as tty
 
 import spack.cmd
 import spack.cmd.common.arguments as arguments
 import spack.config
 import spack.environment as ev
+import spack.fetch_stats
+import spack.installer
 import spack.repo
 
 description = "fetch archives for packages"
@@ -17,7 +21,8 @@
 
 
 def setup_parser(subparser):
-    arguments.add_common_arguments(subparser, ['no_checksum', 'deprecated'])
+    arguments.add_common_arguments(
+        subparser, ['no_checksum', 'deprecated', 'jobs'])
     subparser.add_argument(
         "-m",
         "--missing",
@@ -30,6 +35,12 @@ def setup_parser(subparser):
         action="store_true",
         help="also fetch all dependencies",
     )
+    subparser.add_argument(
+        "--stats",
+        action="store_true",
+        help="summarize the fetches recorded with config:fetch_stats "
+        "instead of fetching",
+    )
     arguments.add_common_arguments(subparser, ["specs"])
     subparser.epilog = (
         "With an active environment, the specs "
@@ -38,7 +49,56 @@ def setup_parser(subparser):
     )
 
 
+#: number of packages shown in the summary of fetch statistics
+stats_top_packages = 10
+
+
+def _format_totals(key, totals):
+    duration = totals['duration']
+    throughput = totals['bytes'] / duration / 2 ** 20 if duration else 0.0
+    return '{0:<40} {1:>7} {2:>8} {3:>10.1f} {4:>9.1f} {5:>10.2f}'.format(
+        key, totals['fetches'], totals['failures'],
+        totals['bytes'] / 2 ** 20, duration, throughput)
+
+
+def _print_totals(title, totals, limit=None):
+    keys = sorted(totals, key=lambda k: totals[k]['duration'], reverse=True)
+    print()
+    print('{0:<40} {1:>7} {2:>8} {3:>10} {4:>9} {5:>10}'.format(
+        title, 'fetches', 'failures', 'MB', 'seconds', 'MB/s'))
+    for key in keys[:limit]:
+        print(_format_totals(key, totals[key]))
+
+
+def print_stats():
+    """Summarize the fetches of the recorded sessions."""
+    entries = spack.fetch_stats.read()
+    if not entries:
+        tty.msg('No fetch statistics recorded in {0}'.format(
+            spack.fetch_stats.stats_dir()))
+        if not spack.config.get('config:fetch_stats', False):
+            tty.msg('Enable config:fetch_stats to record them')
+        return
+
+    summary = spack.fetch_stats.summarize(entries)
+    successes = sum(1 for e in entries if e['success'])
+    hits = sum(1 for e in entries if e['success'] and e['source'] == 'cache')
+    tty.msg('{0} fetches recorded in {1}'.format(
+        len(entries), spack.fetch_stats.stats_dir()))
+    if successes:
+        print('Source cache hit rate: {0:.1f}%'.format(
+            100.0 * hits / successes))
+
+    _print_totals('source', summary['source'])
+    _print_totals('host (source)', summary['host'])
+    _print_totals('package', summary['package'], limit=stats_top_packages)
+
+
 def fetch(parser, args):
+    if args.stats:
+        print_stats()
+        return
+
     if args.specs:
         specs = spack.cmd.parse_specs(args.specs, concretize=True)
     else:
@@ -67,6 +127,9 @@ def fetch(parser, args):
     if args.deprecated:
         spack.config.set('config:deprecated', True, scope='command_line')
 
+    spack.fetch_stats.start_session()
+
+    packages = []
     for spec in specs:
         if args.missing or args.dependencies:
             for s in spec.traverse():
@@ -80,7 +143,18 @@ def fetch(parser, args):
                 if package.spec.external:
                     continue
 
-                package.do_fetch()
+                packages.append(package)
+
+        packages.append(spack.repo.get(spec))
+
+    if not args.jobs or args.jobs == 1:
+        for package in packages:
+            package.do_fetch()
+        return
 
-        package = spack.repo.get(spec)
-        package.do_fetch()
+    errors = spack.installer.fetch_packages(packages, args.jobs)
+    for package, error in errors:
+        tty.error('Failed to fetch {0}'.format(
+            package.spec.cformat('{name}{@version}{/hash:7}')), error)
+    if errors:
+        tty.die('{0} packages could not be fetched'.format(len(errors)))
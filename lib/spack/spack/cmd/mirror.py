@@ -65,7 +65,12 @@ def setup_parser(subparser):
         '-n', '--versions-per-spec',
         help="the number of versions to fetch for each spec, choose 'all' to"
              " retrieve all versions of each package")
-    arguments.add_common_arguments(create_parser, ['specs'])
+    create_parser.add_argument(
+        '--max-per-host', type=int,
+        default=spack.mirror.default_max_per_host,
+        help="maximum number of packages fetched concurrently from the same"
+             " host when running in parallel (default: %(default)s)")
+    arguments.add_common_arguments(create_parser, ['jobs', 'specs'])
 
     # Destroy
     destroy_parser = sp.add_parser('destroy', help=mirror_destroy.__doc__)
@@ -319,7 +324,8 @@ def mirror_create(args):
 
     # Actually do the work to create the mirror
     present, mirrored, error = spack.mirror.create(
-        directory, mirror_specs, args.skip_unstable_versions)
+        directory, mirror_specs, args.skip_unstable_versions,
+        jobs=args.jobs or 1, max_per_host=args.max_per_host)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -12,6 +12,7 @@
 
 from llnl.util import filesystem, tty
 
+import spack.build_environment
 import spack.cmd
 import spack.config
 import spack.modules
@@ -45,7 +46,7 @@ def setup_parser(subparser):
         action='store_true'
     )
     arguments.add_common_arguments(
-        refresh_parser, ['constraint', 'yes_to_all']
+        refresh_parser, ['constraint', 'yes_to_all', 'jobs']
     )
 
     find_parser = sp.add_parser('find', help='find module files for packages')
@@ -329,14 +330,15 @@ def refresh(module_type, specs, args):
     # Dump module index after potentially removing module tree
     spack.modules.common.generate_module_index(
         module_type_root, writers, overwrite=args.delete_tree)
-    for x in writers:
-        try:
-            x.write(overwrite=True)
-        except Exception as e:
-            tty.debug(e)
-            msg = 'Could not write module file [{0}]'
-            tty.warn(msg.format(x.layout.filename))
-            tty.warn('\t--> {0} <--'.format(str(e)))
+    jobs = spack.build_environment.determine_number_of_jobs(parallel=True)
+    written, errors = spack.modules.common.write_modules(writers, jobs=jobs)
+    for x, e in errors:
+        msg = 'Could not write module file [{0}]'
+        tty.warn(msg.format(x.layout.filename))
+        tty.warn('\t--> {0} <--'.format(e))
+
+    tty.debug('{0} module files written, {1} up to date'.format(
+        written, len(writers) - written - len(errors)))
 
 
 #: Dictionary populated with the list of sub-commands.
@@ -0,0 +1,84 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+from __future__ import print_function
+
+import datetime
+import socket
+
+import llnl.util.tty as tty
+
+import spack.environment as ev
+import spack.server
+
+description = "manage the command server used by shell integration"
+section = "admin"
+level = "long"
+
+
+def setup_parser(subparser):
+    sp = subparser.add_subparsers(
+        metavar='SUBCOMMAND', dest='server_command')
+
+    start_parser = sp.add_parser('start', help=server_start.__doc__)
+    start_parser.add_argument(
+        '-f', '--foreground', action='store_true',
+        help="do not detach from the terminal")
+    start_parser.add_argument(
+        '--idle-timeout', type=int,
+        default=spack.server.default_idle_timeout,
+        help="seconds without requests before the server exits "
+        "(0 to never exit)")
+
+    sp.add_parser('stop', help=server_stop.__doc__)
+    sp.add_parser('status', help=server_status.__doc__)
+
+
+def server_start(args):
+    """start a command server for this spack instance"""
+    if ev.get_env(args, 'server start'):
+        tty.die("cannot start the server inside an active environment.",
+                "Use `spack -E server start` instead.")
+
+    server = spack.server.Server(idle_timeout=args.idle_timeout or None)
+    if not args.foreground:
+        tty.msg("Starting spack server on {0}".format(server.path))
+        if not spack.server.daemonize():
+            return
+    server.serve_forever()
+
+
+def server_stop(args):
+    """stop the running command server"""
+    try:
+        response = spack.server.request({'command': 'stop'})
+    except (socket.error, OSError, ValueError):
+        tty.die("no spack server is running")
+    tty.msg("Stopped spack server [pid {0}]".format(response['pid']))
+
+
+def server_status(args):
+    """show whether a command server is running"""
+    path = spack.server.socket_path()
+    try:
+        response = spack.server.request({'command': 'ping'})
+    except (socket.error, OSError, ValueError):
+        tty.msg("No spack server is running on {0}".format(path))
+        return 1
+
+    started = datetime.datetime.fromtimestamp(response['started'])
+    tty.msg("Spack server running on {0}".format(path),
+            "pid:      {0}".format(response['pid']),
+            "started:  {0}".format(started.strftime('%Y-%m-%d %H:%M:%S')),
+            "requests: {0}".format(response['handled']))
+
+
+def server(parser, args):
+    action = {
+        'start': server_start,
+        'stop': server_stop,
+        'status': server_status,
+    }
+    return action[args.server_command](args)
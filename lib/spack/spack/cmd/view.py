@@ -153,6 +153,10 @@ def setup_parser(sp):
             so = specs_opts.copy()
             so["nargs"] = "*"
             act.add_argument('specs', **so)
+            act.add_argument(
+                '--verify', action='store_true',
+                help="reconcile the record of which package owns each file "
+                "in the view with the files on disk")
 
         else:
             # without all option, spec is required
@@ -240,7 +244,16 @@ def view(parser, args):
                           with_dependents=not args.no_remove_dependents)
 
     elif args.action in actions_status:
-        view.print_status(*specs, with_dependencies=with_dependencies)
+        if args.verify:
+            added, removed, missing = view.verify_manifest()
+            tty.msg("Verified the manifest of the view at {0}".format(path),
+                    "{0} paths added, {1} paths removed".format(
+                        added, removed))
+            if missing:
+                tty.warn("{0} paths of the packages in the view are "
+                         "missing:".format(len(missing)), *missing)
+        else:
+            view.print_status(*specs, with_dependencies=with_dependencies)
 
     else:
         tty.error('Unknown action: "%s"' % args.action)
@@ -4,12 +4,15 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import contextlib
+import hashlib
+import json
 import os
 import platform
 import re
 import itertools
 import shutil
 import tempfile
+import threading
 from typing import Sequence, List  # novm
 
 import llnl.util.lang
@@ -17,6 +20,7 @@
     path_contains_subdirectory, paths_containing_libs)
 import llnl.util.tty as tty
 
+import spack.caches
 import spack.error
 import spack.spec
 import spack.version
@@ -25,10 +29,118 @@
 import spack.util.module_cmd
 import spack.compilers
 from spack.util.environment import filter_system_paths
+from spack.util.file_cache import CacheError
 
 __all__ = ['Compiler']
 
 
+class CompilerProbeCache(object):
+    """Persistent cache for the output of commands run to probe compilers.
+
+    Detecting compilers and querying them during builds (for their real
+    version, or their implicit link directories) runs the same executables
+    over and over, in every Spack process. The outputs are stored in the
+    ``misc_cache``, where all Spack processes can read them, keyed by the
+    probe and by the path, inode, modification time and size of the
+    executables involved. Replacing an executable thus invalidates its
+    entries, which are pruned the next time the cache is written.
+    """
+
+    def __init__(self, cache_key='compilers/probes.json'):
+        self.cache_key = cache_key
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        if not path or not os.path.isabs(path):
+            return None
+        try:
+            sinfo = os.stat(path)
+        except OSError:
+            return None
+        return [sinfo.st_ino, sinfo.st_mtime, sinfo.st_size]
+
+    @staticmethod
+    def _key(paths, probe):
+        key = json.dumps([paths, probe], sort_keys=True)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _read(self):
+        cache = spack.caches.misc_cache
+        try:
+            if not cache.init_entry(self.cache_key):
+                return {}
+            with cache.read_transaction(self.cache_key) as f:
+                return json.load(f)['entries']
+        except (CacheError, IOError, OSError, ValueError, KeyError) as e:
+            tty.debug('Cannot read compiler probe cache: {0}'.format(e))
+            return {}
+
+    def _is_current(self, entry):
+        return entry['stamps'] == [self._stamp(p) for p in entry['paths']]
+
+    def get(self, paths, probe):
+        """Return the cached output of a probe, or None if there is none.
+
+        Args:
+            paths (list): paths of the executables the probe depends on
+            probe (list): JSON serializable description of the probe, e.g.
+                the arguments and environment the executables are run with
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entry = self._entries.get(self._key(paths, probe))
+            if entry and self._is_current(entry):
+                return entry['output']
+        return None
+
+    def set(self, paths, probe, output):
+        """Store the output of a probe, if all the paths can be stamped."""
+        stamps = [self._stamp(p) for p in paths]
+        if None in stamps:
+            return
+
+        entry = {'paths': paths, 'stamps': stamps, 'output': output}
+        cache = spack.caches.misc_cache
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            self._entries[self._key(paths, probe)] = entry
+
+            # Merge with entries written by other processes in the meantime
+            try:
+                cache.init_entry(self.cache_key)
+                with cache.write_transaction(self.cache_key) as (old, new):
+                    entries = {}
+                    if old:
+                        try:
+                            entries = json.load(old)['entries']
+                        except (ValueError, KeyError):
+                            pass
+                    entries.update(self._entries)
+                    self._entries = dict(
+                        (k, e) for k, e in entries.items()
+                        if self._is_current(e))
+                    json.dump({'entries': self._entries}, new)
+            except (CacheError, IOError, OSError) as e:
+                tty.debug('Cannot write compiler probe cache: {0}'.format(e))
+
+    def run(self, paths, probe, fn):
+        """Return the output of a probe, calling ``fn()`` to run it only
+        if it is not in the cache."""
+        output = self.get(paths, probe)
+        if output is None:
+            output = fn()
+            self.set(paths, probe, output)
+        return output
+
+
+#: Persistent cache for the output of compiler probes
+probe_cache = CompilerProbeCache()
+
+
 @llnl.util.lang.memoized
 def _get_compiler_version_output(compiler_path, version_arg, ignore_errors=()):
     """Invokes the compiler at a given path passing a single
@@ -38,10 +150,13 @@ def _get_compiler_version_output(compiler_path, version_arg, ignore_errors=()):
         compiler_path (path): path of the compiler to be invoked
         version_arg (str): the argument used to extract version information
     """
-    compiler = spack.util.executable.Executable(compiler_path)
-    output = compiler(
-        version_arg, output=str, error=str, ignore_errors=ignore_errors)
-    return output
+    def probe():
+        compiler = spack.util.executable.Executable(compiler_path)
+        return compiler(
+            version_arg, output=str, error=str, ignore_errors=ignore_errors)
+
+    return probe_cache.run(
+        [compiler_path], ['version', version_arg, list(ignore_errors)], probe)
 
 
 def get_compiler_version_output(compiler_path, *args, **kwargs):
@@ -408,11 +523,19 @@ def _get_compiler_link_paths(self, paths):
                 for flag in self.flags.get(flag_type, []):
                     compiler_exe.add_default_arg(flag)
 
-            output = ''
-            with self._compiler_environment():
-                output = str(compiler_exe(
-                    self.verbose_flag, fin, '-o', fout,
-                    output=str, error=str))  # str for py2
+            def probe():
+                with self._compiler_environment():
+                    return str(compiler_exe(
+                        self.verbose_flag, fin, '-o', fout,
+                        output=str, error=str))  # str for py2
+
+            # The output mentions the temporary directory, so it is not
+            # part of the probe and is replaced before parsing
+            output = probe_cache.run(
+                [first_compiler],
+                ['link-paths', compiler_exe.exe[1:], self.verbose_flag,
+                 self.modules, self.environment],
+                lambda: probe().replace(tmpdir, '<tmpdir>'))
             return _parse_non_system_link_dirs(output)
         except spack.util.executable.ProcessError as pe:
             tty.debug('ProcessError: Command exited with non-zero status: ' +
@@ -524,12 +647,20 @@ def get_real_version(self):
         Use the runtime environment of the compiler (modules and environment
         modifications) to enable the compiler to run properly on any platform.
         """
-        cc = spack.util.executable.Executable(self.cc)
-        with self._compiler_environment():
-            output = cc(self.version_argument,
-                        output=str, error=str,
-                        ignore_errors=tuple(self.ignore_version_errors))
-            return self.extract_version_from_output(output)
+        def probe():
+            cc = spack.util.executable.Executable(self.cc)
+            with self._compiler_environment():
+                return cc(self.version_argument,
+                          output=str, error=str,
+                          ignore_errors=tuple(self.ignore_version_errors))
+
+        output = probe_cache.run(
+            [self.cc],
+            ['real-version', self.version_argument,
+             list(self.ignore_version_errors), self.modules,
+             self.environment],
+            probe)
+        return self.extract_version_from_output(output)
 
     #
     # Compiler classes have methods for querying the version of
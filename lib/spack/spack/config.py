@@ -32,9 +32,12 @@
 import contextlib
 import copy
 import functools
+import hashlib
 import os
+import pickle
 import re
 import sys
+import tempfile
 from contextlib import contextmanager
 from six import iteritems
 from ordereddict_backport import OrderedDict
@@ -123,6 +126,11 @@
 #: Base name for the (internal) overrides scope.
 overrides_base_name = 'overrides-'
 
+#: Directory where validated snapshots of configuration files are kept.
+#: This is the default location of the ``misc_cache``; the configured one
+#: can't be used, as it is itself read from configuration files.
+snapshot_path = os.path.join(spack.paths.user_config_path, 'cache', 'config')
+
 
 def first_existing(dictionary, keys):
     """Get the value of the first key in keys that is in the dictionary."""
@@ -156,7 +164,7 @@ def get_section(self, section):
         if section not in self.sections:
             path   = self.get_section_filename(section)
             schema = section_schemas[section]
-            data   = read_config_file(path, schema)
+            data   = read_config_file(path, schema, use_snapshot=True)
             self.sections[section] = data
         return self.sections[section]
 
@@ -543,6 +551,12 @@ def update_config(self, section, update_data, scope=None, force=False):
         _validate_section_name(section)  # validate section name
         scope = self._validate_scope(scope)  # get ConfigScope object
 
+        # Snapshots don't store comments, so re-read the section from its
+        # file to preserve them
+        if type(scope) == ConfigScope and section in scope.sections:
+            scope.sections[section] = read_config_file(
+                scope.get_section_filename(section), section_schemas[section])
+
         # manually preserve comments
         need_comment_copy = (section in scope.sections and
                              scope.sections[section] is not None)
@@ -961,11 +975,67 @@ def validate(data, schema, filename=None):
     return test_data
 
 
-def read_config_file(filename, schema=None):
+@llnl.util.lang.memoized
+def _schema_stamp():
+    """Modification times of the modules defining configuration schemas."""
+    schema_dir = os.path.dirname(spack.schema.__file__)
+    return sorted(
+        (name, os.stat(os.path.join(schema_dir, name)).st_mtime)
+        for name in os.listdir(schema_dir) if name.endswith('.py'))
+
+
+def _snapshot_stamp(filename):
+    """Everything a validated snapshot of ``filename`` depends on."""
+    sinfo = os.stat(filename)
+    return [os.path.abspath(filename), sinfo.st_mtime, sinfo.st_size,
+            sinfo.st_ino, _schema_stamp()]
+
+
+def _snapshot_filename(filename):
+    key = '{0}:{1}'.format(
+        os.path.abspath(filename), '.'.join(str(v) for v in sys.version_info))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(snapshot_path, digest + '.pickle')
+
+
+def _read_snapshot(filename):
+    """Return validated data for a config file from its snapshot, if the
+    snapshot is up to date, or None otherwise."""
+    try:
+        with open(_snapshot_filename(filename), 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot['stamp'] == _snapshot_stamp(filename):
+            return snapshot['data']
+    except Exception as e:
+        tty.debug('Cannot use config snapshot for {0}: {1}'.format(
+            filename, str(e)))
+    return None
+
+
+def _write_snapshot(filename, data):
+    """Store validated data for a config file, ignoring failures."""
+    try:
+        snapshot = {'stamp': _snapshot_stamp(filename), 'data': data}
+        mkdirp(snapshot_path)
+        fd, tmp = tempfile.mkstemp(dir=snapshot_path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=2)
+        os.rename(tmp, _snapshot_filename(filename))
+    except Exception as e:
+        tty.debug('Cannot write config snapshot for {0}: {1}'.format(
+            filename, str(e)))
+
+
+def read_config_file(filename, schema=None, use_snapshot=False):
     """Read a YAML configuration file.
 
     User can provide a schema for validation. If no schema is provided,
-    we will infer the schema from the top-level key."""
+    we will infer the schema from the top-level key.
+
+    If ``use_snapshot`` is True, the parsed and validated data is also
+    stored in a fast binary format under ``snapshot_path``, and read back
+    from there while the file is unchanged. Data read from a snapshot
+    has no YAML comments attached to it."""
     # Dev: Inferring schema and allowing it to be provided directly allows us
     # to preserve flexibility in calling convention (don't need to provide
     # schema when it's not necessary) while allowing us to validate against a
@@ -982,6 +1052,11 @@ def read_config_file(filename, schema=None):
     elif not os.access(filename, os.R_OK):
         raise ConfigFileError("Config file is not readable: %s" % filename)
 
+    if use_snapshot:
+        data = _read_snapshot(filename)
+        if data is not None:
+            return data
+
     try:
         tty.debug("Reading config file %s" % filename)
         with open(filename) as f:
@@ -992,6 +1067,9 @@ def read_config_file(filename, schema=None):
                 key = next(iter(data))
                 schema = all_schemas[key]
             validate(data, schema)
+
+        if use_snapshot:
+            _write_snapshot(filename, data)
         return data
 
     except StopIteration:
@@ -1455,10 +1455,25 @@ def _query(
         # Abstract specs require more work -- currently we test
         # against everything.
         results = []
+        if hashes is not None:
+            hashes = set(hashes)
         start_date = start_date or datetime.datetime.min
         end_date = end_date or datetime.datetime.max
 
-        for key, rec in self._data.items():
+        matches = None
+        if query_spec is not any:
+            matches = spack.spec.SpecMatcher(query_spec, strict=True)
+
+        # Only records with the same name as a query for a real package can
+        # match it. Filtering them by name first avoids comparing with every
+        # record, which needs the package repository to tell whether names
+        # are virtual. If no record has the name, it may be a virtual one.
+        records = self._data.values()
+        name = matches and matches.spec.name
+        if name:
+            records = [r for r in records if r.spec.name == name] or records
+
+        for rec in records:
             if hashes is not None and rec.spec.dag_hash() not in hashes:
                 continue
 
@@ -1482,8 +1497,7 @@ def _query(
                 if not (start_date < inst_date < end_date):
                     continue
 
-            if (query_spec is any or
-                rec.spec.satisfies(query_spec, strict=True)):
+            if matches is None or matches(rec.spec):
                 results.append(rec.spec)
 
         return results
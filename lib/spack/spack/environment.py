@@ -453,6 +453,38 @@ def _eval_conditional(string):
     return eval(string, valid_variables)
 
 
+def _link_to_symlink(src, dest):
+    """Create dest as a hardlink to the symlink src, or as a new symlink
+    with the same target if hardlinks cannot be used."""
+    if sys.version_info >= (3, 3):
+        try:
+            os.link(src, dest, follow_symlinks=False)  # novm
+            return
+        except OSError:
+            pass
+    os.symlink(os.readlink(src), dest)
+
+
+def _clone_view_root(src, dest):
+    """Create the view root dest as a clone of the view root src.
+
+    Symlinks, i.e. almost all the entries of a view, are hardlinked, which
+    costs a single system call each. Regular files, i.e. view metadata and
+    merged files, can be modified in place by the next view operations, so
+    they are copied.
+    """
+    for root, dirs, files in os.walk(src):
+        dest_root = os.path.normpath(
+            os.path.join(dest, os.path.relpath(root, src)))
+        os.mkdir(dest_root)
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                _link_to_symlink(path, os.path.join(dest_root, name))
+            elif name in files:
+                shutil.copy2(path, os.path.join(dest_root, name))
+
+
 class ViewDescriptor(object):
     def __init__(self, base_path, root, projections={}, select=[], exclude=[],
                  link=default_view_link):
@@ -600,6 +632,65 @@ def specs_for_view(self, all_specs, roots):
                 specs_for_view.append(spec_copy)
         return specs_for_view
 
+    def _update_view(self, old_root, new_root, specs):
+        """Construct the view at new_root from a copy of the one at old_root.
+
+        Specs that are in the old view but not in ``specs`` are unlinked,
+        and the missing ones are linked. Cloning the old view still visits
+        every entry of the view, but costs one system call per symlink,
+        while linking a spec again also checks conflicts and reads and
+        writes view metadata.
+
+        Returns:
+            (bool): True if the view at new_root was constructed, False if
+                it has to be generated from scratch instead
+        """
+        if not old_root or not os.path.isdir(old_root):
+            return False
+        if os.path.exists(new_root):
+            return False
+
+        try:
+            old_view = YamlFilesystemView(
+                old_root, spack.store.layout, ignore_conflicts=True)
+            if old_view.projections != self.projections:
+                return False
+            old_specs = dict((s.dag_hash(), s)
+                             for s in old_view.get_all_specs())
+        except Exception as e:
+            tty.debug("Cannot read view at {0}: {1}".format(old_root, e))
+            return False
+
+        new_specs = dict((s.dag_hash(), s) for s in specs)
+        to_remove = [s for h, s in old_specs.items() if h not in new_specs]
+        to_add = [s for h, s in new_specs.items() if h not in old_specs]
+
+        # Specs replacing one with the same name are fine, but the view can
+        # only hold one spec per name, so other clashes need a full rebuild
+        names_to_keep = set(s.name for h, s in old_specs.items()
+                            if h in new_specs)
+        if any(s.name in names_to_keep for s in to_add):
+            return False
+
+        tty.debug("Updating view at {0}: unlinking {1} and linking {2} "
+                  "specs".format(self.root, len(to_remove), len(to_add)))
+        try:
+            _clone_view_root(old_root, new_root)
+            view = self.view(new=new_root)
+            if to_remove:
+                view.remove_specs(*to_remove, with_dependents=False,
+                                  all_specs=set(old_specs.values()))
+            if to_add:
+                view.add_specs(*to_add, with_dependencies=False)
+        except Exception as e:
+            # e.g. packages whose repository was removed cannot be unlinked
+            tty.debug("Cannot update view at {0} incrementally: {1}".format(
+                self.root, e))
+            shutil.rmtree(new_root, ignore_errors=True)
+            return False
+
+        return True
+
     def regenerate(self, all_specs, roots):
         specs_for_view = self.specs_for_view(all_specs, roots)
 
@@ -611,7 +702,7 @@ def regenerate(self, all_specs, roots):
 
             # To ensure there are no conflicts with packages being installed
             # that cannot be resolved or have repos that have been removed
-            # we always regenerate the view from scratch.
+            # we never modify the current view in place.
             # We will do this by hashing the view contents and putting the view
             # in a directory by hash, and then having a symlink to the real
             # view in the root. The real root for a view at /dirname/basename
@@ -630,10 +721,14 @@ def regenerate(self, all_specs, roots):
             # construct view at new_root
             tty.msg("Updating view at {0}".format(self.root))
 
-            view = self.view(new=new_root)
-            fs.mkdirp(new_root)
-            view.add_specs(*installed_specs_for_view,
-                           with_dependencies=False)
+            # Start from a copy of the current view if possible, so only the
+            # specs that changed need to be linked or unlinked
+            if not self._update_view(
+                    old_root, new_root, installed_specs_for_view):
+                view = self.view(new=new_root)
+                fs.mkdirp(new_root)
+                view.add_specs(*installed_specs_for_view,
+                               with_dependencies=False)
 
             # create symlink from tmpname to new_root
             root_dirname = os.path.dirname(self.root)
@@ -1687,12 +1782,13 @@ def matching_spec(self, spec):
         # Root specs will be keyed by concrete spec, value abstract
         # Dependency-only specs will have value None
         matches = {}
+        matches_spec = spack.spec.SpecMatcher(spec)
 
         for user_spec, concretized_user_spec in self.concretized_specs():
-            if concretized_user_spec.satisfies(spec):
+            if matches_spec(concretized_user_spec):
                 matches[concretized_user_spec] = user_spec
             for dep_spec in concretized_user_spec.traverse(root=False):
-                if dep_spec.satisfies(spec):
+                if matches_spec(dep_spec):
                     # Don't overwrite the abstract spec if present
                     # If not present already, set to None
                     matches[dep_spec] = matches.get(dep_spec, None)
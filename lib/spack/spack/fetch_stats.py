@@ -0,0 +1,176 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Statistics about the fetches of sources.
+
+When ``config:fetch_stats`` is enabled, each attempt of a stage to fetch
+its sources from the source cache, a mirror or the upstream URL appends a
+JSON record to a file in the ``fetch-stats`` directory of the misc cache.
+There is one file per session, i.e. per top-level Spack command: processes
+fetching or building on behalf of that command inherit the file through
+the environment. ``spack fetch --stats`` summarizes the recorded sessions.
+"""
+import glob
+import json
+import os
+import re
+import time
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import mkdirp
+
+import spack.caches
+import spack.config
+import spack.util.url as url_util
+
+#: number of session files kept in the stats directory
+max_sessions = 50
+
+#: session files modified in the last day are never pruned, since the
+#: command that writes them may still be running
+min_prune_age = 24 * 60 * 60
+
+#: environment variable holding the file of the current session
+session_variable = 'SPACK_FETCH_STATS_FILE'
+
+
+def stats_dir():
+    """Directory of the session files."""
+    return os.path.join(spack.caches.misc_cache.root, 'fetch-stats')
+
+
+def _prune(keep):
+    sessions = []
+    for path in glob.glob(os.path.join(stats_dir(), '*.jsonl')):
+        try:
+            sessions.append((os.path.getmtime(path), path))
+        except OSError:
+            # pruned by another process
+            continue
+    sessions.sort()
+
+    cutoff = time.time() - min_prune_age
+    for mtime, path in sessions[:max(len(sessions) - keep, 0)]:
+        if mtime > cutoff:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+
+def session_file():
+    """File of the current session, which is started if necessary."""
+    path = os.environ.get(session_variable)
+    if not path:
+        name = '{0}-{1}.jsonl'.format(
+            time.strftime('%Y%m%d-%H%M%S'), os.getpid())
+        path = os.path.join(stats_dir(), name)
+        os.environ[session_variable] = path
+        if os.path.isdir(stats_dir()):
+            _prune(max_sessions - 1)
+    return path
+
+
+def start_session():
+    """Start a session if fetch statistics are enabled, so that the
+    processes forked from now on record their fetches in the same file."""
+    if spack.config.get('config:fetch_stats', False):
+        session_file()
+
+
+def record(stage_name, source, url, size, duration, previous_failures,
+           error=None):
+    """Append a fetch to the file of the current session.
+
+    Args:
+        stage_name (str): name of the stage being fetched
+        source (str): where the sources came from: 'cache', 'mirror' or
+            'url'
+        url (str): URL of the sources
+        size (int): bytes fetched, or 0 if the fetch failed
+        duration (float): seconds spent fetching
+        previous_failures (int): failed fetches of this stage, from any
+            source, before this one
+        error (str or None): error message, if the fetch failed
+    """
+    if not spack.config.get('config:fetch_stats', False):
+        return
+
+    entry = {
+        'time': time.time(),
+        'stage': stage_name,
+        'source': source,
+        'url': url,
+        'bytes': size,
+        'duration': duration,
+        'throughput': size / duration if duration > 0 else None,
+        'previous_failures': previous_failures,
+        'success': error is None,
+        'error': error,
+    }
+    path = session_file()
+    try:
+        mkdirp(os.path.dirname(path))
+        # Records are small, so appends of concurrent processes do not
+        # interleave
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    except (IOError, OSError) as e:
+        tty.debug('Cannot record fetch statistics: {0}'.format(str(e)))
+
+
+def read(paths=None):
+    """Records of the given session files, or of all recorded sessions."""
+    if paths is None:
+        paths = sorted(glob.glob(os.path.join(stats_dir(), '*.jsonl')))
+
+    entries = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # e.g. the last line of an interrupted session
+                    continue
+    return entries
+
+
+def package_label(stage_name):
+    """Package of a stage name, without the stage prefix and the hash."""
+    label = re.sub(r'^spack-stage-', '', stage_name)
+    return re.sub(r'-[a-z0-9]{32}$', '', label)
+
+
+def host(url):
+    """Host part of a URL, or the scheme for local URLs."""
+    parsed = url_util.parse(url)
+    return parsed.netloc or parsed.scheme
+
+
+def summarize(entries):
+    """Aggregate fetch records.
+
+    Returns:
+        (dict): totals of fetches, failures, bytes and seconds for each
+            'source', 'host' and 'package'
+    """
+    summary = {'source': {}, 'host': {}, 'package': {}}
+    for entry in entries:
+        keys = {
+            'source': entry['source'],
+            'host': '{0} ({1})'.format(host(entry['url']), entry['source']),
+            'package': package_label(entry['stage']),
+        }
+        for kind, key in keys.items():
+            totals = summary[kind].setdefault(
+                key, {'fetches': 0, 'failures': 0, 'bytes': 0,
+                      'duration': 0.0})
+            totals['fetches'] += 1
+            totals['failures'] += 0 if entry['success'] else 1
+            totals['bytes'] += entry['bytes']
+            totals['duration'] += entry['duration']
+    return summary
@@ -24,11 +24,13 @@
 """
 import copy
 import functools
+import hashlib
 import os
 import os.path
 import re
 import shutil
 import sys
+import time
 from typing import Optional, List  # novm
 
 import llnl.util.tty as tty
@@ -37,6 +39,7 @@
 import spack.config
 import spack.error
 import spack.util.crypto as crypto
+import spack.util.lock as lk
 import spack.util.pattern as pattern
 import spack.util.url as url_util
 import spack.util.web as web_util
@@ -328,7 +331,21 @@ def fetch(self):
         if not self.archive_file:
             raise FailedDownloadError(url)
 
+    def _use_urllib(self):
+        """Whether to download in-process, on pooled connections, rather
+        than with curl."""
+        method = spack.config.get('config:url_fetch_method', 'curl')
+        # Cookies are only supported by curl
+        cookie = (self.extra_options or {}).get('cookie')
+        return method == 'urllib' and not cookie and \
+            bool(self.stage.save_filename)
+
     def _existing_url(self, url):
+        if self._use_urllib():
+            # A missing URL makes the download fail anyway, so skip the
+            # extra request
+            return True
+
         tty.debug('Checking existence of {0}'.format(url))
         curl = self.curl
         # Telling curl to fetch the first byte (-r 0-0) is supposed to be
@@ -340,6 +357,45 @@ def _existing_url(self, url):
         return curl.returncode == 0
 
     def _fetch_from_url(self, url):
+        if self._use_urllib():
+            return self._fetch_urllib(url)
+        return self._fetch_curl(url)
+
+    def _connect_timeout(self):
+        """Seconds to wait for the server, from ``config:connect_timeout``
+        and the ``timeout`` fetch option of the package, or 0 to wait
+        forever."""
+        connect_timeout = spack.config.get('config:connect_timeout', 10)
+        timeout = (self.extra_options or {}).get('timeout')
+        if timeout:
+            connect_timeout = max(connect_timeout, int(timeout))
+        return connect_timeout
+
+    def _fetch_urllib(self, url):
+        save_file = self.stage.save_filename
+        partial_file = save_file + '.part'
+        tty.msg('Fetching {0}'.format(url))
+
+        # Data received before an interruption is kept in the partial file,
+        # and the download continues from there next time. The checksum of
+        # the whole archive is verified once it is complete.
+        segments = spack.config.get('config:url_fetch_segments', 1)
+        timeout = self._connect_timeout() or None
+        try:
+            headers = web_util.download(url, partial_file, segments, timeout)
+        except (web_util.SpackWebError, EnvironmentError) as e:
+            raise FailedDownloadError(
+                url, "urllib failed to fetch with error {0}".format(e))
+
+        try:
+            content_type = web_util.get_header(headers, 'Content-type')
+        except KeyError:
+            content_type = ''
+        if 'text/html' in content_type:
+            warn_content_type_mismatch(self.archive_file or "the archive")
+        return partial_file, save_file
+
+    def _fetch_curl(self, url):
         save_file = None
         partial_file = None
         if self.stage.save_filename:
@@ -370,8 +426,6 @@ def _fetch_from_url(self, url):
         else:
             curl_args.append('-sS')  # show errors if fail
 
-        connect_timeout = spack.config.get('config:connect_timeout', 10)
-
         if self.extra_options:
             cookie = self.extra_options.get('cookie')
             if cookie:
@@ -379,10 +433,7 @@ def _fetch_from_url(self, url):
                 curl_args.append('-b')  # specify cookie
                 curl_args.append(cookie)
 
-            timeout = self.extra_options.get('timeout')
-            if timeout:
-                connect_timeout = max(connect_timeout, int(timeout))
-
+        connect_timeout = self._connect_timeout()
         if connect_timeout > 0:
             # Timeout if can't establish a connection after n sec.
             curl_args.extend(['--connect-timeout', str(connect_timeout)])
@@ -397,8 +448,7 @@ def _fetch_from_url(self, url):
             if self.archive_file:
                 os.remove(self.archive_file)
 
-            if partial_file and os.path.exists(partial_file):
-                os.remove(partial_file)
+            # Keep partial downloads: curl continues them next time
 
             if curl.returncode == 22:
                 # This is a 404.  Curl will print the error.
@@ -478,8 +528,13 @@ def expand(self):
         # Below we assume that the command to decompress expand the
         # archive in the current working directory
         mkdirp(tarball_container)
+        size = os.path.getsize(self.archive_file) / float(1 << 20)
+        start = time.time()
         with working_dir(tarball_container):
             decompress(self.archive_file)
+        elapsed = max(time.time() - start, 1e-3)
+        tty.debug('Expanded {0:.1f} MB in {1:.2f}s ({2:.1f} MB/s)'.format(
+            size, elapsed, size / elapsed))
 
         # Check for an exploding tarball, i.e. one that doesn't expand to
         # a single directory.  If the tarball *didn't* explode, move its
@@ -844,6 +899,31 @@ def fetch(self):
             return
 
         tty.debug('Cloning git repository: {0}'.format(self._repo_info()))
+        self._clone()
+
+        git = self.git
+        if self.submodules_delete:
+            with working_dir(self.stage.source_path):
+                for submodule_to_delete in self.submodules_delete:
+                    args = ['rm', submodule_to_delete]
+                    if not spack.config.get('config:debug'):
+                        args.insert(1, '--quiet')
+                    git(*args)
+
+        # Init submodules if the user asked for them.
+        if self.submodules:
+            with working_dir(self.stage.source_path):
+                self._init_submodules_from_cache()
+                args = ['submodule', 'update', '--init', '--recursive']
+                if not spack.config.get('config:debug'):
+                    args.insert(1, '--quiet')
+                git(*args)
+
+    def _clone(self):
+        """Clone the repository in the stage and check out the requested
+        revision, from the git cache if possible."""
+        if self._clone_from_cache():
+            return
 
         git = self.git
         if self.commit:
@@ -918,21 +998,179 @@ def fetch(self):
                     git(*pull_args, ignore_errors=1)
                     git(*co_args)
 
-        if self.submodules_delete:
-            with working_dir(self.stage.source_path):
-                for submodule_to_delete in self.submodules_delete:
-                    args = ['rm', submodule_to_delete]
-                    if not spack.config.get('config:debug'):
-                        args.insert(1, '--quiet')
-                    git(*args)
+    def _update_cache(self, url, commit=None, tag=None, branch=None,
+                      shallow=False):
+        """Fetch a revision of ``url`` into a bare repository in the git
+        cache.
 
-        # Init submodules if the user asked for them.
-        if self.submodules:
-            with working_dir(self.stage.source_path):
-                args = ['submodule', 'update', '--init', '--recursive']
-                if not spack.config.get('config:debug'):
-                    args.insert(1, '--quiet')
-                git(*args)
+        Commits and tags that are already in the cache are not fetched
+        again, while branches are always updated. A tag or a branch is
+        fetched alone, with only its last commit if ``shallow`` is True. A
+        commit needs the history of all the branches and tags, which is
+        also fetched when no revision is given. Concurrent fetches of the
+        same remote are serialized with a lock.
+
+        Returns:
+            (str or None): path to the bare repository, or None if the git
+                cache is disabled or could not be updated
+        """
+        import spack.caches
+
+        if not spack.config.get('config:git_cache', False):
+            return None
+
+        name = os.path.basename(url.rstrip('/'))
+        if name.endswith('.git'):
+            name = name[:-len('.git')]
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(spack.caches.git_cache_location(),
+                            '{0}-{1}.git'.format(name, digest))
+
+        git = self.git
+        quiet = [] if spack.config.get('config:debug') else ['--quiet']
+        lock = lk.Lock(path + '.lock')
+        try:
+            with lk.WriteTransaction(lock):
+                if not os.path.exists(os.path.join(path, 'HEAD')):
+                    mkdirp(path)
+                    with working_dir(path):
+                        git('init', '--bare', *quiet)
+                        git('remote', 'add', 'origin', url)
+                        # Stage checkouts borrow objects from this
+                        # repository, so never prune unreachable ones
+                        git('config', 'gc.pruneExpire', 'never')
+
+                with working_dir(path):
+                    if commit:
+                        git('cat-file', '-e', commit + '^{commit}',
+                            output=str, error=str, fail_on_error=False)
+                        found = git.returncode == 0
+                    elif tag:
+                        git('rev-parse', '--verify', '--quiet',
+                            'refs/tags/{0}^{{commit}}'.format(tag),
+                            output=str, error=str, fail_on_error=False)
+                        found = git.returncode == 0
+                    else:
+                        found = False
+
+                    if found:
+                        tty.debug('Found {0} in the git cache: {1}'.format(
+                            commit or tag, path))
+                    else:
+                        tty.debug('Updating git cache: {0}'.format(path))
+                        if branch:
+                            refspecs = ['+refs/heads/{0}:refs/heads/{0}'
+                                        .format(branch)]
+                        elif tag:
+                            refspecs = ['+refs/tags/{0}:refs/tags/{0}'
+                                        .format(tag)]
+                        else:
+                            refspecs = ['+refs/heads/*:refs/heads/*',
+                                        '+refs/tags/*:refs/tags/*']
+
+                        args = ['fetch'] + quiet
+                        if shallow and (branch or tag):
+                            args.extend(['--depth', '1'])
+                        elif os.path.exists('shallow'):
+                            # Shallow fetches of other revisions came first
+                            args.append('--unshallow')
+                        git(*(args + ['origin'] + refspecs))
+        except (spack.error.SpackError, lk.LockError) as e:
+            tty.debug('Cannot update the git cache for {0}: {1}'.format(
+                url, str(e)))
+            return None
+
+        return path
+
+    def _clone_from_cache(self):
+        """Check out the requested revision in the stage from a bare
+        repository in the git cache.
+
+        The clone is local, so git hardlinks the objects of the cache if
+        both are on the same filesystem and the cache is not shallow, and
+        copies them otherwise. The stage never refers to the cache, which
+        can be removed or repacked at any time.
+
+        Returns:
+            (bool): True if the stage was checked out, False if the caller
+                has to clone the remote repository instead
+        """
+        revision = self.commit or self.tag or self.branch
+        if not revision:
+            # The cache does not track the default branch of the remote
+            return False
+
+        shallow = (not self.get_full_repo and
+                   self.git_version >= ver('1.7.1') and
+                   self.protocol_supports_shallow_clone())
+        if self.commit:
+            cache = self._update_cache(self.url, commit=self.commit)
+        elif self.tag:
+            cache = self._update_cache(
+                self.url, tag=self.tag, shallow=shallow)
+        else:
+            cache = self._update_cache(
+                self.url, branch=self.branch, shallow=shallow)
+        if not cache:
+            return False
+
+        git = self.git
+        quiet = [] if spack.config.get('config:debug') else ['--quiet']
+        try:
+            with temp_cwd():
+                repo_name = os.path.basename(cache)
+                git('clone', '--no-checkout', *(quiet + [cache, repo_name]))
+                with working_dir(repo_name):
+                    git('remote', 'set-url', 'origin', self.url)
+                    git('checkout', *(quiet + [revision]))
+                self.stage.srcdir = repo_name
+                shutil.move(repo_name, self.stage.source_path)
+        except spack.error.SpackError as e:
+            # e.g. a commit that is not on any branch of the remote
+            tty.debug('Cannot check out {0} from the git cache: {1}'.format(
+                revision, str(e)))
+            return False
+
+        return True
+
+    def _init_submodules_from_cache(self):
+        """Initialize the top-level submodules of the stage from the git
+        cache. Submodules that are not initialized here, e.g. those with
+        URLs relative to the superproject, are cloned from their remotes
+        by ``git submodule update``.
+
+        Objects are copied from the cache (``--dissociate``), which needs
+        git 2.18 or later.
+        """
+        if not (spack.config.get('config:git_cache', False) and
+                os.path.isfile('.gitmodules') and
+                self.git_version >= ver('2.18')):
+            return
+
+        git = self.git
+        quiet = [] if spack.config.get('config:debug') else ['--quiet']
+        paths = git('config', '-f', '.gitmodules', '--get-regexp',
+                    r'^submodule\..*\.path$', output=str, error=str,
+                    fail_on_error=False)
+        for line in paths.splitlines():
+            key, _, path = line.partition(' ')
+            name = key[len('submodule.'):-len('.path')]
+            url = git('config', '-f', '.gitmodules', '--get',
+                      'submodule.{0}.url'.format(name),
+                      output=str, error=str, fail_on_error=False).strip()
+            if not url or url.startswith('./') or url.startswith('../'):
+                continue
+
+            # The commit the superproject records for the submodule
+            commit = git('rev-parse', 'HEAD:{0}'.format(path), output=str,
+                         error=str, fail_on_error=False).strip()
+            cache = self._update_cache(url, commit=commit or None)
+            if not cache:
+                continue
+
+            git('submodule', 'update', '--init', *(quiet + [
+                '--reference', cache, '--dissociate', '--', path]),
+                fail_on_error=False)
 
     def archive(self, destination):
         super(GitFetchStrategy, self).archive(destination, exclude='.git')
@@ -3,7 +3,11 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import contextlib
+import errno
 import functools as ft
+import json
+import multiprocessing.pool
 import os
 import re
 import shutil
@@ -41,6 +45,10 @@
 
 
 _projections_path = '.spack/projections.yaml'
+_manifest_path = '.spack/view_manifest.json'
+
+#: Threads used to read package prefixes and to create links in a view
+link_threads = 16
 
 
 def view_symlink(src, dst, **kwargs):
@@ -130,6 +138,9 @@ def __init__(self, root, layout, **kwargs):
         link_func = kwargs.get("link", view_symlink)
         self.link = ft.partial(link_func, view=self)
 
+        # Thread pool used to link files, while specs are being added
+        self._pool = None
+
     def add_specs(self, *specs, **kwargs):
         """
             Add given specs to view.
@@ -154,6 +165,39 @@ def add_extension(self, spec):
         """
         raise NotImplementedError
 
+    def exists(self, path):
+        """
+            Whether a file or directory exists at the given path in the view.
+        """
+        return os.path.exists(path)
+
+    def link_files(self, merge_map, spec=None):
+        """
+            Link files from a package into this view, skipping destinations
+            that already exist.
+
+            While specs are being added, symbolic and hard links are created
+            by a pool of threads, as this is bound by filesystem latency.
+            Copies, which may need to be relocated, are made one by one.
+        """
+        def link(item):
+            src, dst = item
+            if self.exists(dst):
+                return
+            try:
+                self.link(src, dst, spec=spec)
+            except OSError as e:
+                # A file that the view did not know about
+                if e.errno != errno.EEXIST:
+                    raise
+
+        if (self._pool is not None and
+                self.link.func in (view_symlink, view_hardlink)):
+            self._pool.map(link, merge_map.items(), 256)
+        else:
+            for item in merge_map.items():
+                link(item)
+
     def add_standalone(self, spec):
         """
             Add (link) a standalone package into this view.
@@ -268,6 +312,53 @@ def __init__(self, root, layout, **kwargs):
 
         self._croot = colorize_root(self._root) + " "
 
+        # Specs in the view and their manifests, while specs are removed
+        self._all_specs = None
+        self._manifests = {}
+
+        # Link trees for package prefixes, while specs are added
+        self._link_trees = {}
+
+        # Owners of the files in the view. Views created before the manifest
+        # existed have none until it is rebuilt with verify_manifest().
+        self.view_manifest = ViewManifest.read(self._root)
+        if self.view_manifest is None and self._is_empty():
+            self.view_manifest = ViewManifest(self._root)
+        self._batch_depth = 0
+        self._unmerging = None
+
+    def _is_empty(self):
+        """Whether the view contains nothing but its projections."""
+        if not os.path.isdir(self._root):
+            return True
+        contents = set(os.listdir(self._root))
+        if not contents <= set(['.spack']):
+            return False
+        dotspack = os.path.join(self._root, '.spack')
+        return not contents or set(os.listdir(dotspack)) <= set(
+            [os.path.basename(_projections_path)])
+
+    def exists(self, path):
+        if self.view_manifest is not None:
+            return self.view_manifest.exists(path)
+        return os.path.exists(path)
+
+    def _isdir(self, path):
+        if self.view_manifest is not None:
+            return self.view_manifest.isdir(path)
+        return os.path.isdir(path)
+
+    @contextlib.contextmanager
+    def _batch(self):
+        """Write the view manifest once, after a batch of changes."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self.view_manifest is not None:
+                self.view_manifest.write()
+
     def write_projections(self):
         if self.projections:
             mkdirp(os.path.dirname(self.projections_path))
@@ -305,9 +396,31 @@ def add_specs(self, *specs, **kwargs):
         standalones = specs - extensions
 
         set(map(self._check_no_ext_conflicts, extensions))
-        # fail on first error, otherwise link extensions as well
-        if all(map(self.add_standalone, standalones)):
-            all(map(self.add_extension, extensions))
+
+        self._pool = multiprocessing.pool.ThreadPool(link_threads)
+        try:
+            # Read the prefixes of all the packages at once
+            self._scan_prefixes(standalones)
+
+            # fail on first error, otherwise link extensions as well
+            with self._batch():
+                if all(map(self.add_standalone, standalones)):
+                    all(map(self.add_extension, extensions))
+        finally:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._link_trees.clear()
+
+    def _scan_prefixes(self, specs):
+        """Read the prefixes of packages to be merged, in parallel."""
+        for spec in specs:
+            if spec.external:
+                continue
+            view_source = spec.package.view_source()
+            if os.path.isdir(view_source):
+                self._link_trees[view_source] = LinkTree(view_source)
+        self._pool.map(LinkTree.scan, self._link_trees.values())
 
     def add_extension(self, spec):
         if not spec.package.is_extension:
@@ -373,14 +486,15 @@ def merge(self, spec, ignore=None):
         view_source = pkg.view_source()
         view_dst = pkg.view_destination(self)
 
-        tree = LinkTree(view_source)
+        tree = self._link_trees.get(view_source) or LinkTree(view_source)
 
         ignore = ignore or (lambda f: False)
         ignore_file = match_predicate(
             self.layout.hidden_file_paths, ignore)
 
         # check for dir conflicts
-        conflicts = tree.find_dir_conflicts(view_dst, ignore_file)
+        conflicts = tree.find_dir_conflicts(
+            view_dst, ignore_file, exists=self.exists, isdir=self._isdir)
 
         merge_map = tree.get_file_map(view_dst, ignore_file)
         if not self.ignore_conflicts:
@@ -389,10 +503,15 @@ def merge(self, spec, ignore=None):
         if conflicts:
             raise MergeConflictError(conflicts[0])
 
-        # merge directories with the tree
-        tree.merge_directories(view_dst, ignore_file)
+        with self._batch():
+            # merge directories with the tree
+            directories = tree.merge_directories(view_dst, ignore_file)
 
-        pkg.add_files_to_view(self, merge_map)
+            pkg.add_files_to_view(self, merge_map)
+
+            if self.view_manifest is not None:
+                self.view_manifest.add(
+                    spec, directories, merge_map.values())
 
     def unmerge(self, spec, ignore=None):
         pkg = spec.package
@@ -405,17 +524,79 @@ def unmerge(self, spec, ignore=None):
         ignore_file = match_predicate(
             self.layout.hidden_file_paths, ignore)
 
-        merge_map = tree.get_file_map(view_dst, ignore_file)
-        pkg.remove_files_from_view(self, merge_map)
+        with self._batch():
+            merge_map = tree.get_file_map(view_dst, ignore_file)
+            self._unmerging = spec
+            try:
+                pkg.remove_files_from_view(self, merge_map)
+            finally:
+                self._unmerging = None
+
+            # now unmerge the directory tree
+            removed = tree.unmerge_directories(view_dst, ignore_file)
+
+            # Packages may remove some of their files directly
+            if self.view_manifest is not None:
+                for dst in merge_map.values():
+                    self.view_manifest.remove_owner(spec, dst)
+                self.view_manifest.remove_directories(removed)
+
+    def verify_manifest(self):
+        """Rebuild the view manifest from the files present in the view.
 
-        # now unmerge the directory tree
-        tree.unmerge_directories(view_dst, ignore_file)
+        The view itself is not modified: paths of the specs in the view that
+        are missing from it are reported, not recreated.
+
+        Returns:
+            (tuple): number of paths added to and removed from the manifest,
+                and the sorted list of missing paths, relative to the view
+        """
+        manifest = ViewManifest(self._root)
+        missing = []
+        for spec in self.get_all_specs():
+            pkg = spec.package
+            view_source = pkg.view_source()
+            if not os.path.isdir(view_source):
+                continue
+            view_dst = pkg.view_destination(self)
+            ignore_file = match_predicate(self.layout.hidden_file_paths)
+
+            directories = []
+            for src, dst, is_dir in LinkTree(view_source)._traverse(
+                    view_dst, ignore_file):
+                if not os.path.lexists(dst):
+                    missing.append(dst)
+                elif is_dir:
+                    directories.append(dst)
+                else:
+                    # Files are owned first by the spec they are linked from
+                    linked = (os.path.islink(dst) and
+                              os.readlink(dst) == src)
+                    manifest.add_owner(spec, dst, first=linked)
+            manifest.add(spec, directories, [])
+
+        old = self.view_manifest or ViewManifest(self._root)
+        old_paths = set(old.files) | old.directories
+        new_paths = set(manifest.files) | manifest.directories
+
+        self.view_manifest = manifest
+        manifest.write()
+        missing = sorted(set(os.path.relpath(p, self._root) for p in missing))
+        return len(new_paths - old_paths), len(old_paths - new_paths), missing
 
     def remove_file(self, src, dest):
         if not os.path.lexists(dest):
             tty.warn("Tried to remove %s which does not exist" % dest)
             return
 
+        # Keep the file if another spec in the view provides it as well
+        manifest = self.view_manifest
+        if (manifest is not None and self._unmerging is not None and
+                manifest.owners(dest)):
+            if not manifest.remove_owner(self._unmerging, dest):
+                os.remove(dest)
+            return
+
         def needs_file(spec, file):
             # convert the file we want to remove to a source in this spec
             projection = self.get_projection_for_spec(spec)
@@ -424,15 +605,7 @@ def needs_file(spec, file):
 
             # check if this spec owns a file of that name (through the
             # manifest in the metadata dir, which we have in the view).
-            manifest_file = os.path.join(self.get_path_meta_folder(spec),
-                                         spack.store.layout.manifest_file_name)
-            try:
-                with open(manifest_file, 'r') as f:
-                    manifest = s_json.load(f)
-            except (OSError, IOError):
-                # if we can't load it, assume it doesn't know about the file.
-                manifest = {}
-            return test_path in manifest
+            return test_path in self._read_manifest(spec)
 
         # remove if dest is not owned by any other package in the view
         # This will only be false if two packages are merged into a prefix
@@ -441,10 +614,34 @@ def needs_file(spec, file):
         # check all specs for whether they own the file. That include the spec
         # we are currently removing, as we remove files before unlinking the
         # metadata directory.
-        if len([s for s in self.get_all_specs()
-                if needs_file(s, dest)]) <= 1:
+        all_specs = self._all_specs
+        if all_specs is None:
+            all_specs = self.get_all_specs()
+        if len([s for s in all_specs if needs_file(s, dest)]) <= 1:
             os.remove(dest)
 
+    def _read_manifest(self, spec):
+        """Read the install manifest of a spec linked in this view.
+
+        Manifests are cached while specs are being removed, as every removed
+        file is checked against the manifests of all specs in the view.
+        """
+        manifest_file = os.path.join(self.get_path_meta_folder(spec),
+                                     spack.store.layout.manifest_file_name)
+        if manifest_file in self._manifests:
+            return self._manifests[manifest_file]
+
+        try:
+            with open(manifest_file, 'r') as f:
+                manifest = s_json.load(f)
+        except (OSError, IOError):
+            # if we can't load it, assume it doesn't know about the file.
+            manifest = {}
+
+        if self._all_specs is not None:
+            self._manifests[manifest_file] = manifest
+        return manifest
+
     def check_added(self, spec):
         assert spec.concrete
         return spec == self.get_spec(spec)
@@ -501,14 +698,24 @@ def remove_specs(self, *specs, **kwargs):
         # Ensure that the sorted list contains all the packages
         assert set(to_deactivate_sorted) == to_deactivate
 
-        # Remove the packages from the view
-        for spec in to_deactivate_sorted:
-            if spec.package.is_extension:
-                self.remove_extension(spec, with_dependents=with_dependents)
-            else:
-                self.remove_standalone(spec)
-
-        self._purge_empty_directories()
+        # Remove the packages from the view. The specs in the view are known
+        # up front, so there is no need to search for them for every file.
+        self._all_specs = all_specs
+        try:
+            with self._batch():
+                for spec in to_deactivate_sorted:
+                    if spec.package.is_extension:
+                        self.remove_extension(
+                            spec, with_dependents=with_dependents)
+                    else:
+                        self.remove_standalone(spec)
+
+                self._purge_empty_directories()
+                if self.view_manifest is not None:
+                    self.view_manifest.prune_directories()
+        finally:
+            self._all_specs = None
+            self._manifests.clear()
 
     def remove_extension(self, spec, with_dependents=True):
         """
@@ -686,6 +893,8 @@ def unlink_meta_folder(self, spec):
         path = self.get_path_meta_folder(spec)
         assert os.path.exists(path)
         shutil.rmtree(path)
+        self._manifests.pop(
+            os.path.join(path, spack.store.layout.manifest_file_name), None)
 
     def _check_no_ext_conflicts(self, spec):
         """
@@ -701,6 +910,140 @@ def _check_no_ext_conflicts(self, spec):
                      'Skipping already activated package: %s' % spec.name)
 
 
+class ViewManifest(object):
+    """Record of the specs that own each path merged into a view.
+
+    For every file merged from a package prefix, the manifest lists the
+    DAG hashes of the specs providing it; the first one is the spec the
+    file is linked from. It also lists the directories created by merges.
+    This lets views check conflicts and ownership without probing the
+    filesystem for every file. Paths are relative to the view root, so the
+    manifest stays valid when a view is copied elsewhere.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.files = {}
+        self.directories = set()
+        self.changed = False
+        self._prefix = os.path.join(root, '')
+
+    @property
+    def path(self):
+        return os.path.join(self.root, _manifest_path)
+
+    @staticmethod
+    def read(root):
+        """Read the manifest of the view at root, or None if it has none."""
+        manifest = ViewManifest(root)
+        try:
+            with open(manifest.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        hashes = data['specs']
+        manifest.files = dict(
+            (str(path), [hashes[i] for i in owners])
+            for path, owners in data['files'].items())
+        manifest.directories = set(str(d) for d in data['directories'])
+        return manifest
+
+    def write(self):
+        """Write the manifest to the view, if it changed.
+
+        The manifest of a view without any merged path is removed, so that
+        an emptied view looks like a new one.
+        """
+        if not self.changed:
+            return
+
+        if not self.files and not self.directories:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+                try:
+                    os.rmdir(os.path.dirname(self.path))
+                except OSError:
+                    pass
+            self.changed = False
+            return
+
+        index = {}
+        files = {}
+        for path, owners in self.files.items():
+            files[path] = [index.setdefault(h, len(index)) for h in owners]
+        hashes = sorted(index, key=index.get)
+
+        mkdirp(os.path.dirname(self.path))
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'specs': hashes, 'files': files,
+                       'directories': sorted(self.directories)}, f)
+        os.rename(tmp, self.path)
+        self.changed = False
+
+    def _relative(self, path):
+        if path.startswith(self._prefix):
+            return path[len(self._prefix):].rstrip(os.sep)
+        rel = os.path.relpath(path, self.root)
+        return '' if rel == '.' else rel
+
+    def exists(self, path):
+        rel = self._relative(path)
+        return not rel or rel in self.files or rel in self.directories
+
+    def isdir(self, path):
+        rel = self._relative(path)
+        return not rel or rel in self.directories
+
+    def owners(self, path):
+        """DAG hashes of the specs providing a file."""
+        return self.files.get(self._relative(path), [])
+
+    def add(self, spec, directories, files):
+        """Record directories and files merged from a spec."""
+        self.directories.update(self._relative(d) for d in directories)
+        self.directories.discard('')
+        for path in files:
+            self.add_owner(spec, path)
+        self.changed = True
+
+    def add_owner(self, spec, path, first=False):
+        owners = self.files.setdefault(self._relative(path), [])
+        dag_hash = spec.dag_hash()
+        if dag_hash not in owners:
+            owners.insert(0 if first else len(owners), dag_hash)
+            self.changed = True
+
+    def remove_owner(self, spec, path):
+        """Remove a spec from the owners of a file.
+
+        Returns:
+            (int): the number of specs still providing the file
+        """
+        rel = self._relative(path)
+        owners = self.files.get(rel, [])
+        if spec.dag_hash() in owners:
+            owners.remove(spec.dag_hash())
+            self.changed = True
+        if not owners:
+            self.files.pop(rel, None)
+        return len(owners)
+
+    def remove_directories(self, directories):
+        for d in directories:
+            self.directories.discard(self._relative(d))
+        self.changed = True
+
+    def prune_directories(self):
+        """Forget directories that no longer exist in the view."""
+        existing = set(d for d in self.directories
+                       if os.path.isdir(os.path.join(self.root, d)))
+        if existing != self.directories:
+            self.directories = existing
+            self.changed = True
+
+
 #####################
 # utility functions #
 #####################
@@ -0,0 +1,20 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import llnl.util.tty as tty
+
+import spack.user_environment
+
+
+def post_install(spec):
+    if spec.external:
+        return
+
+    try:
+        spack.user_environment.write_run_environment(spec)
+    except Exception as e:
+        # Consumers compute the modifications again if there is no record
+        tty.debug('Cannot record the run environment of {0}: {1}'.format(
+            spec.cshort_spec, str(e)))
@@ -31,6 +31,7 @@
 import glob
 import heapq
 import itertools
+import multiprocessing
 import os
 import shutil
 import six
@@ -38,19 +39,24 @@
 import time
 
 from collections import defaultdict
+from typing import List  # novm
 
 import llnl.util.filesystem as fs
 import llnl.util.lock as lk
 import llnl.util.tty as tty
 import spack.binary_distribution as binary_distribution
 import spack.compilers
+import spack.config
 import spack.error
+import spack.fetch_stats
 import spack.hooks
 import spack.monitor
 import spack.package
 import spack.package_prefs as prefs
 import spack.repo
+import spack.stage
 import spack.store
+import spack.subprocess_context
 
 from llnl.util.tty.color import colorize
 from llnl.util.tty.log import log_output
@@ -493,6 +499,91 @@ def dump_packages(spec, path):
             fs.install_tree(source_pkg_dir, dest_pkg_dir)
 
 
+#: packages whose sources are fetched by ``fetch_packages``
+_fetch_pkgs = []  # type: List[spack.package.PackageBase]
+
+
+def _fetch_package(index):
+    """Fetches the sources of a package in a process of the pool of
+    ``fetch_packages``, and returns the error message if it failed.
+    """
+    pkg = _fetch_pkgs[index]
+    try:
+        pkg.do_fetch()
+    except Exception as e:
+        tty.debug(e)
+        return str(e) or e.__class__.__name__
+    return None
+
+
+def _fetch_needs_confirmation(pkg):
+    """Whether ``do_fetch()`` may ask the user before fetching a package,
+    because it has no checksum or is deprecated."""
+    if pkg.version not in pkg.versions:
+        return bool(spack.config.get('config:checksum') and
+                    pkg.stage.managed_by_spack)
+    return bool(pkg.versions[pkg.version].get('deprecated', False) and
+                not spack.config.get('config:deprecated'))
+
+
+def _fetch_key(pkg):
+    """Packages with the same key share their sources."""
+    patches = sorted(p.sha256 for p in pkg.spec.patches)
+    return pkg.name, str(pkg.version), tuple(patches)
+
+
+def fetch_packages(pkgs, jobs=1):
+    """Fetches the sources, resources and patches of many packages into
+    their stages and the source cache.
+
+    Packages are fetched by a pool of processes. Each one inherits the
+    packages from the parent process, so this requires fork() and falls
+    back to fetching serially where processes are spawned instead.
+    Packages that may ask the user for confirmation are always fetched
+    in the calling process, and packages sharing the same sources are
+    fetched only once.
+
+    Args:
+        pkgs (list): packages to be fetched
+        jobs (int): number of processes fetching sources
+
+    Returns:
+        (list): (package, error message) for the packages that could not
+            be fetched
+    """
+    global _fetch_pkgs
+    try:
+        keys = set()
+        for pkg in pkgs:
+            key = _fetch_key(pkg)
+            if key not in keys:
+                keys.add(key)
+                _fetch_pkgs.append(pkg)
+
+        indices = list(range(len(_fetch_pkgs)))
+        parallel = []
+        if jobs > 1 and len(indices) > 1 and \
+                not spack.subprocess_context._serialize:
+            parallel = [i for i in indices
+                        if not _fetch_needs_confirmation(_fetch_pkgs[i])]
+
+        results = dict((i, _fetch_package(i))
+                       for i in indices if i not in parallel)
+        if parallel:
+            pool = multiprocessing.Pool(min(jobs, len(parallel)))
+            try:
+                results.update(
+                    zip(parallel, pool.map(_fetch_package, parallel)))
+            finally:
+                pool.terminate()
+                pool.join()
+
+        return [(_fetch_pkgs[i], results[i])
+                for i in indices if results[i] is not None]
+    finally:
+        _fetch_pkgs = []
+
+
 def get_dependent_ids(spec):
     """
     Return a list of package ids for the spec's dependents
@@ -1144,10 +1235,17 @@ def _install_task(self, task):
 
             # Create a child process to do the actual installation.
             # Preserve verbosity settings across installs.
-            spack.package.PackageBase._verbose = (
-                spack.build_environment.start_build_process(
-                    pkg, build_process, install_args)
-            )
+            try:
+                spack.package.PackageBase._verbose = (
+                    spack.build_environment.start_build_process(
+                        pkg, build_process, install_args)
+                )
+            except spack.build_environment.StopPhase:
+                raise
+            except Exception:
+                # The build may have run out of space in a tmpfs stage
+                _record_stage_size(pkg, failed=True)
+                raise
 
             # Note: PARENT of the build process adds the new package to
             # the database, so that we don't need to re-read from file.
@@ -1419,7 +1517,12 @@ def install(self):
         Args:
             pkg (Package): the package to be built and installed"""
 
+        # Fetches of prefetching and build processes are recorded in the
+        # same session
+        spack.fetch_stats.start_session()
+
         self._init_queue()
+        self._prefetch()
         fail_fast_err = 'Terminating after first install failure'
         single_explicit_spec = len(self.build_requests) == 1
         failed_explicits = []
@@ -1669,6 +1772,55 @@ def install(self):
             raise InstallError('Installation request failed.  Refer to '
                                'reported errors for failing package(s).')
 
+    def _prefetch(self):
+        """Fetch concurrently the sources of the packages that are going to
+        be built from source, so that builds only need to expand them.
+
+        Sources that cannot be prefetched are fetched again by the build,
+        which reports errors as usual.
+        """
+        jobs = spack.config.get('config:fetch_jobs', 1)
+        if jobs <= 1:
+            return
+
+        pkgs = []
+        for task in self.build_tasks.values():
+            install_args = task.request.install_args
+            if install_args.get('cache_only') or install_args.get('fake'):
+                continue
+
+            pkg = task.pkg
+            if not pkg.has_code or pkg.spec.external or \
+                    pkg.installed_upstream or pkg.installed:
+                continue
+            if not pkg.stage.managed_by_spack or \
+                    _fetch_needs_confirmation(pkg):
+                continue
+            if install_args.get('use_cache') and \
+                    binary_distribution.get_mirrors_for_spec(
+                        pkg.spec,
+                        full_hash_match=install_args.get('full_hash_match'),
+                        index_only=True):
+                continue
+            pkgs.append(pkg)
+
+        if not pkgs:
+            return
+
+        tty.msg('Fetching sources of {0} packages'.format(len(pkgs)))
+        for pkg, error in fetch_packages(pkgs, jobs):
+            tty.debug('Could not prefetch {0}: {1}'
+                      .format(package_id(pkg), error))
+
+
+def _record_stage_size(pkg, failed=False):
+    """Record the stage size of a package without failing its install."""
+    try:
+        spack.stage.record_stage_size(pkg.spec, pkg.stage.path, failed)
+    except Exception as e:
+        tty.debug('Could not record the stage size of {0}: {1}'
+                  .format(package_id(pkg), str(e)))
+
 
 def build_process(pkg, kwargs):
     """Perform the installation/build of the package.
@@ -1724,7 +1876,10 @@ def build_process(pkg, kwargs):
             # Do the real install in the source directory.
             with fs.working_dir(pkg.stage.source_path):
 
-                # Save the build environment in a file before building.
+                # Precompute the arguments of the compiler wrappers and
+                # save the build environment in a file before building.
+                spack.build_environment.write_wrapper_cache(
+                    pkg.wrapper_cache_path)
                 dump_environment(pkg.env_path)
 
                 for attr in ('configure_args', 'cmake_args'):
@@ -1796,6 +1951,8 @@ def build_process(pkg, kwargs):
         # Run post install hooks before build stage is removed.
         spack.hooks.post_install(pkg.spec)
 
+        _record_stage_size(pkg)
+
     build_time = timer.total - pkg._fetch_time
     tty.msg('{0} Successfully installed {1}'.format(pre, pkg_id),
             'Fetch: {0}.  Build: {1}.  Total: {2}.'
@@ -11,13 +11,23 @@
 where spack is run is not connected to the internet, it allows spack
 to download packages directly from a mirror (e.g., on an intranet).
 """
+import collections
+import errno
+import hashlib
+import json
+import multiprocessing
 import sys
 import os
+import time
 import traceback
 import os.path
 import operator
 
+from typing import List  # novm
+
 import six
+from six.moves import queue
+from six.moves.urllib.parse import urlparse
 
 import ruamel.yaml.error as yaml_error
 
@@ -31,8 +41,10 @@
 import llnl.util.tty as tty
 from llnl.util.filesystem import mkdirp
 
+import spack.caches
 import spack.config
 import spack.error
+import spack.subprocess_context
 import spack.url as url
 import spack.fetch_strategy as fs
 import spack.util.spack_json as sjson
@@ -401,7 +413,17 @@ def get_matching_versions(specs, num_versions=1):
     return matching
 
 
-def create(path, specs, skip_unstable_versions=False):
+#: default maximum number of specs whose sources are fetched concurrently
+#: from the same host when creating a mirror
+default_max_per_host = 4
+
+#: seconds to wait before retrying to add a spec to a mirror after an
+#: error; the delay doubles at each retry
+retry_delay = 1.0
+
+
+def create(path, specs, skip_unstable_versions=False, jobs=1,
+           max_per_host=default_max_per_host):
     """Create a directory to be used as a spack mirror, and fill it with
     package archives.
 
@@ -412,6 +434,9 @@ def create(path, specs, skip_unstable_versions=False):
         skip_unstable_versions: if true, this skips adding resources when
             they do not have a stable archive checksum (as determined by
             ``fetch_strategy.stable_target``)
+        jobs: number of processes adding specs to the mirror concurrently
+        max_per_host: maximum number of specs whose sources are fetched
+            concurrently from the same host
 
     Return Value:
         Returns a tuple of lists: (present, mirrored, error)
@@ -423,6 +448,10 @@ def create(path, specs, skip_unstable_versions=False):
     This routine iterates through all known package versions, and
     it creates specs for those versions.  If the version satisfies any spec
     in the specs list, it is downloaded and added to the mirror.
+
+    Specs that were completely added to the same mirror by a previous
+    (possibly interrupted) call are recorded by a ``MirrorState``, and are
+    counted as present without fetching anything.
     """
     parsed = url_util.parse(path)
     mirror_root = url_util.local_file_path(parsed)
@@ -446,11 +475,35 @@ def create(path, specs, skip_unstable_versions=False):
     mirror_cache = spack.caches.MirrorCache(
         mirror_root, skip_unstable_versions=skip_unstable_versions)
     mirror_stats = MirrorStats()
+    mirror_state = MirrorState(mirror_root, skip_unstable_versions)
 
-    # Iterate through packages and download all safe tarballs for each
+    pending = []
     for spec in specs:
+        paths = mirror_state.paths(spec)
+        if paths is None:
+            pending.append(spec)
+            continue
+        mirror_stats.next_spec(spec)
+        for path in paths:
+            mirror_stats.already_existed(path)
+
+    if len(pending) < len(specs):
+        tty.msg('Skipping {0} specs already added to the mirror'
+                .format(len(specs) - len(pending)))
+
+    if jobs > 1 and len(pending) > 1 and \
+            not spack.subprocess_context._serialize:
+        _add_specs(pending, mirror_cache, mirror_stats, mirror_state,
+                   jobs, max_per_host)
+        return mirror_stats.stats()
+
+    # Iterate through packages and download all safe tarballs for each
+    for spec in pending:
         mirror_stats.next_spec(spec)
         _add_single_spec(spec, mirror_cache, mirror_stats)
+        if spec not in mirror_stats.errors:
+            mirror_state.add(spec, mirror_stats.added_resources |
+                             mirror_stats.existing_resources)
 
     return mirror_stats.stats()
 
@@ -541,11 +594,214 @@ def error(self):
         self.errors.add(self.current_spec)
 
 
+class MirrorState(object):
+    """Record of the specs that were completely added to a mirror.
+
+    Each spec is appended as a line of JSON to a file in the ``misc_cache``
+    as soon as all its archives are in the mirror, so that an interrupted
+    ``create`` can continue where it stopped.
+    """
+
+    def __init__(self, root, skip_unstable_versions=False):
+        self.root = root
+        self.skip_unstable_versions = skip_unstable_versions
+
+        root_hash = hashlib.sha1(root.encode('utf-8')).hexdigest()
+        self.path = os.path.join(
+            spack.caches.misc_cache_location(), 'mirrors',
+            '{0}.json'.format(root_hash))
+        self.completed = {}
+        self._read()
+
+    @staticmethod
+    def _key(spec):
+        return spec.dag_hash() if spec.concrete else str(spec)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except (IOError, OSError):
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # e.g. the last line of an interrupted run
+                continue
+            # Specs added while skipping unstable versions may be missing
+            # archives that are needed otherwise
+            if entry['skip_unstable_versions'] and \
+                    not self.skip_unstable_versions:
+                continue
+            self.completed[entry['spec']] = entry['paths']
+
+    def paths(self, spec):
+        """Returns the absolute paths of the archives of a spec that was
+        completely added to the mirror, or None if it needs to be added."""
+        paths = self.completed.get(self._key(spec))
+        if paths is None:
+            return None
+        paths = [os.path.join(self.root, p) for p in paths]
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        return paths
+
+    def add(self, spec, paths):
+        """Records that all the archives of a spec are in the mirror."""
+        entry = {
+            'spec': self._key(spec),
+            'paths': sorted(os.path.relpath(p, self.root) for p in paths),
+            'skip_unstable_versions': self.skip_unstable_versions,
+        }
+        self.completed[entry['spec']] = entry['paths']
+        try:
+            mkdirp(os.path.dirname(self.path))
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except (IOError, OSError) as e:
+            tty.debug('Cannot record mirror state: {0}'.format(e))
+
+
+def _spec_host(spec):
+    """Returns the host the sources of a spec are fetched from, if known."""
+    try:
+        fetcher = spec.package.fetcher
+        if isinstance(fetcher, fs.FetchStrategyComposite):
+            fetcher = fetcher[0]
+        source_url = getattr(fetcher, 'url', None)
+    except Exception:
+        return None
+    if not source_url:
+        return None
+    return urlparse(source_url).netloc or None
+
+
+#: specs added to a mirror by the pool of processes of ``_add_specs``
+_mirror_specs = []  # type: List[spack.spec.Spec]
+
+#: mirror that the pool of processes of ``_add_specs`` adds specs to
+_mirror_cache = None
+
+#: process adding each spec in ``_add_specs``, in shared memory, so that
+#: specs of processes that die are noticed
+_mirror_pids = None
+
+#: seconds between checks for processes of ``_add_specs`` that died
+_mirror_poll_interval = 1
+
+
+def _add_spec_in_process(index):
+    """Adds a spec to the mirror in a process of the pool of ``_add_specs``,
+    and returns the paths of its archives and whether an error occurred."""
+    _mirror_pids[index] = os.getpid()
+    spec = _mirror_specs[index]
+    stats = MirrorStats()
+    stats.next_spec(spec)
+    try:
+        _add_single_spec(spec, _mirror_cache, stats)
+    except BaseException as e:
+        # Errors that are not exceptions, like tty.die(), must still
+        # produce a result, or the parent would wait for it forever
+        tty.debug(e)
+        return [], [], True
+    return (list(stats.added_resources), list(stats.existing_resources),
+            bool(stats.errors))
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+def _add_specs(specs, mirror, mirror_stats, mirror_state, jobs,
+               max_per_host):
+    """Adds specs to a mirror with a pool of processes, fetching at most
+    ``max_per_host`` of them concurrently from the same host.
+
+    Each process inherits the specs from the parent process, so this
+    requires fork(). Specs whose process dies, e.g. killed when out of
+    memory, are counted as errors.
+    """
+    global _mirror_specs, _mirror_cache, _mirror_pids
+    _mirror_specs, _mirror_cache = specs, mirror
+    _mirror_pids = multiprocessing.RawArray('i', len(specs))
+
+    max_per_host = max(max_per_host, 1)
+    hosts = [_spec_host(s) for s in specs]
+    pending = list(range(len(specs)))
+    active = collections.defaultdict(int)
+    done = queue.Queue()
+
+    # Specs being added
+    running = set()
+
+    def start(index):
+        pool.apply_async(_add_spec_in_process, (index,),
+                         callback=lambda result: done.put((index, result)))
+
+    def check_processes():
+        for index in running:
+            pid = _mirror_pids[index]
+            if pid and not _process_exists(pid):
+                tty.warn('The process adding {0} to the mirror died'.format(
+                    specs[index].format('{name}{@version}')))
+                _mirror_pids[index] = 0
+                done.put((index, ([], [], True)))
+
+    pool = multiprocessing.Pool(min(jobs, len(specs)))
+    try:
+        while pending or running:
+            # Start the first pending specs that are within the limits
+            for index in list(pending):
+                if len(running) >= jobs:
+                    break
+                host = hosts[index]
+                if host and active[host] >= max_per_host:
+                    continue
+                pending.remove(index)
+                active[host] += 1
+                running.add(index)
+                start(index)
+
+            try:
+                index, (added, existing, error) = done.get(
+                    timeout=_mirror_poll_interval)
+            except queue.Empty:
+                check_processes()
+                continue
+            if index not in running:
+                # Result of a process that was already reported dead
+                continue
+            active[hosts[index]] -= 1
+            running.remove(index)
+
+            spec = specs[index]
+            mirror_stats.next_spec(spec)
+            for path in existing:
+                mirror_stats.already_existed(path)
+            for path in added:
+                mirror_stats.added(path)
+            if error:
+                mirror_stats.error()
+            else:
+                mirror_state.add(spec, added + existing)
+    finally:
+        pool.terminate()
+        pool.join()
+        _mirror_specs, _mirror_cache, _mirror_pids = [], None, None
+
+
 def _add_single_spec(spec, mirror, mirror_stats):
     tty.msg("Adding package {pkg} to mirror".format(
         pkg=spec.format("{name}{@version}")
     ))
     num_retries = 3
+    delay = retry_delay
     while num_retries > 0:
         try:
             with spec.package.stage as pkg_stage:
@@ -561,6 +817,13 @@ def _add_single_spec(spec, mirror, mirror_stats):
             exception = e
         num_retries -= 1
 
+        # Back off, in case the server is refusing too many requests
+        if num_retries > 0:
+            tty.debug('Retrying to add {0} in {1}s'.format(
+                spec.cformat('{name}{@version}'), delay))
+            time.sleep(delay)
+            delay *= 2
+
     if exception:
         if spack.config.get('config:debug'):
             traceback.print_exception(file=sys.stderr, *exc_tuple)
@@ -31,21 +31,26 @@
 import collections
 import copy
 import datetime
+import hashlib
 import inspect
+import json
+import multiprocessing
 import os.path
 import re
-from typing import Optional  # novm
+from typing import List, Optional  # novm
 
 import llnl.util.filesystem
 from llnl.util.lang import dedupe
 import llnl.util.tty as tty
-import spack.build_environment as build_environment
+import spack
 import spack.environment as ev
 import spack.error
 import spack.paths
 import spack.schema.environment
 import spack.projections as proj
+import spack.subprocess_context
 import spack.tengine as tengine
+import spack.user_environment
 import spack.util.environment
 import spack.util.file_permissions as fp
 import spack.util.path
@@ -708,16 +713,9 @@ def environment_modifications(self):
             exclude=spack.util.environment.is_system_path
         )
 
-        # Let the extendee/dependency modify their extensions/dependencies
-        # before asking for package-specific modifications
-        env.extend(
-            build_environment.modifications_from_dependencies(
-                spec, context='run'
-            )
-        )
-        # Package specific modifications
-        build_environment.set_module_variables_for_package(spec.package)
-        spec.package.setup_run_environment(env)
+        # Modifications from the package and from its dependencies
+        env.extend(spack.user_environment.run_environment_modifications(
+            self.spec, projection=spec.prefix if use_view else None))
 
         # Modifications required from modules.yaml
         env.extend(self.conf.env)
@@ -771,8 +769,15 @@ def verbose(self):
 
 
 class BaseModuleFileWriter(object):
+    #: token that starts a comment in module files of this type
+    comment = '#'
+
+    #: marker of the line recording the digest of the module file inputs
+    digest_marker = 'spack-module-digest:'
+
     def __init__(self, spec, module_set_name):
         self.spec = spec
+        self.module_set_name = module_set_name
 
         # This class is meant to be derived. Get the module of the
         # actual writer.
@@ -812,6 +817,55 @@ def _get_template(self):
         # ... and return the first match
         return choices.pop(0)
 
+    def digest(self):
+        """Digest of the inputs the module file is generated from.
+
+        These are the hash of the spec, a hash of the current package files
+        of the spec and its run dependencies, the modules configuration and
+        the template used to render the module file. The package files are
+        hashed separately because the full hash of an installed spec is
+        read from the database, and does not change when they do.
+        """
+        import jinja2
+        template_name = self._get_template()
+        env = tengine.make_environment()
+        try:
+            _, filename, _ = env.loader.get_source(env, template_name)
+            template_mtime = os.stat(filename).st_mtime
+        except (jinja2.TemplateNotFound, OSError):
+            filename, template_mtime = template_name, None
+
+        inputs = [
+            spack.spack_version,
+            type(self).__name__,
+            self.module_set_name,
+            self.spec.full_hash(),
+            spack.user_environment.package_files_hash(self.spec),
+            spack.config.get('modules', {}),
+            filename,
+            template_mtime,
+        ]
+        if spack.config.get('modules:%s:use_view' % self.module_set_name):
+            env = ev.get_env({}, 'module refresh')
+            inputs.append(env.path if env else None)
+
+        inputs = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha1(inputs.encode('utf-8')).hexdigest()
+
+    def _digest_line(self, digest):
+        return '{0} {1} {2}\n'.format(self.comment, self.digest_marker, digest)
+
+    def up_to_date(self):
+        """Whether the module file exists and was generated from the
+        same inputs it would be generated from now.
+        """
+        try:
+            with open(self.layout.filename) as f:
+                lines = f.readlines()
+        except (IOError, OSError):
+            return False
+        return bool(lines) and lines[-1] == self._digest_line(self.digest())
+
     def write(self, overwrite=False):
         """Writes the module file.
 
@@ -878,6 +932,10 @@ def write(self, overwrite=False):
 
         # Render the template
         text = template.render(context)
+        if not text.endswith('\n'):
+            text += '\n'
+        # Record the digest of the inputs, to detect when refresh is needed
+        text += self._digest_line(self.digest())
         # Write it to file
         with open(self.layout.filename, 'w') as f:
             f.write(text)
@@ -900,6 +958,64 @@ def remove(self):
                 pass
 
 
+#: writers whose module files are regenerated by ``write_modules``
+_writers = []  # type: List[BaseModuleFileWriter]
+
+
+def _write_module(index):
+    """Writes a module file in a process of the pool of ``write_modules``,
+    and returns whether it was written and the error message if it failed.
+    """
+    writer = _writers[index]
+    try:
+        if writer.up_to_date():
+            return False, None
+        writer.write(overwrite=True)
+    except Exception as e:
+        tty.debug(e)
+        return False, str(e)
+    return True, None
+
+
+def write_modules(writers, jobs=1):
+    """Writes the module files of many writers, skipping those that are up
+    to date with their inputs.
+
+    Module files are written by a pool of processes. Each one inherits
+    the writers from the parent process, so this requires fork() and falls
+    back to writing serially where processes are spawned instead.
+
+    Args:
+        writers (list): module file writers
+        jobs (int): number of processes writing module files
+
+    Returns:
+        (tuple): the number of module files written, and a list of
+            (writer, error message) for those that could not be written
+    """
+    global _writers
+    _writers = list(writers)
+    indices = range(len(_writers))
+    try:
+        if jobs > 1 and len(_writers) > 1 and \
+                not spack.subprocess_context._serialize:
+            pool = multiprocessing.Pool(min(jobs, len(_writers)))
+            try:
+                results = pool.map(_write_module, indices)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            results = [_write_module(i) for i in indices]
+
+        written = sum(1 for w, _ in results if w)
+        errors = [(_writers[i], e)
+                  for i, (_, e) in enumerate(results) if e is not None]
+        return written, errors
+    finally:
+        _writers = []
+
+
 class ModulesError(spack.error.SpackError):
     """Base error for modules."""
 
@@ -445,6 +445,8 @@ class LmodModulefileWriter(BaseModuleFileWriter):
     """Writer class for lmod module files."""
     default_template = os.path.join('modules', 'modulefile.lua')
 
+    comment = '--'
+
 
 class CoreCompilersNotFoundError(spack.error.SpackError, KeyError):
     """Error raised if the key 'core_compilers' has not been specified
@@ -77,6 +77,9 @@
 # Filename for the Spack configure args file.
 _spack_configure_argsfile = 'spack-configure-args.txt'
 
+# Filename for the arguments precomputed for the compiler wrappers
+_spack_wrapper_cachefile = 'spack-build-wrapper-cache.sh'
+
 
 class InstallPhase(object):
     """Manages a single phase of the installation.
@@ -436,7 +439,7 @@ def view_file_conflicts(self, view, merge_map):
         Alternative implementations may allow some of the files to exist in
         the view (in this case they would be omitted from the results).
         """
-        return set(dst for dst in merge_map.values() if os.path.exists(dst))
+        return set(dst for dst in merge_map.values() if view.exists(dst))
 
     def add_files_to_view(self, view, merge_map):
         """Given a map of package files to destination paths in the view, add
@@ -444,9 +447,7 @@ def add_files_to_view(self, view, merge_map):
         implementations may skip some files, for example if other packages
         linked into the view already include the file.
         """
-        for src, dst in merge_map.items():
-            if not os.path.exists(dst):
-                view.link(src, dst, spec=self.spec)
+        view.link_files(merge_map, spec=self.spec)
 
     def remove_files_from_view(self, view, merge_map):
         """Given a map of package files to files currently linked in the view,
@@ -980,8 +981,13 @@ def _make_root_stage(self, fetcher):
         stage_name = "{0}{1}-{2}-{3}".format(stage_prefix, s.name, s.version,
                                              s.dag_hash())
 
+        path = self.path
+        if path is None:
+            path = os.path.join(
+                spack.stage.get_stage_root_for(s, stage_name), stage_name)
+
         stage = Stage(fetcher, mirror_paths=mirror_paths, name=stage_name,
-                      path=self.path, search_fn=self._download_search)
+                      path=path, search_fn=self._download_search)
         return stage
 
     def _make_stage(self):
@@ -1094,6 +1100,11 @@ def configure_args_path(self):
         """Return the configure args file path associated with staging."""
         return os.path.join(self.stage.path, _spack_configure_argsfile)
 
+    @property
+    def wrapper_cache_path(self):
+        """Return the compiler wrapper cache file path in the stage."""
+        return os.path.join(self.stage.path, _spack_wrapper_cachefile)
+
     @property
     def times_log_path(self):
         """Return the times log json file."""
@@ -11,6 +11,9 @@
 
 import spack.error
 
+#: characters that make shlex necessary to split a string into words
+_quote_chars = frozenset('\'"\\')
+
 
 class Token(object):
     """Represents tokens; generated from input by lexer and fed to parse()."""
@@ -35,55 +38,63 @@ def __eq__(self, other):
 
 
 class Lexer(object):
-    """Base class for Lexers that keep track of line numbers."""
+    """Base class for Lexers that keep track of line numbers.
+
+    Each lexicon is a list of ``(regex, token_type)`` pairs, where a token
+    type of ``None`` means that matching text is skipped. The regexes of a
+    lexicon are compiled into a single master regex, so each token is found
+    with one match call; earlier entries take precedence over later ones.
+
+    The lexer starts in mode 0 and uses ``lexicon0``. After a token whose
+    type is in ``mode_switches_01`` it switches to ``lexicon1``, and after
+    a token whose type is in ``mode_switches_10`` it switches back.
+    """
 
     def __init__(self, lexicon0, mode_switches_01=[],
                  lexicon1=[], mode_switches_10=[]):
-        self.scanner0 = re.Scanner(lexicon0)
-        self.mode_switches_01 = mode_switches_01
-        self.scanner1 = re.Scanner(lexicon1)
-        self.mode_switches_10 = mode_switches_10
-        self.mode = 0
-
-    def token(self, type, value=''):
-        if self.mode == 0:
-            return Token(type, value,
-                         self.scanner0.match.start(0),
-                         self.scanner0.match.end(0))
-        else:
-            return Token(type, value,
-                         self.scanner1.match.start(0),
-                         self.scanner1.match.end(0))
-
-    def lex_word(self, word):
-        scanner = self.scanner0
-        mode_switches = self.mode_switches_01
-        if self.mode == 1:
-            scanner = self.scanner1
-            mode_switches = self.mode_switches_10
-
-        tokens, remainder = scanner.scan(word)
-        remainder_used = 0
-
-        for i, t in enumerate(tokens):
-            if t.type in mode_switches:
-                # Combine post-switch tokens with remainder and
-                # scan in other mode
-                self.mode = 1 - self.mode  # swap 0/1
-                remainder_used = 1
-                tokens = tokens[:i + 1] + self.lex_word(
-                    word[word.index(t.value) + len(t.value):])
-                break
-
-        if remainder and not remainder_used:
-            raise LexError("Invalid character", word, word.index(remainder))
-
-        return tokens
+        self.scanners = (self._compile(lexicon0), self._compile(lexicon1))
+        self.mode_switches = (
+            frozenset(mode_switches_01), frozenset(mode_switches_10))
+
+    @staticmethod
+    def _compile(lexicon):
+        """Compile a lexicon into a master regex and a group -> type map."""
+        groups = '|'.join(
+            '(?P<t{0}>{1})'.format(i, regex)
+            for i, (regex, _) in enumerate(lexicon))
+        types = dict(
+            ('t{0}'.format(i), type) for i, (_, type) in enumerate(lexicon))
+        return re.compile(groups).match, types
+
+    def lex_word(self, word, mode=0):
+        """Lex a single word, starting in the given mode.
+
+        Returns:
+            (tuple): list of tokens and the mode at the end of the word
+        """
+        tokens = []
+        pos, end = 0, len(word)
+        match, types = self.scanners[mode]
+        while pos < end:
+            m = match(word, pos)
+            if m is None or m.end() == pos:
+                raise LexError("Invalid character", word, pos)
+
+            type = types[m.lastgroup]
+            if type is not None:
+                tokens.append(Token(type, m.group(), pos, m.end()))
+                if type in self.mode_switches[mode]:
+                    mode = 1 - mode  # swap 0/1
+                    match, types = self.scanners[mode]
+            pos = m.end()
+
+        return tokens, mode
 
     def lex(self, text):
         lexed = []
+        mode = 0
         for word in text:
-            tokens = self.lex_word(word)
+            tokens, mode = self.lex_word(word, mode)
             lexed.extend(tokens)
         return lexed
 
@@ -143,7 +154,12 @@ def expect(self, id):
 
     def setup(self, text):
         if isinstance(text, string_types):
-            text = shlex.split(str(text))
+            text = str(text)
+            # shlex is slow, and only needed if there is quoting to undo
+            if _quote_chars.intersection(text):
+                text = shlex.split(text)
+            else:
+                text = text.split()
         self.text = text
         self.push_tokens(self.lexer.lex(text))
 
@@ -496,6 +496,7 @@ def put_first(self, repo):
 
         self.repos.insert(0, repo)
         self.by_namespace[repo.full_namespace] = repo
+        spack.spec.satisfies_cache.clear()
 
     def put_last(self, repo):
         """Add repo last in the search path."""
@@ -509,11 +510,13 @@ def put_last(self, repo):
         # don't mask any higher-precedence repos with same namespace
         if repo.full_namespace not in self.by_namespace:
             self.by_namespace[repo.full_namespace] = repo
+        spack.spec.satisfies_cache.clear()
 
     def remove(self, repo):
         """Remove a repo from the search path."""
         if repo in self.repos:
             self.repos.remove(repo)
+            spack.spec.satisfies_cache.clear()
 
     def get_repo(self, namespace, default=NOT_PROVIDED):
         """Get a repository by namespace.
@@ -1264,6 +1267,7 @@ def set_path(repo):
     """
     global path
     path = repo
+    spack.spec.satisfies_cache.clear()
 
     # make the new repo_path an importer if needed
     append = isinstance(repo, (Repo, RepoPath))
@@ -1310,6 +1314,7 @@ def use_repositories(*paths_and_repos):
     if remove_from_meta:
         sys.meta_path.remove(temporary_repositories)
     path = saved
+    spack.spec.satisfies_cache.clear()
 
 
 class RepoError(spack.error.SpackError):
@@ -45,6 +45,8 @@
                     {'type': 'array',
                      'items': {'type': 'string'}}],
             },
+            'tmpfs_stage': {'type': 'string'},
+            'tmpfs_stage_max_size': {'type': 'integer', 'minimum': 0},
             'test_stage': {'type': 'string'},
             'extensions': {
                 'type': 'array',
@@ -74,6 +76,15 @@
             'misc_cache': {'type': 'string'},
             'connect_timeout': {'type': 'integer', 'minimum': 0},
             'verify_ssl': {'type': 'boolean'},
+            'url_fetch_method': {
+                'type': 'string',
+                'enum': ['urllib', 'curl']
+            },
+            'url_fetch_segments': {'type': 'integer', 'minimum': 1},
+            'git_cache': {'type': 'boolean'},
+            'web_cache': {'type': 'boolean'},
+            'web_cache_ttl': {'type': 'integer', 'minimum': 0},
+            'web_cache_offline': {'type': 'boolean'},
             'suppress_gpg_warnings': {'type': 'boolean'},
             'install_missing_compilers': {'type': 'boolean'},
             'debug': {'type': 'boolean'},
@@ -83,6 +94,8 @@
             'dirty': {'type': 'boolean'},
             'build_language': {'type': 'string'},
             'build_jobs': {'type': 'integer', 'minimum': 1},
+            'fetch_jobs': {'type': 'integer', 'minimum': 1},
+            'fetch_stats': {'type': 'boolean'},
             'ccache': {'type': 'boolean'},
             'concretizer': {
                 'type': 'string',
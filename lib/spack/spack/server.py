@@ -0,0 +1,455 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Persistent command server for Spack's shell integration.
+
+Commands run through ``share/spack/setup-env.sh`` (``spack load``,
+``spack env activate``, ``spack find``, ...) normally start a fresh
+interpreter, which then has to read every configuration scope, the
+package repository indexes and the install database before it can do any
+work.  The server keeps those warm in a long-lived process listening on a
+Unix socket under the user's cache directory.  Each request is handled in
+a forked child, so commands cannot corrupt the state of the server, and
+before forking the server re-validates its caches against the files on
+disk.
+
+The server is opt-in: ``bin/spack`` forwards commands to it only when
+``SPACK_SERVER`` is set in the environment, and it starts one in the
+background on demand if none is running.  Any failure to reach the server
+makes the client fall back to running the command in-process, and so
+does a server that does not answer within ``client_timeout`` seconds.
+
+The client side of this module is used before the rest of Spack is
+imported, so it should only import lightweight modules at module level.
+"""
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import spack.error
+import spack.paths
+
+#: commands that can be forwarded to the server
+forwardable_commands = ('find', 'load', 'unload', 'location')
+
+#: subcommands of ``spack env`` that can be forwarded to the server
+forwardable_env_commands = (
+    'activate', 'deactivate', 'status', 'st', 'list', 'ls')
+
+#: seconds without requests after which the server shuts itself down
+default_idle_timeout = 900
+
+#: seconds the client waits for each step of a request, including the
+#: command run by the server, before running the command in-process
+client_timeout = 30
+
+#: seconds the server waits for a client to send its request
+receive_timeout = 5
+
+
+def socket_path():
+    """Path of the server socket for this Spack instance and user."""
+    prefix_hash = hashlib.sha1(
+        spack.paths.prefix.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(
+        spack.paths.user_config_path, 'cache',
+        'server-{0}.sock'.format(prefix_hash))
+
+
+def lock_path(path=None):
+    """Path of the lock file held by the server listening on ``path``."""
+    return (path or socket_path()) + '.lock'
+
+
+def _try_lock(path):
+    """Lock a file exclusively, without waiting.
+
+    Returns:
+        (int or None): descriptor of the locked file, which is unlocked when
+            closed, or None if another process holds the lock
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError) as e:
+        os.close(fd)
+        if e.errno in (errno.EACCES, errno.EAGAIN):
+            return None
+        raise
+    return fd
+
+
+def can_forward(argv):
+    """Whether ``spack <argv>`` can be handled by the server.
+
+    Only commands without global options are forwarded, so that options
+    affecting how configuration is read (e.g. ``-C``) are never applied
+    to the warm state of the server.
+    """
+    if not argv or argv[0] not in forwardable_commands + ('env',):
+        return False
+    if argv[0] == 'env':
+        return len(argv) > 1 and argv[1] in forwardable_env_commands
+    return True
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8'))
+    sock.shutdown(socket.SHUT_WR)
+
+
+def _receive(sock):
+    chunks = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        chunks.append(data)
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def request(message, path=None, timeout=None):
+    """Send a message to the server and return its response.
+
+    Args:
+        message (dict): request to send
+        path (str): path to the server socket
+        timeout (float): seconds to wait for each step of the request;
+            defaults to ``client_timeout``
+
+    Raises:
+        socket.error: if the server cannot be reached or does not answer
+            in time
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout or client_timeout)
+    try:
+        sock.connect(path or socket_path())
+        _send(sock, message)
+        return _receive(sock)
+    finally:
+        sock.close()
+
+
+def start_in_background(path=None):
+    """Start a server for this Spack instance without waiting for it.
+
+    Nothing is started if the lock file of the server is held, i.e. if a
+    server is already running or starting. Servers started concurrently
+    anyway are serialized by the same lock, see ``Server._listen()``.
+    """
+    try:
+        fd = _try_lock(lock_path(path))
+    except (IOError, OSError):
+        return
+    if fd is None:
+        return
+    os.close(fd)
+
+    env = dict(os.environ)
+    env.pop('SPACK_ENV', None)
+    with open(os.devnull, 'w') as devnull:
+        subprocess.Popen(
+            [sys.executable, spack.paths.spack_script, '-E', 'server',
+             'start'],
+            env=env, stdout=devnull, stderr=devnull, close_fds=True)
+
+
+def forward(argv, path=None):
+    """Run ``spack <argv>`` on the server, if possible.
+
+    Args:
+        argv (list of str): command line arguments, without the executable
+        path (str): path to the server socket
+
+    Returns:
+        (int or None): exit code of the command, or None if the command
+            must be run in the calling process instead
+    """
+    if not can_forward(argv):
+        return None
+
+    env = dict(os.environ)
+    if 'SPACK_COLOR' not in env and sys.stdout.isatty():
+        env['SPACK_COLOR'] = 'always'
+
+    try:
+        response = request(
+            {'argv': list(argv), 'cwd': os.getcwd(), 'env': env}, path)
+    except (socket.error, OSError) as e:
+        # Timeouts have no errno: the server is busy or hung, so do not
+        # start another one
+        if e.errno in (errno.ENOENT, errno.ECONNREFUSED):
+            start_in_background(path)
+        return None
+    except ValueError:
+        return None
+
+    if response.get('fallback'):
+        return None
+
+    sys.stdout.write(response['stdout'])
+    sys.stdout.flush()
+    sys.stderr.write(response['stderr'])
+    sys.stderr.flush()
+    return response['returncode']
+
+
+def daemonize():
+    """Detach the current process from its terminal.
+
+    Returns:
+        (bool): True in the detached process, False in the original one
+    """
+    if os.fork() != 0:
+        return False
+    os.setsid()
+    if os.fork() != 0:
+        os._exit(0)
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in range(3):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return True
+
+
+class Server(object):
+    """Long-lived process that runs Spack commands with warm caches."""
+
+    def __init__(self, path=None, idle_timeout=default_idle_timeout):
+        """Create a server listening on a Unix socket.
+
+        Args:
+            path (str): path to the socket; defaults to ``socket_path()``
+            idle_timeout (int or None): seconds without requests after which
+                the server exits, or None to never time out
+        """
+        self.path = path or socket_path()
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.handled = 0
+        self._config_stamp = None
+        self._repo_stamp = None
+        self._lock_fd = None
+
+    def _compute_config_stamp(self):
+        import spack.config
+
+        stamp = []
+        for scope in spack.config.config.file_scopes:
+            for section in spack.config.section_schemas:
+                filename = scope.get_section_filename(section)
+                try:
+                    sinfo = os.stat(filename)
+                    stamp.append((filename, sinfo.st_mtime, sinfo.st_size))
+                except OSError:
+                    pass
+        return stamp
+
+    def _compute_repo_stamp(self):
+        import spack.repo
+
+        stamp = []
+        for repo in spack.repo.path.repos:
+            # FastPackageChecker caches stat() results of package files at
+            # class level, so refresh them before comparing
+            repo._pkg_checker.invalidate()
+            stamp.append(
+                (repo.root, len(repo._pkg_checker), repo.last_mtime()))
+        return stamp
+
+    def _read_caches(self):
+        import spack.config
+        import spack.repo
+        import spack.store
+
+        for section in spack.config.section_schemas:
+            spack.config.config.get_config(section)
+        spack.repo.path.provider_index
+        with spack.store.db.read_transaction():
+            pass
+
+    def warm(self):
+        """Read configuration, repository indexes and the database."""
+        self._read_caches()
+        self._config_stamp = self._compute_config_stamp()
+        self._repo_stamp = self._compute_repo_stamp()
+
+    def revalidate(self):
+        """Drop cached state that is out of date with respect to disk.
+
+        The install database re-reads itself whenever its index verifier
+        changes, so only configuration and repositories are checked here.
+        """
+        import spack.config
+        import spack.repo
+
+        config_stamp = self._compute_config_stamp()
+        if config_stamp != self._config_stamp:
+            spack.config.config.clear_caches()
+            self._config_stamp = config_stamp
+
+        repo_stamp = self._compute_repo_stamp()
+        if repo_stamp != self._repo_stamp:
+            old_path = spack.repo.path
+            new_path = spack.repo.RepoPath(*[r.root for r in old_path.repos])
+            if old_path in sys.meta_path:
+                sys.meta_path.remove(old_path)
+            spack.repo.set_path(new_path)
+            self._repo_stamp = repo_stamp
+
+        # Re-populate whatever was dropped, so that children start warm
+        self._read_caches()
+
+    def _listen(self):
+        # The lock is held for the lifetime of the server, so that only one
+        # server listens on a given path
+        self._lock_fd = _try_lock(lock_path(self.path))
+        if self._lock_fd is None:
+            raise ServerError(
+                'a server is already running on {0}'.format(self.path))
+
+        # Remove a stale socket left behind by a server that died
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(16)
+        return sock
+
+    def _reap_children(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                return
+            if pid == 0:
+                return
+
+    def serve_forever(self):
+        """Handle requests until stopped or idle for too long."""
+        try:
+            sock = self._listen()
+        except BaseException:
+            self._unlock()
+            raise
+
+        try:
+            self.warm()
+            while True:
+                readable, _, _ = select.select(
+                    [sock], [], [], self.idle_timeout)
+                if not readable:
+                    break
+
+                conn, _ = sock.accept()
+                self._reap_children()
+
+                # Requests are read one at a time, so a client that does
+                # not send anything must not hold up the others
+                conn.settimeout(receive_timeout)
+                try:
+                    message = _receive(conn)
+                except (socket.error, OSError, ValueError):
+                    conn.close()
+                    continue
+                conn.settimeout(None)
+
+                command = message.get('command')
+                if command == 'stop':
+                    _send(conn, {'pid': os.getpid()})
+                    conn.close()
+                    break
+                elif command == 'ping':
+                    _send(conn, {
+                        'pid': os.getpid(),
+                        'started': self.started,
+                        'handled': self.handled,
+                    })
+                    conn.close()
+                    continue
+
+                self.revalidate()
+                self.handled += 1
+                if os.fork() == 0:
+                    try:
+                        self._handle(conn, message)
+                    finally:
+                        os._exit(0)
+                conn.close()
+        finally:
+            sock.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._reap_children()
+            self._unlock()
+
+    def _unlock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _handle(self, conn, message):
+        """Run one command in a forked child and send back its output."""
+        import spack.main
+
+        out = tempfile.TemporaryFile()
+        err = tempfile.TemporaryFile()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(devnull, 0)
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+
+        try:
+            os.chdir(message['cwd'])
+            os.environ.clear()
+            os.environ.update(message['env'])
+            sys.argv = ['spack'] + message['argv']
+            returncode = spack.main.main(message['argv'])
+        except SystemExit as e:
+            returncode = e.code
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+
+        if returncode is None:
+            returncode = 0
+        elif not isinstance(returncode, int):
+            sys.stderr.write('{0}\n'.format(returncode))
+            returncode = 1
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        out.seek(0)
+        err.seek(0)
+        _send(conn, {
+            'returncode': returncode,
+            'stdout': out.read().decode('utf-8', 'replace'),
+            'stderr': err.read().decode('utf-8', 'replace'),
+        })
+        conn.close()
+
+
+class ServerError(spack.error.SpackError):
+    """Raised when a server cannot be started."""
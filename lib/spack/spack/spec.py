@@ -124,6 +124,7 @@
 
 __all__ = [
     'Spec',
+    'SpecMatcher',
     'parse',
     'SpecParseError',
     'DuplicateDependencyError',
@@ -181,6 +182,42 @@
 default_format += '{%compiler.name}{@compiler.version}{compiler_flags}'
 default_format += '{variants}{arch=architecture}'
 
+#: Canonical instances of immutable values read from spec dictionaries.
+#: The table is bounded, so that long-lived processes like the command
+#: server do not keep every value they ever read.
+_interned = lang.LRUCache(1 << 16)
+
+
+def _intern_key(value):
+    # Equal values of different types, like 1 and True, hash the same
+    if isinstance(value, tuple):
+        return tuple, tuple(_intern_key(v) for v in value)
+    return type(value), value
+
+
+def _intern(value):
+    """Return a canonical instance of an immutable, hashable value.
+
+    Concrete specs read from a database or a lockfile repeat the same few
+    names, namespaces, versions, targets and variant values many times;
+    sharing a single instance of each keeps large DAGs small in memory.
+    """
+    key = _intern_key(value)
+    if key in _interned:
+        return _interned[key]
+    _interned[key] = value
+    return value
+
+
+#: Memoized results of ``satisfies()`` for concrete specs, keyed by their
+#: DAG hash and the canonical form of the constraint. Cleared whenever the
+#: package repositories change, as virtual providers come from packages.
+satisfies_cache = lang.LRUCache(16384)
+
+#: Specs parsed from strings, keyed by the current platform and the string.
+#: The parser hands out copies, so cached specs are never modified.
+parse_cache = lang.LRUCache(4096)
+
 
 def colorize_spec(spec):
     """Returns a spec colorized according to the colors specified in
@@ -520,7 +557,8 @@ def from_dict(d):
         operating_system = d.get('platform_os', None) or d['os']
         target = spack.architecture.Target.from_dict_or_value(d['target'])
 
-        return ArchSpec((d['platform'], operating_system, target))
+        return ArchSpec((_intern(d['platform']), _intern(operating_system),
+                         _intern(target)))
 
     def __str__(self):
         return "%s-%s-%s" % (self.platform, self.os, self.target)
@@ -637,7 +675,7 @@ def to_dict(self):
     @staticmethod
     def from_dict(d):
         d = d['compiler']
-        return CompilerSpec(d['name'], vn.VersionList.from_dict(d))
+        return CompilerSpec(_intern(d['name']), vn.VersionList.from_dict(d))
 
     def __str__(self):
         out = self.name
@@ -665,11 +703,14 @@ class DependencySpec(object):
     - parent: Spec that depends on `spec`.
     - deptypes: list of strings, representing dependency relationships.
     """
+    # There is one DependencySpec per edge in the DAG, so don't give each
+    # of them an instance dictionary
+    __slots__ = ('parent', 'spec', 'deptypes')
 
     def __init__(self, parent, spec, deptypes):
         self.parent = parent
         self.spec = spec
-        self.deptypes = tuple(sorted(set(deptypes)))
+        self.deptypes = _intern(tuple(sorted(set(deptypes))))
 
     def update_deptypes(self, deptypes):
         deptypes = set(deptypes)
@@ -1104,7 +1145,10 @@ def __init__(self, spec_like=None,
         self._build_spec = None
 
         if isinstance(spec_like, six.string_types):
-            spec_list = SpecParser(self).parse(spec_like)
+            # Cached specs would overwrite attributes given to the constructor
+            use_cache = not (normal or concrete or external_path or
+                             external_modules or full_hash)
+            spec_list = SpecParser(self).parse(spec_like, use_cache)
             if len(spec_list) > 1:
                 raise ValueError("More than one spec in string: " + spec_like)
             if len(spec_list) < 1:
@@ -1812,17 +1856,26 @@ def to_yaml(self, stream=None, hash=ht.dag_hash):
     def to_json(self, stream=None, hash=ht.dag_hash):
         return sjson.dump(self.to_dict(hash), stream)
 
+    @staticmethod
+    def _variant_from_node_dict(name, value):
+        variant = vt.MultiValuedVariant.from_node_dict(name, value)
+        variant._value = _intern(variant._value)
+        variant._original_value = _intern(variant._original_value)
+        return variant
+
     @staticmethod
     def from_node_dict(node):
         name = next(iter(node))
         node = node[name]
 
         spec = Spec()
-        spec.name = name
-        spec.namespace = node.get('namespace', None)
-        spec._hash = node.get('hash', None)
-        spec._build_hash = node.get('build_hash', None)
-        spec._full_hash = node.get('full_hash', None)
+        spec.name = _intern(name)
+        spec.namespace = _intern(node.get('namespace', None))
+
+        # Hashes are repeated in the dependency lists of dependents
+        spec._hash = _intern(node.get('hash', None))
+        spec._build_hash = _intern(node.get('build_hash', None))
+        spec._full_hash = _intern(node.get('full_hash', None))
 
         if 'version' in node or 'versions' in node:
             spec.versions = vn.VersionList.from_dict(node)
@@ -1840,13 +1893,12 @@ def from_node_dict(node):
                 if name in _valid_compiler_flags:
                     spec.compiler_flags[name] = value
                 else:
-                    spec.variants[name] = vt.MultiValuedVariant.from_node_dict(
+                    spec.variants[name] = Spec._variant_from_node_dict(
                         name, value)
         elif 'variants' in node:
             for name, value in node['variants'].items():
-                spec.variants[name] = vt.MultiValuedVariant.from_node_dict(
-                    name, value
-                )
+                spec.variants[name] = Spec._variant_from_node_dict(
+                    name, value)
             for name in FlagMap.valid_compiler_flags():
                 spec.compiler_flags[name] = []
 
@@ -3187,8 +3239,20 @@ def satisfies(self, other, deps=True, strict=False, strict_deps=False):
           * `strict`: strict means that we *must* meet all the
             constraints specified on other.
         """
-        other = self._autospec(other)
+        # Results for concrete specs only depend on their hash, so they are
+        # memoized when the constraint is a string.
+        if self._concrete and isinstance(other, six.string_types):
+            key = (self.dag_hash(), other, deps, strict)
+            try:
+                return satisfies_cache[key]
+            except KeyError:
+                result = self._satisfies(Spec(other), deps, strict)
+                satisfies_cache[key] = result
+                return result
 
+        return self._satisfies(self._autospec(other), deps, strict)
+
+    def _satisfies(self, other, deps, strict):
         # The only way to satisfy a concrete spec is to match its hash exactly.
         if other.concrete:
             return self.concrete and self.dag_hash() == other.dag_hash()
@@ -4357,6 +4421,44 @@ def __missing__(self, key):
         return value
 
 
+class SpecMatcher(object):
+    """An abstract spec prepared to be matched against many specs.
+
+    Constraints are parsed once, and results for concrete candidates are
+    memoized in ``satisfies_cache``, so a matcher is the cheapest way to
+    filter many installed or concretized specs. Calling the matcher is
+    equivalent to ``candidate.satisfies(spec, deps=deps, strict=strict)``.
+    """
+
+    def __init__(self, spec_like, deps=True, strict=False):
+        self.spec = spec_like
+        if not isinstance(spec_like, Spec):
+            self.spec = Spec(spec_like)
+        self.deps = deps
+        self.strict = strict
+
+        # Constraints are only memoized by their canonical form if abstract,
+        # as concrete constraints are matched by hash anyway.
+        self._key = None
+        if not self.spec.concrete:
+            nodes = [self.spec] + sorted(
+                self.spec.traverse(root=False), key=lambda x: x.name)
+            self._key = tuple((s.namespace, s.format()) for s in nodes)
+
+    def __call__(self, candidate):
+        if self._key is None or not candidate._concrete:
+            return candidate.satisfies(
+                self.spec, deps=self.deps, strict=self.strict)
+
+        key = (candidate.dag_hash(), self._key, self.deps, self.strict)
+        try:
+            return satisfies_cache[key]
+        except KeyError:
+            result = candidate._satisfies(self.spec, self.deps, self.strict)
+            satisfies_cache[key] = result
+            return result
+
+
 #: These are possible token types in the spec grammar.
 HASH, DEP, AT, COLON, COMMA, ON, OFF, PCT, EQ, ID, VAL, FILE = range(12)
 
@@ -4370,32 +4472,31 @@ class SpecLexer(spack.parse.Lexer):
 
     def __init__(self):
         super(SpecLexer, self).__init__([
-            (r'\^', lambda scanner, val: self.token(DEP,   val)),
-            (r'\@', lambda scanner, val: self.token(AT,    val)),
-            (r'\:', lambda scanner, val: self.token(COLON, val)),
-            (r'\,', lambda scanner, val: self.token(COMMA, val)),
-            (r'\+', lambda scanner, val: self.token(ON,    val)),
-            (r'\-', lambda scanner, val: self.token(OFF,   val)),
-            (r'\~', lambda scanner, val: self.token(OFF,   val)),
-            (r'\%', lambda scanner, val: self.token(PCT,   val)),
-            (r'\=', lambda scanner, val: self.token(EQ,    val)),
+            (r'\^', DEP),
+            (r'\@', AT),
+            (r'\:', COLON),
+            (r'\,', COMMA),
+            (r'\+', ON),
+            (r'\-', OFF),
+            (r'\~', OFF),
+            (r'\%', PCT),
+            (r'\=', EQ),
 
             # Filenames match before identifiers, so no initial filename
             # component is parsed as a spec (e.g., in subdir/spec.yaml)
-            (r'[/\w.-]*/[/\w/-]+\.yaml[^\b]*',
-             lambda scanner, v: self.token(FILE, v)),
+            (r'[/\w.-]*/[/\w/-]+\.yaml[^\b]*', FILE),
 
             # Hash match after filename. No valid filename can be a hash
             # (files end w/.yaml), but a hash can match a filename prefix.
-            (r'/', lambda scanner, val: self.token(HASH, val)),
+            (r'/', HASH),
 
             # Identifiers match after filenames and hashes.
-            (spec_id_re, lambda scanner, val: self.token(ID, val)),
+            (spec_id_re, ID),
 
-            (r'\s+', lambda scanner, val: None)],
+            (r'\s+', None)],
             [EQ],
-            [(r'[\S].*', lambda scanner, val: self.token(VAL,    val)),
-             (r'\s+', lambda scanner, val: None)],
+            [(r'[\S].*', VAL),
+             (r'\s+', None)],
             [VAL])
 
 
@@ -4417,6 +4518,34 @@ def __init__(self, initial_spec=None):
         self.previous = None
         self._initial = initial_spec
 
+    def parse(self, text, use_cache=True):
+        """Parse specs from text, reusing the results for repeated strings.
+
+        Strings containing ``/`` may refer to hashes in the database or to
+        files, so they are always parsed from scratch.
+        """
+        if (not use_cache or not isinstance(text, six.string_types) or
+                '/' in text):
+            return super(SpecParser, self).parse(text)
+
+        key = (spack.architecture.platform().name, text)
+        try:
+            cached = parse_cache[key]
+        except KeyError:
+            specs = super(SpecParser, self).parse(text)
+            # Anonymous dependencies would not survive a copy
+            if all(d.name for s in specs for d in s.traverse(root=False)):
+                parse_cache[key] = [s.copy() for s in specs]
+            return specs
+
+        if self._initial is None or not cached:
+            return [s.copy() for s in cached]
+
+        self._initial._dup(cached[0])
+        specs = [self._initial] + [s.copy() for s in cached[1:]]
+        self._initial = None
+        return specs
+
     def do_parse(self):
         specs = []
 
@@ -9,14 +9,17 @@
 import getpass
 import glob
 import hashlib
+import json
+import multiprocessing
 import os
 import shutil
 import stat
 import sys
 import tempfile
+import time
 from six import string_types
 from six import iteritems
-from typing import Dict  # novm
+from typing import Dict, List  # novm
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import mkdirp, can_access, install, install_tree
@@ -27,12 +30,15 @@
 import spack.cmd
 import spack.config
 import spack.error
+import spack.fetch_stats
 import spack.mirror
+import spack.subprocess_context
 import spack.util.lock
 import spack.fetch_strategy as fs
 import spack.util.pattern as pattern
 import spack.util.path as sup
 import spack.util.url as url_util
+import spack.util.web as web_util
 
 from spack.util.crypto import prefix_bits, bit_length
 
@@ -181,6 +187,156 @@ def get_stage_root():
     return _stage_root
 
 
+#: Default largest recorded stage size, in MB, of packages staged in
+#: ``config:tmpfs_stage``
+default_tmpfs_stage_max_size = 4096
+
+#: Free space required in ``config:tmpfs_stage``, relative to the recorded
+#: stage size of a package, to leave room for concurrent builds
+tmpfs_stage_margin = 1.5
+
+#: Key of the recorded stage sizes in the misc cache
+_stage_sizes_key = 'stage-sizes.json'
+
+
+def get_tmpfs_stage_root():
+    """Accessible ``config:tmpfs_stage`` directory, or None."""
+    path = spack.config.get('config:tmpfs_stage')
+    if not path:
+        return None
+    return _first_accessible_path(_resolve_paths([path]))
+
+
+def disk_usage(path):
+    """Disk space used by the files under a directory, in bytes."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def _read_stage_sizes():
+    cache = spack.caches.misc_cache
+    if not cache.init_entry(_stage_sizes_key):
+        return {}
+    with cache.read_transaction(_stage_sizes_key) as f:
+        try:
+            return json.load(f)
+        except ValueError:
+            return {}
+
+
+def _stage_size_key(spec):
+    return '{0}@{1}'.format(spec.name, spec.version)
+
+
+def record_stage_size(spec, path, failed=False):
+    """Record the disk space used by the stage of a concrete spec after
+    building it, to choose where to stage it next time.
+
+    A failed build in ``config:tmpfs_stage``, which may have run out of
+    space there, is recorded without a size, so that the package is staged
+    in the usual stage root until it builds successfully. Sizes are only
+    recorded when ``config:tmpfs_stage`` is set.
+    """
+    if not spack.config.get('config:tmpfs_stage') or not os.path.isdir(path):
+        return
+
+    if failed:
+        tmpfs_root = get_tmpfs_stage_root()
+        parent = os.path.dirname(os.path.realpath(path))
+        if not tmpfs_root or parent != os.path.realpath(tmpfs_root):
+            return
+        size = None
+        tty.debug('Build of {0} failed in {1}, it will be staged in the '
+                  'build stage next time'.format(spec.name, tmpfs_root))
+    else:
+        size = disk_usage(path)
+        tty.debug('Stage of {0} uses {1:.1f} MB'.format(
+            spec.name, size / float(1 << 20)))
+
+    cache = spack.caches.misc_cache
+    cache.init_entry(_stage_sizes_key)
+    with cache.write_transaction(_stage_sizes_key) as (old, new):
+        sizes = {}
+        if old:
+            try:
+                sizes = json.load(old)
+            except ValueError:
+                pass
+        sizes[_stage_size_key(spec)] = size
+        json.dump(sizes, new)
+
+
+def recorded_stage_size(spec):
+    """Disk space used by the last build of a concrete spec, in bytes.
+
+    If this version was never built, returns the largest size recorded for
+    other versions of the package. Returns None if the package was never
+    built at all, or if the last build of this version failed in
+    ``config:tmpfs_stage``.
+    """
+    sizes = _read_stage_sizes()
+    key = _stage_size_key(spec)
+    if key in sizes:
+        return sizes[key]
+    others = [v for k, v in sizes.items()
+              if k.rsplit('@', 1)[0] == spec.name and v is not None]
+    return max(others) if others else None
+
+
+def _free_space(path):
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def get_stage_root_for(spec, name):
+    """Stage root for the stage of a concrete spec.
+
+    Packages are staged in ``config:tmpfs_stage`` if their recorded stage
+    size is at most ``config:tmpfs_stage_max_size`` MB and fits in its free
+    space with a margin; packages that were never built, are too large, or
+    whose last build failed in ``config:tmpfs_stage``, are staged in the
+    usual stage root. A stage that already exists is used where it is,
+    unless it is the stage of such a failed build.
+
+    Args:
+        spec (spack.spec.Spec): concrete spec being staged
+        name (str): name of the stage
+    """
+    root = get_stage_root()
+    tmpfs_root = get_tmpfs_stage_root()
+    if not tmpfs_root:
+        return root
+
+    sizes = _read_stage_sizes()
+    failed = sizes.get(_stage_size_key(spec), 0) is None
+    for path in (root,) if failed else (tmpfs_root, root):
+        if os.path.exists(os.path.join(path, name)):
+            return path
+
+    size = recorded_stage_size(spec)
+    if size is None:
+        return root
+
+    max_size = spack.config.get(
+        'config:tmpfs_stage_max_size', default_tmpfs_stage_max_size)
+    if size <= max_size * (1 << 20):
+        if size * tmpfs_stage_margin <= _free_space(tmpfs_root):
+            return tmpfs_root
+        tty.debug('Not enough free space to stage {0} in {1}'.format(
+            spec.name, tmpfs_root))
+
+    if size > _free_space(root):
+        tty.warn('The last build of {0} used {1:.1f} MB, more than is free '
+                 'in {2}'.format(spec.name, size / float(1 << 20), root))
+    return root
+
+
 def _mirror_roots():
     mirrors = spack.config.get('mirrors')
     return [
@@ -421,9 +577,10 @@ def fetch(self, mirror_only=False, err_msg=None):
             err_msg (str or None): the error message to display if all fetchers
                 fail or ``None`` for the default fetch failure message
         """
+        # Fetchers, with where they get the sources from
         fetchers = []
         if not mirror_only:
-            fetchers.append(self.default_fetcher)
+            fetchers.append((self.default_fetcher, 'url'))
 
         # TODO: move mirror logic out of here and clean it up!
         # TODO: Or @alalazo may have some ideas about how to use a
@@ -458,15 +615,16 @@ def fetch(self, mirror_only=False, err_msg=None):
             # Insert fetchers in the order that the URLs are provided.
             for url in reversed(mirror_urls):
                 fetchers.insert(
-                    0, fs.from_url_scheme(
-                        url, digest, expand=expand, extension=extension))
+                    0, (fs.from_url_scheme(
+                        url, digest, expand=expand, extension=extension),
+                        'mirror'))
 
             if self.default_fetcher.cachable:
                 for rel_path in reversed(list(self.mirror_paths)):
                     cache_fetcher = spack.caches.fetch_cache.fetcher(
                         rel_path, digest, expand=expand,
                         extension=extension)
-                    fetchers.insert(0, cache_fetcher)
+                    fetchers.insert(0, (cache_fetcher, 'cache'))
 
         def generate_fetchers():
             for fetcher in fetchers:
@@ -476,23 +634,32 @@ def generate_fetchers():
             if self.search_fn and not mirror_only:
                 dynamic_fetchers = self.search_fn()
                 for fetcher in dynamic_fetchers:
-                    yield fetcher
+                    yield fetcher, 'url'
 
         def print_errors(errors):
             for msg in errors:
                 tty.debug(msg)
 
+        # Sources that are already in the stage are not fetched again
+        record = not (self.archive_file or self.expanded)
+
         errors = []
-        for fetcher in generate_fetchers():
+        for fetcher, source in generate_fetchers():
+            start = time.time()
             try:
                 fetcher.stage = self
                 self.fetcher = fetcher
                 self.fetcher.fetch()
+                if record:
+                    self._record_fetch(fetcher, source, start, len(errors))
                 break
             except spack.fetch_strategy.NoCacheError:
                 # Don't bother reporting when something is not cached.
                 continue
             except spack.error.SpackError as e:
+                if record:
+                    self._record_fetch(
+                        fetcher, source, start, len(errors), str(e))
                 errors.append('Fetching from {0} failed.'.format(fetcher))
                 tty.debug(e)
                 continue
@@ -504,6 +671,18 @@ def print_errors(errors):
 
         print_errors(errors)
 
+    def _record_fetch(self, fetcher, source, start, previous_failures,
+                      error=None):
+        size = 0
+        if error is None:
+            if self.archive_file:
+                size = os.path.getsize(self.archive_file)
+            elif self.expanded:
+                size = disk_usage(self.source_path)
+        spack.fetch_stats.record(
+            self.name, source, getattr(fetcher, 'url', None) or str(fetcher),
+            size, time.time() - start, previous_failures, error)
+
     def steal_source(self, dest):
         """Copy the source_path directory in its entirety to directory dest
 
@@ -809,18 +988,87 @@ def ensure_access(file):
 
 
 def purge():
-    """Remove all build directories in the top-level stage path."""
-    root = get_stage_root()
-    if os.path.isdir(root):
+    """Remove all build directories in the top-level stage paths."""
+    for root in (get_stage_root(), get_tmpfs_stage_root()):
+        if not root or not os.path.isdir(root):
+            continue
         for stage_dir in os.listdir(root):
             if stage_dir.startswith(stage_prefix) or stage_dir == '.lock':
                 stage_path = os.path.join(root, stage_dir)
                 remove_linked_tree(stage_path)
 
 
+#: (url, fetch options, keep stage, stage function, stage name) of the
+#: archives checksummed by ``get_checksums_for_versions``
+_checksum_args = []  # type: List[tuple]
+
+
+def _checksum_archive(url, fetch_options=None, keep_stage=False,
+                      stage_function=None, stage_name=None):
+    """Downloads an archive and returns its sha256 checksum.
+
+    The archive is hashed while it is downloaded, without writing it to
+    disk, unless it has to be kept in a stage or inspected by
+    ``stage_function``, it needs a cookie to be fetched, or
+    ``config:url_fetch_method`` is ``curl``. The ``timeout`` fetch option
+    applies in both cases.
+
+    A named stage is kept after the checksum, so that a later call with
+    the same ``stage_name`` reuses the downloaded archive.
+    """
+    if keep_stage or stage_function or stage_name or \
+            (fetch_options and fetch_options.get('cookie')) or \
+            spack.config.get('config:url_fetch_method') == 'curl':
+        if fetch_options:
+            url_or_fs = fs.URLFetchStrategy(url, fetch_options=fetch_options)
+        else:
+            url_or_fs = url
+        keep = keep_stage or bool(stage_name and not stage_function)
+        with Stage(url_or_fs, name=stage_name, keep=keep) as stage:
+            stage.fetch()
+            if stage_function:
+                stage_function(stage, url)
+            return spack.util.crypto.checksum(
+                hashlib.sha256, stage.archive_file)
+
+    timeout = None
+    if fetch_options and fetch_options.get('timeout'):
+        timeout = int(fetch_options['timeout'])
+    _, _, response = web_util.read_from_url(url, timeout=timeout)
+    hasher = hashlib.sha256()
+    try:
+        for chunk in iter(lambda: response.read(1 << 20), b''):
+            hasher.update(chunk)
+    finally:
+        response.close()
+    return hasher.hexdigest()
+
+
+def _try_checksum_archive(url, *args):
+    """Like ``_checksum_archive``, but reports errors instead of raising.
+
+    Returns:
+        (tuple): the checksum or None, whether the download failed, and
+            the error message
+    """
+    try:
+        return _checksum_archive(url, *args), False, None
+    except (FailedDownloadError, web_util.SpackWebError):
+        return None, True, 'Failed to fetch {0}'.format(url)
+    except Exception as e:
+        return None, False, 'Something failed on {0}, skipping.  ({1})'.format(
+            url, e)
+
+
+def _checksum_version(index):
+    """Checksums an archive in a process of the pool of
+    ``get_checksums_for_versions``."""
+    return _try_checksum_archive(*_checksum_args[index])
+
+
 def get_checksums_for_versions(
         url_dict, name, first_stage_function=None, keep_stage=False,
-        fetch_options=None, batch=False):
+        fetch_options=None, batch=False, jobs=None):
     """Fetches and checksums archives from URLs.
 
     This function is called by both ``spack checksum`` and ``spack
@@ -828,6 +1076,12 @@ def get_checksums_for_versions(
     inspect the first downloaded archive, e.g., to determine the build
     system.
 
+    Archives are downloaded concurrently by a pool of processes, which
+    requires fork(); where processes are spawned instead they are
+    downloaded one after another. While an archive still has to be
+    inspected, the pool downloads into stages that are kept until the
+    end, so the next archive is inspected without fetching it again.
+
     Args:
         url_dict (dict): A dictionary of the form: version -> URL
         name (str): The name of the package
@@ -838,11 +1092,15 @@ def get_checksums_for_versions(
             or fetch all versions (true)
         fetch_options (dict): Options used for the fetcher (such as timeout
             or cookies)
+        jobs (int): number of archives downloaded at the same time; defaults
+            to ``config:fetch_jobs``
 
     Returns:
         (str): A multi-line string containing versions and corresponding hashes
 
     """
+    global _checksum_args
+
     sorted_versions = sorted(url_dict.keys(), reverse=True)
 
     # Find length of longest string in the list for padding
@@ -869,33 +1127,72 @@ def get_checksums_for_versions(
     versions = sorted_versions[:archives_to_fetch]
     urls = [url_dict[v] for v in versions]
 
+    if jobs is None:
+        jobs = spack.config.get('config:fetch_jobs', 1)
+
     tty.debug('Downloading...')
+    results = {}
+    pool = None
+    stage_names = [None] * len(urls)
+    if first_stage_function:
+        stage_names = [stage_prefix + next(tempfile._get_candidate_names())
+                       for url in urls]
+    try:
+        _checksum_args = [(url, fetch_options, keep_stage, None, stage_name)
+                          for url, stage_name in zip(urls, stage_names)]
+        indices = list(range(len(urls)))
+
+        # The first archive is inspected in this process, while the pool
+        # downloads the others
+        first = 0 if first_stage_function else None
+        pending = [i for i in indices if i != first]
+        if jobs > 1 and len(pending) > 1 and \
+                not spack.subprocess_context._serialize:
+            pool = multiprocessing.Pool(min(jobs, len(pending)))
+            async_results = pool.map_async(_checksum_version, pending)
+        else:
+            async_results = None
+
+        if first is not None:
+            results[first] = _try_checksum_archive(
+                urls[first], fetch_options, keep_stage, first_stage_function,
+                stage_names[first])
+            if results[first][0]:
+                first_stage_function = None
+
+        if async_results:
+            results.update(zip(pending, async_results.get()))
+        else:
+            results.update((i, _checksum_version(i)) for i in pending)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        _checksum_args = []
+
     version_hashes = []
-    i = 0
     errors = []
-    for url, version in zip(urls, versions):
-        try:
-            if fetch_options:
-                url_or_fs = fs.URLFetchStrategy(
-                    url, fetch_options=fetch_options)
-            else:
-                url_or_fs = url
-            with Stage(url_or_fs, keep=keep_stage) as stage:
-                # Fetch the archive
-                stage.fetch()
-                if i == 0 and first_stage_function:
-                    # Only run first_stage_function the first time,
-                    # no need to run it every time
-                    first_stage_function(stage, url)
-
-                # Checksum the archive and add it to the list
-                version_hashes.append((version, spack.util.crypto.checksum(
-                    hashlib.sha256, stage.archive_file)))
-                i += 1
-        except FailedDownloadError:
-            errors.append('Failed to fetch {0}'.format(url))
-        except Exception as e:
-            tty.msg('Something failed on {0}, skipping.  ({1})'.format(url, e))
+    for i, (version, url) in enumerate(zip(versions, urls)):
+        checksum, failed_download, msg = results[i]
+        if checksum and first_stage_function:
+            # The first archive could not be fetched or inspected, so
+            # inspect the next one that could be fetched, in the stage it
+            # was downloaded to
+            checksum, failed_download, msg = _try_checksum_archive(
+                url, fetch_options, keep_stage, first_stage_function,
+                stage_names[i])
+            if checksum:
+                first_stage_function = None
+
+        if stage_names[i] and not keep_stage:
+            remove_linked_tree(os.path.join(get_stage_root(), stage_names[i]))
+
+        if checksum:
+            version_hashes.append((version, checksum))
+        elif failed_download:
+            errors.append(msg)
+        else:
+            tty.msg(msg)
 
     for msg in errors:
         tty.debug(msg)
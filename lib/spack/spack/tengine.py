@@ -3,11 +3,14 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import itertools
+import os
 import textwrap
-from typing import List  # novm
+from typing import Any, Dict, List, Optional, Tuple  # novm
 
 import llnl.util.lang
+import llnl.util.tty as tty
 import six
+from llnl.util.filesystem import mkdirp
 
 import spack.config
 from spack.util.path import canonicalize_path
@@ -47,7 +50,17 @@ def context_property(cls, func):
         """
         name = func.__name__
         cls._new_context_properties.append(name)
-        return property(func)
+
+        # Context properties may be expensive to compute and are used
+        # more than once while rendering, so compute them once per object
+        def getter(self):
+            cache = self.__dict__.setdefault('_context_property_cache', {})
+            if func not in cache:
+                cache[func] = func(self)
+            return cache[func]
+        getter.__name__ = name
+        getter.__doc__ = func.__doc__
+        return property(getter)
 
 
 #: A saner way to use the decorator
@@ -65,8 +78,37 @@ def to_dict(self):
         return dict(d)
 
 
+#: Environments for template rendering, by search path and cache directory
+_environments = {}  # type: Dict[Tuple[Tuple[str, ...], Optional[str]], Any]
+
+
+def bytecode_cache_location():
+    """Directory where compiled templates are stored."""
+    import spack.caches
+    return os.path.join(spack.caches.misc_cache_location(), 'templates')
+
+
+def _bytecode_cache(path):
+    # avoid importing this at the top level as it's used infrequently and
+    # slows down startup a bit.
+    import jinja2
+
+    try:
+        mkdirp(path)
+    except OSError as e:
+        tty.debug('Not caching compiled templates in {0}: {1}'.format(
+            path, str(e)))
+        return None
+    return jinja2.FileSystemBytecodeCache(path)
+
+
 def make_environment(dirs=None):
-    """Returns an configured environment for template rendering."""
+    """Returns an configured environment for template rendering.
+
+    Environments are shared within a process, so templates are compiled
+    at most once. Compiled templates are also stored under the
+    ``misc_cache``, where other Spack processes can load them from.
+    """
     if dirs is None:
         # Default directories where to search for templates
         builtins = spack.config.get('config:template_dirs',
@@ -75,6 +117,11 @@ def make_environment(dirs=None):
         dirs = [canonicalize_path(d)
                 for d in itertools.chain(builtins, extensions)]
 
+    cache_dir = bytecode_cache_location()
+    key = (tuple(dirs), cache_dir)
+    if key in _environments:
+        return _environments[key]
+
     # avoid importing this at the top level as it's used infrequently and
     # slows down startup a bit.
     import jinja2
@@ -83,11 +130,12 @@ def make_environment(dirs=None):
     loader = jinja2.FileSystemLoader(dirs)
     # Environment of the template engine
     env = jinja2.Environment(
-        loader=loader, trim_blocks=True, lstrip_blocks=True
+        loader=loader, trim_blocks=True, lstrip_blocks=True,
+        bytecode_cache=_bytecode_cache(cache_dir)
     )
     # Custom filters
     _set_filters(env)
-    return env
+    return _environments.setdefault(key, env)
 
 
 # Extra filters for template engine environment
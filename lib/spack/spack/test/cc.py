@@ -10,6 +10,7 @@
 import os
 import pytest
 
+import spack.build_environment
 from spack.paths import build_env_path
 from spack.util.environment import system_dirs, set_env
 from spack.util.executable import Executable
@@ -128,6 +129,11 @@ def wrapper_flags():
 pytestmark = pytest.mark.usefixtures('wrapper_environment')
 
 
+def dump_args(cc, args):
+    with set_env(SPACK_TEST_COMMAND='dump-args'):
+        return cc(*args, output=str).strip().split('\n')
+
+
 def check_args(cc, args, expected):
     """Check output arguments that cc produces when called with args.
 
@@ -643,3 +649,58 @@ def test_linker_strips_loopopt(wrapper_flags):
         result = cc(*(test_args + ["-loopopt=0", "-c", "x.c"]), output=str)
         result = result.strip().split('\n')
         assert '-loopopt=0' in result
+
+
+#: environment with dependencies for the compiler wrapper cache tests
+deps_environment = {
+    'SPACK_INCLUDE_DIRS': 'xinc:y inc:zinc',
+    'SPACK_RPATH_DIRS': 'xlib:ylib:zlib',
+    'SPACK_LINK_DIRS': 'xlib:ylib:',
+    'SPACK_COMPILER_EXTRA_RPATHS': '/extra/lib',
+    'SPACK_COMPILER_IMPLICIT_RPATHS': '/implicit/lib',
+}
+
+
+@pytest.mark.parametrize('compiler,args', [
+    (cc, test_args),
+    (cc, test_args + ['-isystem', 'fooinc']),
+    (cc, ['-c'] + test_args),
+    (cpp, test_args),
+    (cxx, test_args),
+    (fc, test_args),
+    (ld, test_args),
+    (ld, ['-r'] + test_args),
+])
+def test_wrapper_cache(tmpdir, wrapper_flags, compiler, args):
+    """Ensure the cached arguments give the same command as computing
+    them in the wrapper."""
+    cache = str(tmpdir.join('cache.sh'))
+    with set_env(**deps_environment):
+        expected = dump_args(compiler, args)
+        with set_env(SPACK_WRAPPER_CACHE=None):
+            spack.build_environment.write_wrapper_cache(cache)
+            assert os.environ['SPACK_WRAPPER_CACHE'] == cache
+            assert dump_args(compiler, args) == expected
+
+        with set_env(SPACK_SHORT_SPEC='foo@1.2 arch=darwin-mojave-x86_64'):
+            expected = dump_args(compiler, args)
+            with set_env(SPACK_WRAPPER_CACHE=cache):
+                assert dump_args(compiler, args) == expected
+
+
+def test_wrapper_cache_is_checked(tmpdir):
+    """Ensure the wrapper only uses a cache computed from the current
+    values of the variables."""
+    cache = str(tmpdir.join('cache.sh'))
+    with set_env(SPACK_WRAPPER_CACHE=None, **deps_environment):
+        spack.build_environment.write_wrapper_cache(cache)
+
+        # Make the cache recognizable in the output
+        with open(cache, 'a') as f:
+            f.write("spack_include_dirs=(cachedinc)\n")
+        assert '-Icachedinc' in dump_args(cc, test_args)
+
+        with set_env(SPACK_INCLUDE_DIRS='xinc'):
+            output = dump_args(cc, test_args)
+            assert '-Icachedinc' not in output
+            assert '-Ixinc' in output
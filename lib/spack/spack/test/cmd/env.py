@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import glob
 import os
+import sys
 from six import StringIO
 
 import pytest
@@ -14,8 +15,10 @@
 import spack.hash_types as ht
 import spack.modules
 import spack.environment as ev
+import spack.user_environment as uenv
 
 from spack.cmd.env import _env_create
+from spack.filesystem_view import YamlFilesystemView
 from spack.spec import Spec
 from spack.main import SpackCommand, SpackCommandError
 from spack.stage import stage_prefix
@@ -212,6 +215,12 @@ def test_env_modifications_error_on_activate(
     def setup_error(pkg, env):
         raise RuntimeError("cmake-client had issues!")
 
+    # Without a record of the run environment from the installation, the
+    # package is asked for it
+    for spec in e.all_specs():
+        fs.force_remove(os.path.join(
+            spec.prefix, '.spack', uenv.run_environment_file_name))
+
     pkg = spack.repo.path.get_pkg_class("cmake-client")
     monkeypatch.setattr(pkg, "setup_run_environment", setup_error)
     with e:
@@ -1269,6 +1278,68 @@ def test_env_updates_view_force_remove(
     check_viewdir_removal(view_dir)
 
 
+def test_env_updates_view_incrementally(
+        tmpdir, mock_stage, mock_fetch, install_mockery, monkeypatch):
+    view_dir = tmpdir.join('view')
+    env('create', '--with-view=%s' % view_dir, 'test')
+    with ev.read('test'):
+        install('--fake', 'libelf')
+
+    linked = []
+    add_specs = YamlFilesystemView.add_specs
+
+    def _add_specs(view, *specs, **kwargs):
+        linked.extend(s.name for s in specs)
+        return add_specs(view, *specs, **kwargs)
+    monkeypatch.setattr(YamlFilesystemView, 'add_specs', _add_specs)
+
+    # Specs already in the view are not linked again
+    with ev.read('test'):
+        install('--fake', 'mpileaks')
+
+    check_mpileaks_and_deps_in_view(view_dir)
+    assert 'mpileaks' in linked
+    assert 'libelf' not in linked
+
+    # Removed specs are unlinked, others are left alone
+    del linked[:]
+    with ev.read('test'):
+        remove('mpileaks')
+        concretize()
+
+    assert not linked
+    assert not os.path.exists(str(view_dir.join('.spack', 'mpileaks')))
+    assert os.path.exists(str(view_dir.join('.spack', 'libelf')))
+    assert len(os.listdir(str(tmpdir.join('._view')))) == 1
+
+
+def test_clone_view_root(tmpdir):
+    prefix = tmpdir.ensure('prefix', dir=True)
+    prefix.ensure('bin', 'tool').write('tool')
+    src = tmpdir.ensure('src', dir=True)
+    src.ensure('bin', dir=True).join('tool').mksymlinkto(
+        prefix.join('bin', 'tool'))
+    src.join('lib').mksymlinkto(prefix.ensure('lib', dir=True))
+    src.ensure('.spack', 'merged.pth').write('merged')
+
+    dest = tmpdir.join('dest')
+    ev._clone_view_root(str(src), str(dest))
+
+    for name in (('bin', 'tool'), ('lib',)):
+        link = dest.join(*name)
+        assert link.islink()
+        assert link.readlink() == src.join(*name).readlink()
+    if sys.version_info >= (3, 3):
+        assert (os.lstat(str(dest.join('bin', 'tool'))).st_ino ==
+                os.lstat(str(src.join('bin', 'tool'))).st_ino)
+
+    # Regular files are copies, which can be modified in place
+    merged = dest.join('.spack', 'merged.pth')
+    assert not merged.islink()
+    merged.write('changed')
+    assert src.join('.spack', 'merged.pth').read() == 'merged'
+
+
 def test_env_activate_view_fails(
         tmpdir, mock_stage, mock_fetch, install_mockery, env_deactivate):
     """Sanity check on env activate to make sure it requires shell support"""
@@ -3,9 +3,15 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import os
+import time
+
 import pytest
 
+import spack.config
 import spack.environment as ev
+import spack.fetch_stats
+import spack.spec
 
 from spack.main import SpackCommand, SpackCommandError
 
@@ -46,3 +52,57 @@ def test_fetch_multiple_specs(
 def test_fetch_no_argument():
     with pytest.raises(SpackCommandError):
         SpackCommand("fetch")()
+
+
+@pytest.mark.disable_clean_stage_check
+def test_fetch_jobs(
+    tmpdir, mock_archive, mock_stage, mock_fetch, install_mockery
+):
+    SpackCommand("fetch")("-j", "2", "-D", "mpileaks")
+
+    spec = spack.spec.Spec("mpileaks").concretized()
+    for s in spec.traverse():
+        assert s.package.stage.archive_file
+
+
+def test_fetch_stats(tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        spack.fetch_stats, 'stats_dir', lambda: str(tmpdir))
+    out = SpackCommand("fetch")("--stats")
+    assert "No fetch statistics recorded" in out
+
+    monkeypatch.setenv(
+        spack.fetch_stats.session_variable, str(tmpdir.join('s.jsonl')))
+    with spack.config.override('config:fetch_stats', True):
+        spack.fetch_stats.record(
+            'spack-stage-zlib-1.2.11-' + 'a' * 32, 'cache',
+            'file:///cache/zlib-1.2.11.tar.gz', 2 ** 20, 0.5, 0)
+        spack.fetch_stats.record(
+            'spack-stage-mpich-3.0-' + 'b' * 32, 'mirror',
+            'https://mirror.example.com/mpich-3.0.tar.gz', 0, 2.0, 1,
+            error='timed out')
+
+    out = SpackCommand("fetch")("--stats")
+    assert "2 fetches recorded" in out
+    assert "hit rate: 100.0%" in out
+    assert "mirror.example.com (mirror)" in out
+    assert "zlib-1.2.11" in out and "mpich-3.0" in out
+
+
+def test_fetch_stats_prune(tmpdir, monkeypatch):
+    """Old session files are pruned, but not those of recent sessions,
+    which may still be running."""
+    monkeypatch.setattr(
+        spack.fetch_stats, 'stats_dir', lambda: str(tmpdir))
+    monkeypatch.setattr(spack.fetch_stats, 'max_sessions', 2)
+    monkeypatch.delenv(spack.fetch_stats.session_variable, raising=False)
+    now = time.time()
+    for i, age in enumerate([3, 2, 0, 0]):
+        path = tmpdir.join('{0}.jsonl'.format(i))
+        path.write('')
+        mtime = now - age * spack.fetch_stats.min_prune_age - 60
+        os.utime(str(path), (mtime, mtime))
+
+    spack.fetch_stats.session_file()
+    assert sorted(p.basename for p in tmpdir.listdir()) == [
+        '2.jsonl', '3.jsonl']
@@ -5,6 +5,7 @@
 import os
 import pytest
 from spack.main import SpackCommand, SpackCommandError
+import spack.repo
 import spack.spec
 import spack.user_environment as uenv
 
@@ -86,6 +87,87 @@ def test_load_includes_run_env(install_mockery, mock_fetch, mock_archive,
     assert 'setenv FOOBAR mpileaks' in csh_out
 
 
+def test_load_replays_recorded_run_env(
+        install_mockery, mock_fetch, mock_archive, mock_packages,
+        monkeypatch):
+    """Tests that the run environment recorded at install time is used
+    without asking the package, unless the spec changed since then"""
+    install('mpileaks')
+    mpileaks_spec = spack.spec.Spec('mpileaks').concretized()
+    recorded = os.path.join(
+        mpileaks_spec.prefix, '.spack', uenv.run_environment_file_name)
+    assert os.path.exists(recorded)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('package code should not run')
+
+    monkeypatch.setattr(
+        type(mpileaks_spec.package), 'setup_run_environment', fail)
+    assert 'export FOOBAR=mpileaks' in load('--sh', 'mpileaks')
+    monkeypatch.undo()
+
+    # A record for another version of the spec is ignored
+    with open(recorded) as f:
+        data = f.read()
+    with open(recorded, 'w') as f:
+        f.write(data.replace(mpileaks_spec.full_hash(), 'x' * 32))
+    env = uenv.environment_modifications_for_spec(mpileaks_spec)
+    assert 'FOOBAR' in [x.name for x in env]
+
+
+def test_load_does_not_need_the_repository(
+        install_mockery, mock_fetch, mock_archive, mock_packages,
+        monkeypatch):
+    """Tests that loading installed specs with a recorded run environment
+    does not import packages or read repository indexes"""
+    install('mpileaks')
+    install('libelf@0.8.12')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the repository should not be used')
+
+    for attr in ('get', 'get_pkg_class', 'is_virtual', 'exists',
+                 'providers_for'):
+        monkeypatch.setattr(spack.repo.path, attr, fail)
+
+    sh_out = load('--sh', 'mpileaks')
+    assert 'export FOOBAR=mpileaks' in sh_out
+
+
+def test_load_ignores_record_of_edited_package(
+        install_mockery, mock_fetch, mock_archive, mock_packages,
+        monkeypatch, tmpdir):
+    """Tests that the recorded run environment is not used once the
+    package file changed since the spec was installed"""
+    install('mpileaks')
+    mpileaks_spec = spack.spec.Spec('mpileaks').concretized()
+    assert 'export FOOBAR=mpileaks' in load('--sh', 'mpileaks')
+
+    # Edit the package after the install
+    package_file = spack.repo.path.filename_for_package_name('mpileaks')
+    with open(package_file) as f:
+        text = f.read()
+    edited = tmpdir.join('package.py')
+    edited.write(text.replace(
+        "renv.set('FOOBAR', self.name)", "renv.set('FOOBAR', 'edited')"))
+
+    filename_for_package_name = spack.repo.Repo.filename_for_package_name
+
+    def _filename_for_package_name(repo, name):
+        if name == 'mpileaks':
+            return str(edited)
+        return filename_for_package_name(repo, name)
+
+    def _setup_run_environment(pkg, env):
+        env.set('FOOBAR', 'edited')
+
+    monkeypatch.setattr(spack.repo.Repo, 'filename_for_package_name',
+                        _filename_for_package_name)
+    monkeypatch.setattr(type(mpileaks_spec.package), 'setup_run_environment',
+                        _setup_run_environment)
+    assert 'export FOOBAR=edited' in load('--sh', 'mpileaks')
+
+
 def test_load_first(install_mockery, mock_fetch, mock_archive, mock_packages):
     """Test with and without the --first option"""
     install('libelf@0.8.12')
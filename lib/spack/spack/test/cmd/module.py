@@ -11,6 +11,8 @@
 import spack.config
 import spack.main
 import spack.modules
+import spack.modules.common
+import spack.repo
 import spack.store
 
 module = spack.main.SpackCommand('module')
@@ -99,6 +101,79 @@ def test_remove_and_add(database, module_type):
         assert os.path.exists(item)
 
 
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_refresh_skips_up_to_date_modules(database, jobs):
+    module_file, = _module_files('tcl', 'libelf')
+    with open(module_file) as f:
+        lines = f.readlines()
+    assert 'spack-module-digest:' in lines[-1]
+
+    # The inputs did not change, so the module file is left alone
+    with open(module_file, 'w') as f:
+        f.writelines(['## edited\n'] + lines)
+    module('tcl', 'refresh', '-y', '-j', jobs, 'libelf')
+    with open(module_file) as f:
+        assert f.readline() == '## edited\n'
+
+    # Changing the configuration regenerates it
+    verbose = {'default': {'tcl': {'verbose': True}}}
+    with spack.config.override('modules', verbose):
+        module('tcl', 'refresh', '-y', '-j', jobs, 'libelf')
+    with open(module_file) as f:
+        assert f.readline() != '## edited\n'
+
+    module('tcl', 'refresh', '-y', 'libelf')
+    with open(module_file) as f:
+        assert f.readlines()[-1] == lines[-1]
+
+
+def test_refresh_after_package_changes(database, monkeypatch, tmpdir):
+    module_file, = _module_files('tcl', 'libelf')
+    module('tcl', 'refresh', '-y', 'libelf')
+    with open(module_file) as f:
+        lines = f.readlines()
+    with open(module_file, 'w') as f:
+        f.writelines(['## edited\n'] + lines)
+
+    # Installed specs keep their full hash when their package file changes
+    package_file = spack.repo.path.filename_for_package_name('libelf')
+    edited = tmpdir.join('package.py')
+    with open(package_file) as f:
+        edited.write(f.read() + '\n# edited\n')
+    filename_for_package_name = spack.repo.Repo.filename_for_package_name
+
+    def _filename_for_package_name(repo, name):
+        if name == 'libelf':
+            return str(edited)
+        return filename_for_package_name(repo, name)
+
+    monkeypatch.setattr(spack.repo.Repo, 'filename_for_package_name',
+                        _filename_for_package_name)
+    module('tcl', 'refresh', '-y', 'libelf')
+    with open(module_file) as f:
+        assert f.readline() != '## edited\n'
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_write_modules_reports_errors(jobs):
+    class MockWriter(object):
+        def __init__(self, error=None):
+            self.error = error
+
+        def up_to_date(self):
+            if self.error:
+                raise RuntimeError(self.error)
+            return False
+
+        def write(self, overwrite=False):
+            pass
+
+    writers = [MockWriter('no template'), MockWriter()]
+    written, errors = spack.modules.common.write_modules(writers, jobs)
+    assert written == 1
+    assert [e for _, e in errors] == ['no template']
+
+
 @pytest.mark.db
 @pytest.mark.parametrize('cli_args', [
     ['libelf'],
@@ -0,0 +1,155 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import spack.paths
+import spack.server
+from spack.main import SpackCommand
+
+server = SpackCommand('server')
+
+
+@pytest.fixture()
+def running_server(tmpdir, mock_packages, database):
+    path = str(tmpdir.join('server.sock'))
+    srv = spack.server.Server(path=path, idle_timeout=30)
+    thread = threading.Thread(target=srv.serve_forever)
+    thread.start()
+
+    # Wait for the server to accept connections
+    for _ in range(100):
+        try:
+            spack.server.request({'command': 'ping'}, path)
+            break
+        except (socket.error, OSError):
+            time.sleep(0.1)
+    yield srv
+
+    spack.server.request({'command': 'stop'}, path)
+    thread.join()
+
+
+@pytest.mark.parametrize('argv,expected', [
+    (['find'], True),
+    (['load', '--sh', 'zlib'], True),
+    (['env', 'activate', '--sh', 'test'], True),
+    (['env', 'create', 'test'], False),
+    (['install', 'zlib'], False),
+    (['-C', 'scope', 'find'], False),
+    ([], False),
+])
+def test_can_forward(argv, expected):
+    assert spack.server.can_forward(argv) is expected
+
+
+def test_forward_without_server(tmpdir, monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        spack.server, 'start_in_background', lambda p: started.append(p))
+
+    path = str(tmpdir.join('missing.sock'))
+    assert spack.server.forward(['find'], path) is None
+    assert started == [path]
+
+
+def test_forward_round_trip(running_server, capfd):
+    returncode = spack.server.forward(
+        ['location', '--spack-root'], running_server.path)
+    assert returncode == 0
+
+    out, _ = capfd.readouterr()
+    assert out.strip() == spack.paths.prefix
+    assert spack.server.request(
+        {'command': 'ping'}, running_server.path)['handled'] == 1
+
+
+def test_forward_error_code(running_server, capfd):
+    returncode = spack.server.forward(
+        ['find', 'no-such-package'], running_server.path)
+    assert returncode != 0
+
+
+def test_server_status_without_server(tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        spack.server, 'socket_path', lambda: str(tmpdir.join('s.sock')))
+    out = server('status', fail_on_error=False)
+    assert 'No spack server is running' in out
+
+
+@pytest.fixture()
+def locked_server_path(tmpdir):
+    """Socket path whose server lock is held by another process."""
+    path = str(tmpdir.join('server.sock'))
+    holder = subprocess.Popen(
+        [sys.executable, '-c',
+         'import fcntl, os, sys, time\n'
+         'fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT)\n'
+         'fcntl.lockf(fd, fcntl.LOCK_EX)\n'
+         'sys.stdout.write("locked\\n")\n'
+         'sys.stdout.flush()\n'
+         'time.sleep(60)\n',
+         spack.server.lock_path(path)],
+        stdout=subprocess.PIPE)
+    assert holder.stdout.readline().strip() == b'locked'
+    yield path, holder
+
+    if holder.poll() is None:
+        holder.kill()
+        holder.wait()
+
+
+def test_start_in_background_once(locked_server_path, monkeypatch):
+    path, holder = locked_server_path
+    started = []
+    monkeypatch.setattr(
+        spack.server.subprocess, 'Popen',
+        lambda *args, **kwargs: started.append(args))
+
+    # A server is running or starting
+    spack.server.start_in_background(path)
+    assert not started
+    with pytest.raises(spack.server.ServerError):
+        spack.server.Server(path=path).serve_forever()
+
+    holder.kill()
+    holder.wait()
+    spack.server.start_in_background(path)
+    assert len(started) == 1
+
+
+def test_forward_to_hung_server(tmpdir, monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        spack.server, 'start_in_background', lambda p: started.append(p))
+    monkeypatch.setattr(spack.server, 'client_timeout', 0.1)
+
+    # Connections are accepted by the kernel, but never answered
+    path = str(tmpdir.join('hung.sock'))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(1)
+    try:
+        assert spack.server.forward(['find'], path) is None
+    finally:
+        sock.close()
+    assert not started
+
+
+def test_silent_client_does_not_block_server(running_server, monkeypatch):
+    monkeypatch.setattr(spack.server, 'receive_timeout', 0.1)
+    silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    silent.connect(running_server.path)
+    try:
+        response = spack.server.request(
+            {'command': 'ping'}, running_server.path, timeout=10)
+        assert response['pid']
+    finally:
+        silent.close()
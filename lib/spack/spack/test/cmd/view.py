@@ -5,9 +5,13 @@
 
 from spack.main import SpackCommand
 import os.path
+import shutil
 import pytest
 
+import spack.spec
+import spack.store
 import spack.util.spack_yaml as s_yaml
+from spack.filesystem_view import YamlFilesystemView
 
 activate = SpackCommand('activate')
 extensions = SpackCommand('extensions')
@@ -40,6 +44,41 @@ def test_view_link_type(
     assert os.path.islink(package_prefix) == is_link_cmd
 
 
+def test_view_manifest(
+        tmpdir, mock_packages, mock_archive, mock_fetch, config,
+        install_mockery):
+    install('libdwarf')
+    viewpath = str(tmpdir.mkdir('view'))
+    view('symlink', viewpath, 'libdwarf')
+
+    # The view knows which spec owns each file without looking at the disk
+    fs_view = YamlFilesystemView(viewpath, spack.store.layout)
+    libdwarf = spack.spec.Spec('libdwarf').concretized()
+    owned = [path for path, owners in fs_view.view_manifest.files.items()
+             if owners == [libdwarf.dag_hash()]]
+    assert owned
+    assert all(os.path.islink(os.path.join(viewpath, p)) for p in owned)
+
+    # A view whose manifest is lost can have it rebuilt from disk
+    os.remove(fs_view.view_manifest.path)
+    assert YamlFilesystemView(
+        viewpath, spack.store.layout).view_manifest is None
+    out = view('statlink', '--verify', viewpath)
+    assert '{0} paths added, 0 paths removed'.format(
+        len(fs_view.view_manifest.files) +
+        len(fs_view.view_manifest.directories)) in out
+
+    rebuilt = YamlFilesystemView(viewpath, spack.store.layout).view_manifest
+    assert rebuilt.files == fs_view.view_manifest.files
+    assert rebuilt.directories == fs_view.view_manifest.directories
+
+    # Removing the package clears it from the manifest
+    view('remove', viewpath, 'libdwarf')
+    manifest = YamlFilesystemView(viewpath, spack.store.layout).view_manifest
+    assert not any(libdwarf.dag_hash() in owners
+                   for owners in manifest.files.values())
+
+
 @pytest.mark.parametrize('add_cmd', ['hardlink', 'symlink', 'hard', 'add',
                                      'copy', 'relocate'])
 def test_view_link_type_remove(
@@ -124,6 +163,31 @@ def test_view_multiple_projections_all_first(
     assert os.path.exists(extendee_prefix)
 
 
+def test_view_verify_does_not_repair(
+        tmpdir, mock_packages, mock_archive, mock_fetch, config,
+        install_mockery):
+    install('libdwarf')
+    libdwarf = spack.spec.Spec('libdwarf').concretized()
+    header = os.path.join(libdwarf.prefix, 'include', 'libdwarf.h')
+    os.makedirs(os.path.dirname(header))
+    open(header, 'w').close()
+
+    viewpath = str(tmpdir.mkdir('view'))
+    view('symlink', viewpath, 'libdwarf')
+    assert os.path.islink(os.path.join(viewpath, 'include', 'libdwarf.h'))
+
+    # Missing paths are reported, and left missing
+    shutil.rmtree(os.path.join(viewpath, 'include'))
+    out = view('statlink', '--verify', viewpath)
+    assert '2 paths of the packages in the view are missing' in out
+    assert os.path.join('include', 'libdwarf.h') in out
+    assert not os.path.exists(os.path.join(viewpath, 'include'))
+
+    manifest = YamlFilesystemView(viewpath, spack.store.layout).view_manifest
+    assert 'include' not in manifest.directories
+    assert os.path.join('include', 'libdwarf.h') not in manifest.files
+
+
 def test_view_external(
         tmpdir, mock_packages, mock_archive, mock_fetch, config,
         install_mockery):
@@ -14,14 +14,16 @@
 
 import llnl.util.filesystem as fs
 
+import spack.caches
 import spack.spec
 import spack.compiler
 import spack.compilers as compilers
 import spack.spec
 import spack.util.environment
+import spack.util.file_cache
 
 from spack.compiler import Compiler
-from spack.util.executable import ProcessError
+from spack.util.executable import Executable, ProcessError
 
 
 @pytest.fixture()
@@ -844,6 +846,38 @@ def test_compiler_flags_use_real_version(working_env, monkeypatch, tmpdir):
     assert flag == '-std=c++0x'
 
 
+def test_compiler_probe_cache(monkeypatch, tmpdir):
+    monkeypatch.setattr(spack.caches, 'misc_cache',
+                        spack.util.file_cache.FileCache(str(tmpdir)))
+    calls = tmpdir.join('calls')
+    gcc = str(tmpdir.join('gcc'))
+
+    def write_compiler(version):
+        with open(gcc, 'w') as f:
+            f.write("""#!/bin/bash
+echo x >> {0}
+echo "{1}"
+""".format(calls, version))
+        fs.set_executable(gcc)
+
+    def probe(cache):
+        def fn():
+            return Executable(gcc)(output=str)
+        return cache.run([gcc], ['version'], fn).strip()
+
+    write_compiler('4.4.4')
+    assert probe(spack.compiler.CompilerProbeCache()) == '4.4.4'
+
+    # Another process reads the output from the cache
+    assert probe(spack.compiler.CompilerProbeCache()) == '4.4.4'
+    assert len(calls.readlines()) == 1
+
+    # Replacing the compiler invalidates the cache
+    write_compiler('10.10.10')
+    assert probe(spack.compiler.CompilerProbeCache()) == '10.10.10'
+    assert len(calls.readlines()) == 2
+
+
 def test_apple_clang_setup_environment(mock_executable, monkeypatch):
     """Test a code path that is taken only if the package uses
     Xcode on MacOS.
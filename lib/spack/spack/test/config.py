@@ -1168,3 +1168,51 @@ def test_internal_config_scope_cache_clearing():
     internal_scope.clear()
     # Check that this didn't affect the scope object
     assert internal_scope.sections['config'] == data
+
+
+def test_read_config_file_snapshot(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('config.yaml'))
+    with open(filename, 'w') as f:
+        syaml.dump_config(config_low, f)
+
+    data = spack.config.read_config_file(
+        filename, spack.schema.config.schema, use_snapshot=True)
+    assert data == config_low
+
+    # An unchanged file is read back from its snapshot
+    def _fail(*args, **kwargs):
+        raise AssertionError('YAML should not be parsed')
+    monkeypatch.setattr(syaml, 'load_config', _fail)
+    snapshot = spack.config.read_config_file(
+        filename, spack.schema.config.schema, use_snapshot=True)
+    assert snapshot == config_low
+    monkeypatch.undo()
+
+    # Modifying the file invalidates the snapshot
+    with open(filename, 'w') as f:
+        syaml.dump_config(config_override_key, f)
+    data = spack.config.read_config_file(
+        filename, spack.schema.config.schema, use_snapshot=True)
+    assert data['config']['install_tree']['root'] == 'override_key'
+
+
+def test_update_config_preserves_comments_with_snapshot(tmpdir):
+    scope_dir = tmpdir.join('scope')
+    scope_dir.ensure(dir=True)
+    scope_dir.join('config.yaml').write("""\
+config:
+  # keep this comment
+  build_jobs: 4
+""")
+
+    # Populate the snapshot, then read the section through it
+    spack.config.read_config_file(
+        str(scope_dir.join('config.yaml')), spack.schema.config.schema,
+        use_snapshot=True)
+    scope = spack.config.ConfigScope('scope', str(scope_dir))
+    cfg = spack.config.Configuration(scope)
+    data = cfg.get_config('config')
+
+    data['build_jobs'] = 8
+    cfg.update_config('config', data, scope='scope')
+    assert '# keep this comment' in scope_dir.join('config.yaml').read()
@@ -14,6 +14,7 @@
 import shutil
 import sys
 import tempfile
+import threading
 import xml.etree.ElementTree
 
 if sys.version_info >= (2, 7):
@@ -41,6 +42,7 @@ def parse_date(string):
 import spack.database
 import spack.directory_layout
 import spack.environment as ev
+import spack.fetch_stats
 import spack.package
 import spack.package_prefs
 import spack.paths
@@ -124,6 +126,17 @@ def clean_user_environment():
         ev.activate(active)
 
 
+#
+# Keep snapshots of configuration files out of the user's cache
+#
+@pytest.fixture(scope='session', autouse=True)
+def config_snapshot_path(tmpdir_factory):
+    original = spack.config.snapshot_path
+    spack.config.snapshot_path = str(tmpdir_factory.mktemp('config_snapshots'))
+    yield spack.config.snapshot_path
+    spack.config.snapshot_path = original
+
+
 def _verify_executables_noop(*args):
     return None
 
@@ -327,6 +340,12 @@ def mock_fetch_cache(monkeypatch):
     monkeypatch.setattr(spack.caches, 'fetch_cache', MockCache())
 
 
+@pytest.fixture(autouse=True)
+def mock_fetch_stats(monkeypatch):
+    """Discards the fetch statistics recorded by tests."""
+    monkeypatch.setenv(spack.fetch_stats.session_variable, os.devnull)
+
+
 @pytest.fixture(autouse=True)
 def _skip_if_missing_executables(request):
     """Permits to mark tests with 'require_executables' and skip the
@@ -920,6 +939,98 @@ def mock_archive(request, tmpdir_factory):
         expanded_archive_basedir=spack.stage._source_path_subdir)
 
 
+@pytest.fixture()
+def mock_http_server(tmpdir):
+    """Serves the files in a temporary directory over HTTP/1.1, with
+    persistent connections and ranged requests, and records the requests
+    it gets. Responses are cut after ``options['max_bytes']`` bytes of
+    content, if set, to simulate interrupted downloads.
+    """
+    import hashlib
+    import mimetypes
+    from six.moves import BaseHTTPServer, socketserver
+
+    root = tmpdir.ensure('http-root', dir=True)
+    requests = []
+    options = {'max_bytes': None, 'ranges': True}
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self._respond(body=True)
+
+        def do_HEAD(self):
+            self._respond(body=False)
+
+        def _respond(self, body):
+            requests.append((self.command, self.path, self.headers))
+            path = root.join(self.path.split('?', 1)[0].lstrip('/'))
+            if not path.check(file=1):
+                self.send_error(404)
+                return
+
+            data = path.read_binary()
+            etag = '"{0}"'.format(hashlib.sha1(data).hexdigest())
+            start, end, status = 0, len(data), 200
+            byte_range = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if byte_range and options['ranges'] and if_range in (None, etag):
+                first, last = byte_range[len('bytes='):].split('-')
+                start = int(first)
+                end = min(int(last) + 1, len(data)) if last else len(data)
+                if start >= len(data):
+                    self.send_error(416)
+                    return
+                status = 206
+
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            self.send_response(status)
+            content_type = mimetypes.guess_type(str(path))[0]
+            self.send_header(
+                'Content-Type', content_type or 'application/octet-stream')
+            self.send_header('Content-Length', str(end - start))
+            self.send_header('ETag', etag)
+            if options['ranges']:
+                self.send_header('Accept-Ranges', 'bytes')
+            if status == 206:
+                self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                    start, end - 1, len(data)))
+            self.end_headers()
+
+            if body:
+                content = data[start:end]
+                if options['max_bytes'] is not None:
+                    content = content[:options['max_bytes']]
+                    self.close_connection = True
+                self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    HTTPServer = collections.namedtuple(
+        'HTTPServer', ['url', 'root', 'requests', 'options'])
+    yield HTTPServer(
+        url='http://127.0.0.1:{0}'.format(server.server_port),
+        root=root, requests=requests, options=options)
+
+    server.shutdown()
+    server.server_close()
+
+
 @pytest.fixture(scope='session')
 def mock_cvs_repository(tmpdir_factory):
     """Creates a very simple CVS repository with two commits and a branch."""
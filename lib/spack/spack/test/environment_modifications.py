@@ -448,3 +448,25 @@ def test_blacklist_lmod_variables():
     # Check that variables related to lmod are not in there
     modifications = env.group_by_name()
     assert not any(x.startswith('LMOD_') for x in modifications)
+
+
+def test_serialization_round_trip(working_env):
+    env = EnvironmentModifications()
+    env.set('A', 'dummy value')
+    env.unset('B')
+    env.append_flags('C', '-O3')
+    env.set_path('D', ['/a', '/b'])
+    env.prepend_path('E', '/path/to/bin')
+    env.remove_path('E', '/usr/bin')
+    env.deprioritize_system_paths('E')
+
+    restored = EnvironmentModifications.from_dict(env.to_dict())
+    assert [type(x) for x in restored] == [type(x) for x in env]
+    assert [x.args for x in restored] == [x.args for x in env]
+
+    os.environ['E'] = '/usr/bin:/opt/bin'
+    restored.apply_modifications()
+    assert os.environ['A'] == 'dummy value'
+    assert 'B' not in os.environ
+    assert os.environ['D'] == '/a:/b'
+    assert os.environ['E'] == '/path/to/bin:/opt/bin'
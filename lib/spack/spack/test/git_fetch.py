@@ -273,3 +273,96 @@ def test_gitsubmodules_delete(mock_git_repository, config, mutable_mock_repo):
         file_path = os.path.join(pkg.stage.source_path,
                                  'third_party/submodule1')
         assert not os.path.isdir(file_path)
+
+
+@pytest.mark.parametrize("type_of_test", ['branch', 'tag', 'commit'])
+def test_fetch_from_git_cache(type_of_test, mock_git_repository, tmpdir,
+                              mutable_config, mutable_mock_repo, monkeypatch):
+    """Ensure stages are cloned from a bare repository in the cache, that
+    the cache is reused by later fetches, and that stages do not depend on
+    the cache. Tags and branches are fetched shallow, and only branches are
+    fetched again."""
+    t = mock_git_repository.checks[type_of_test]
+    h = mock_git_repository.hash
+
+    spack.config.set('config:source_cache', str(tmpdir.join('cache')))
+    spack.config.set('config:git_cache', True)
+
+    clones = []
+    clone_from_cache = GitFetchStrategy._clone_from_cache
+
+    def _clone_from_cache(fetcher):
+        clones.append(clone_from_cache(fetcher))
+        return clones[-1]
+    monkeypatch.setattr(
+        GitFetchStrategy, '_clone_from_cache', _clone_from_cache)
+
+    spec = Spec('git-test')
+    spec.concretize()
+    pkg = spack.repo.get(spec)
+    pkg.versions[ver('git')] = t.args
+
+    git_cache = tmpdir.join('cache', '_git')
+    for i in range(2):
+        if i == 1:
+            fetch_head, = git_cache.visit('FETCH_HEAD')
+            fetch_head.remove()
+
+        with pkg.stage:
+            pkg.do_stage()
+            with working_dir(pkg.stage.source_path):
+                assert h('HEAD') == h(t.revision)
+                assert os.path.isfile(t.file)
+                assert not os.path.exists(os.path.join(
+                    '.git', 'objects', 'info', 'alternates'))
+
+                url = mock_git_repository.git_exe(
+                    'remote', 'get-url', 'origin', output=str)
+                assert url.strip() == mock_git_repository.url
+
+                # The stage is intact without the cache
+                caches = [p for p in git_cache.listdir() if p.ext == '.git']
+                assert len(caches) == 1
+                shutil.move(str(caches[0]), str(tmpdir.join('moved.git')))
+                mock_git_repository.git_exe('fsck', output=str, error=str)
+                shutil.move(str(tmpdir.join('moved.git')), str(caches[0]))
+        pkg.stage.destroy()
+
+    assert clones == [True, True]
+    cache, = [p for p in git_cache.listdir() if p.ext == '.git']
+    assert cache.join('FETCH_HEAD').exists() == (type_of_test == 'branch')
+    assert cache.join('shallow').exists() == (type_of_test != 'commit')
+
+
+def test_git_cache_commit_after_shallow_fetch(
+        mock_git_repository, tmpdir, mutable_config, mutable_mock_repo,
+        monkeypatch):
+    """Commits are found in caches that tags were fetched shallow into."""
+    spack.config.set('config:source_cache', str(tmpdir.join('cache')))
+    spack.config.set('config:git_cache', True)
+    h = mock_git_repository.hash
+
+    clones = []
+    clone_from_cache = GitFetchStrategy._clone_from_cache
+
+    def _clone_from_cache(fetcher):
+        clones.append(clone_from_cache(fetcher))
+        return clones[-1]
+    monkeypatch.setattr(
+        GitFetchStrategy, '_clone_from_cache', _clone_from_cache)
+
+    spec = Spec('git-test')
+    spec.concretize()
+    pkg = spack.repo.get(spec)
+    for type_of_test in ('tag', 'commit'):
+        t = mock_git_repository.checks[type_of_test]
+        pkg.versions[ver('git')] = t.args
+        pkg._fetcher = None
+        with pkg.stage:
+            pkg.do_stage()
+            with working_dir(pkg.stage.source_path):
+                assert h('HEAD') == h(t.revision)
+        pkg.stage.destroy()
+        pkg._stage = None
+
+    assert clones == [True, True]
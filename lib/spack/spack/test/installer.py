@@ -12,12 +12,15 @@
 import llnl.util.lock as ulk
 
 import spack.binary_distribution
+import spack.build_environment
 import spack.compilers
+import spack.config
 import spack.directory_layout as dl
 import spack.installer as inst
 import spack.package_prefs as prefs
 import spack.repo
 import spack.spec
+import spack.stage
 import spack.store
 import spack.util.lock as lk
 
@@ -451,6 +454,28 @@ def test_fake_install(install_mockery):
     assert os.path.isdir(pkg.prefix.lib)
 
 
+@pytest.mark.disable_clean_stage_check
+def test_record_stage_size(install_mockery, mock_fetch, monkeypatch):
+    """Failed builds are recorded, and errors recording the stage size do
+    not fail an install."""
+    calls = []
+
+    def _record(spec, path, failed=False):
+        calls.append((spec.name, failed))
+        raise OSError('cannot lock the cache')
+    monkeypatch.setattr(spack.stage, 'record_stage_size', _record)
+
+    # Sizes of successful builds are recorded in the build process
+    spec = spack.spec.Spec('trivial-install-test-package').concretized()
+    spec.package.do_install()
+    assert spec.package.installed
+
+    spec = spack.spec.Spec('failing-build').concretized()
+    with pytest.raises(spack.build_environment.ChildError):
+        spec.package.do_install()
+    assert calls == [('failing-build', True)]
+
+
 def test_packages_needed_to_bootstrap_compiler_none(install_mockery):
     spec = spack.spec.Spec('trivial-install-test-package')
     spec.concretize()
@@ -1218,3 +1243,27 @@ def test_install_skip_patch(install_mockery, mock_fetch):
 
     spec, install_args = const_arg[0]
     assert inst.package_id(spec.package) in installer.installed
+
+
+@pytest.mark.parametrize('install_args,fetch_jobs,expected', [
+    ({}, 2, ['dependency-install', 'dependent-install']),
+    ({}, 1, []),
+    ({'fake': True}, 2, []),
+])
+def test_install_prefetches_sources(
+        install_mockery, monkeypatch, install_args, fetch_jobs, expected):
+    """Test that the sources of the packages to build are fetched first."""
+    fetched = []
+
+    def _fetch_packages(pkgs, jobs):
+        fetched.extend(pkg.name for pkg in pkgs)
+        return []
+    monkeypatch.setattr(inst, 'fetch_packages', _fetch_packages)
+
+    const_arg = installer_args(['dependent-install'], install_args)
+    installer = create_installer(const_arg)
+    installer._init_queue()
+
+    with spack.config.override('config:fetch_jobs', fetch_jobs):
+        installer._prefetch()
+    assert sorted(fetched) == expected
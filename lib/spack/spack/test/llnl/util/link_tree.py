@@ -166,3 +166,27 @@ def test_ignore(stage, link_tree):
 
         assert os.path.isfile('source/.spec')
         assert os.path.isfile('dest/.spec')
+
+
+def test_ignore_directory(stage, link_tree):
+    with working_dir(stage.path):
+        link_tree.merge('dest', ignore=lambda x: x == os.path.join('c', 'd'))
+
+        check_file_link('dest/c/4', 'source/c/4')
+        assert not os.path.exists('dest/c/d')
+
+        # The source tree is read once, and reused with another filter
+        link_tree.merge('dest', ignore_conflicts=True)
+        check_file_link('dest/c/d/e/7', 'source/c/d/e/7')
+
+
+def test_find_dir_conflicts(stage, link_tree):
+    with working_dir(stage.path):
+        touchp('dest/c/d')
+        touchp('dest/a/b/2/file')
+
+        conflicts = link_tree.find_dir_conflicts('dest', lambda x: False)
+        assert sorted(conflicts) == [
+            'Directory blocks directory: dest/a/b/2',
+            'File blocks directory: dest/c/d',
+        ]
@@ -5,6 +5,8 @@
 
 import filecmp
 import os
+import shutil
+import signal
 import pytest
 
 import spack.repo
@@ -14,6 +16,8 @@
 from spack.stage import Stage
 from spack.util.executable import which
 
+import llnl.util.tty as tty
+from llnl.util.filesystem import mkdirp
 from llnl.util.filesystem import resolve_link_target_relative_to_the_link
 
 pytestmark = pytest.mark.usefixtures('mutable_config', 'mutable_mock_repo')
@@ -196,6 +200,112 @@ def successful_apply(*args, **kwargs):
         ]) - files_cached_in_mirror)
 
 
+@pytest.fixture()
+def mock_url_fetch(monkeypatch):
+    """Fetch and expand URL resources without network access."""
+    def successful_fetch(_class):
+        mkdirp(_class.stage.path)
+        with open(_class.stage.save_filename, 'w'):
+            pass
+
+    def successful_expand(_class):
+        expanded_path = os.path.join(_class.stage.path,
+                                     spack.stage._source_path_subdir)
+        os.mkdir(expanded_path)
+        with open(os.path.join(expanded_path, 'test.patch'), 'w'):
+            pass
+
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy, 'fetch',
+                        successful_fetch)
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy,
+                        'expand', successful_expand)
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy,
+                        'check', lambda _class: None)
+    monkeypatch.setattr(spack.patch, 'apply_patch', lambda *a, **kw: None)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_mirror_create_resumes(
+        jobs, mock_packages, mock_url_fetch, monkeypatch, tmpdir):
+    specs = list(Spec('patch-several-dependencies').concretized().traverse())
+    mirror_root = str(tmpdir.join('mirror'))
+
+    with spack.config.override('config:misc_cache', str(tmpdir.join('c'))):
+        with spack.config.override('config:checksum', False):
+            present, mirrored, error = spack.mirror.create(
+                mirror_root, specs, jobs=jobs, max_per_host=1)
+        assert not present and not error
+        assert len(mirrored) == len(specs)
+
+        # A second run only reads the state of the mirror
+        def fail(_class):
+            raise spack.fetch_strategy.FetchError('should not fetch')
+        fetch = spack.fetch_strategy.URLFetchStrategy.fetch
+        monkeypatch.setattr(
+            spack.fetch_strategy.URLFetchStrategy, 'fetch', fail)
+
+        present, mirrored, error = spack.mirror.create(
+            mirror_root, specs, jobs=jobs)
+        assert len(present) == len(specs)
+        assert not mirrored and not error
+
+        # Specs whose archives were removed from the mirror are added again
+        monkeypatch.setattr(
+            spack.fetch_strategy.URLFetchStrategy, 'fetch', fetch)
+        shutil.rmtree(os.path.join(mirror_root, '_source-cache'))
+        present, mirrored, error = spack.mirror.create(
+            mirror_root, specs, jobs=jobs)
+        assert not present and not error
+        assert len(mirrored) == len(specs)
+
+
+@pytest.mark.parametrize('failure', ['die', 'kill'])
+def test_mirror_create_process_failures(
+        failure, mock_packages, mock_url_fetch, monkeypatch, tmpdir):
+    """Specs whose process exits or is killed are reported as errors,
+    instead of being waited for forever."""
+    specs = list(Spec('patch-several-dependencies').concretized().traverse())
+    failing = specs[-1].name
+    add_single_spec = spack.mirror._add_single_spec
+
+    def _add_single_spec(spec, mirror, mirror_stats):
+        if spec.name == failing:
+            if failure == 'die':
+                tty.die('cannot add {0}'.format(spec.name))
+            os.kill(os.getpid(), signal.SIGKILL)
+        add_single_spec(spec, mirror, mirror_stats)
+
+    monkeypatch.setattr(spack.mirror, '_add_single_spec', _add_single_spec)
+    monkeypatch.setattr(spack.mirror, '_mirror_poll_interval', 0.1)
+
+    mirror_root = str(tmpdir.join('mirror'))
+    with spack.config.override('config:misc_cache', str(tmpdir.join('c'))):
+        with spack.config.override('config:checksum', False):
+            present, mirrored, error = spack.mirror.create(
+                mirror_root, specs, jobs=2, max_per_host=1)
+    assert [s.name for s in error] == [failing]
+    assert len(mirrored) == len(specs) - 1
+
+
+def test_mirror_state_skip_unstable(mock_packages, tmpdir):
+    spec = Spec('trivial-install-test-package').concretized()
+    archive = tmpdir.ensure('archive.tar.gz')
+
+    with spack.config.override('config:misc_cache', str(tmpdir.join('c'))):
+        state = spack.mirror.MirrorState(
+            str(tmpdir), skip_unstable_versions=True)
+        state.add(spec, [str(archive)])
+        assert state.paths(spec) == [str(archive)]
+
+        # Unstable resources were not added for this spec, so it is only
+        # complete when they are skipped
+        state = spack.mirror.MirrorState(str(tmpdir))
+        assert state.paths(spec) is None
+        state = spack.mirror.MirrorState(
+            str(tmpdir), skip_unstable_versions=True)
+        assert state.paths(spec) == [str(archive)]
+
+
 class MockFetcher(object):
     """Mock fetcher object which implements the necessary functionality for
        testing MirrorCache
@@ -16,6 +16,9 @@
 import spack.architecture
 import spack.directives
 import spack.error
+import spack.paths
+import spack.repo
+import spack.spec
 
 
 def make_spec(spec_like, concrete):
@@ -1098,3 +1101,38 @@ def test_is_extension_after_round_trip_to_dict(config, spec_str):
     # Using 'y' since the round-trip make us lose build dependencies
     for d in y.traverse():
         assert x[d.name].package.is_extension == y[d.name].package.is_extension
+
+
+def test_satisfies_memoized_for_concrete_specs(mock_packages, config):
+    s = Spec('mpileaks ^mpich')
+    s.concretize()
+
+    spack.spec.satisfies_cache.clear()
+    assert s.satisfies('^mpi')
+    assert not s.satisfies('^zmpi')
+    assert (s.dag_hash(), '^mpi', True, False) in spack.spec.satisfies_cache
+
+    # Changing repositories invalidates memoized results
+    with spack.repo.use_repositories(spack.paths.mock_packages_path):
+        assert len(spack.spec.satisfies_cache) == 0
+
+
+@pytest.mark.parametrize('constraint,expected', [
+    ('mpileaks', True),
+    ('^mpi', True),
+    ('^mpich@:1', False),
+    ('callpath', False),
+])
+def test_spec_matcher(mock_packages, config, constraint, expected):
+    s = Spec('mpileaks ^mpich')
+    s.concretize()
+
+    matches = spack.spec.SpecMatcher(constraint)
+    assert matches(s) is expected
+    # Second call is served from the cache
+    assert matches(s) is expected
+    assert matches(s) is s.satisfies(Spec(constraint))
+
+    # Abstract candidates are not memoized
+    assert spack.spec.SpecMatcher(constraint)(Spec('mpileaks')) is (
+        Spec('mpileaks').satisfies(constraint))
@@ -21,7 +21,8 @@
 from spack.spec import DuplicateDependencyError, DuplicateCompilerSpecError
 from spack.spec import SpecFilenameError, NoSuchSpecFileError
 from spack.spec import MultipleVersionError
-from spack.variant import DuplicateVariantError
+from spack.variant import BoolValuedVariant, DuplicateVariantError
+from spack.version import VersionList
 
 
 # Sample output for a complex lexing.
@@ -825,3 +826,35 @@ def test_compare_abstract_specs(self):
         for a, b in itertools.product(specs, repeat=2):
             # Check that we can compare without raising an error
             assert a <= b or b < a
+
+    def test_lex_token_positions(self):
+        tokens = sp.SpecLexer().lex(['mpileaks@2.3', 'cflags=-O3'])
+        assert [(t.start, t.end) for t in tokens] == [
+            (0, 8), (8, 9), (9, 12), (0, 6), (6, 7), (7, 10)]
+
+    def test_lex_does_not_keep_mode_between_strings(self):
+        lexer = sp.SpecLexer()
+        lexer.lex(['foo='])
+        assert [t.type for t in lexer.lex(['bar'])] == [sp.ID]
+
+    @pytest.mark.parametrize('spec_string', [
+        'mpileaks@2.3 +debug %gcc@4.5 ^mpich@:3 cflags="-O3 -g"',
+        'mpileaks ^callpath ^libelf@0.8.13 target=x86_64',
+        '+shared %clang ^zlib@1.2.11',
+        'mpileaks arch=test-debian6-core2 libelf os=fe',
+        'mpileaks ^+debug',
+    ])
+    def test_parse_cache_hands_out_copies(self, spec_string):
+        fresh = sp.SpecParser().parse(spec_string, use_cache=False)
+        first = sp.parse(spec_string)
+        second = sp.parse(spec_string)
+        assert first == second == fresh
+        if len(fresh) == 1:
+            assert Spec(spec_string) == fresh[0]
+
+        # Modifying what the parser returned cannot affect later parses
+        for spec in first:
+            for node in spec.traverse():
+                node.versions.add(VersionList(['0.1']))
+                node.variants['extra'] = BoolValuedVariant('extra', True)
+        assert sp.parse(spec_string) == fresh
@@ -116,6 +116,40 @@ def descend_and_check(iterable, level=0):
         assert level >= 5
 
 
+def test_specs_read_from_dicts_share_values(config, mock_packages):
+    spec = Spec('mpileaks')
+    spec.concretize()
+    data = spec.to_dict()
+
+    first = Spec.from_dict(sjson.load(sjson.dump(data)))
+    second = Spec.from_dict(sjson.load(sjson.dump(data)))
+    assert first.eq_dag(second)
+
+    for name in ('mpileaks', 'callpath'):
+        x, y = first[name], second[name]
+        assert x.name is y.name
+        assert x.namespace is y.namespace
+        assert x.dag_hash() is y.dag_hash()
+        assert x.versions[0] is y.versions[0]
+        assert x.architecture.target is y.architecture.target
+        assert x.compiler.name is y.compiler.name
+
+    x = first._dependencies['callpath']
+    y = second._dependencies['callpath']
+    assert x.deptypes is y.deptypes
+    assert not hasattr(x, '__dict__')
+
+
+def test_intern_keeps_types():
+    """Equal values of different types are interned separately."""
+    assert spack.spec._intern(True) is True
+    assert spack.spec._intern(1) == 1 and spack.spec._intern(1) is not True
+    assert spack.spec._intern((True,)) == (True,)
+    assert spack.spec._intern((1,))[0] is not True
+    assert spack.spec._intern((False, 'a'))[0] is False
+    assert spack.spec._intern((0, 'a'))[0] is not False
+
+
 def test_to_record_dict(mock_packages, config):
     specs = ['mpileaks', 'zmpi', 'dttop']
     for name in specs:
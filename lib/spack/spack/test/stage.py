@@ -11,18 +11,27 @@
 import stat
 import tempfile
 import getpass
+import hashlib
 
 import pytest
 
 from llnl.util.filesystem import mkdirp, partition_path, touch, working_dir
 
+import spack.caches
+import spack.fetch_stats
+import spack.fetch_strategy
 import spack.paths
 import spack.stage
+import spack.util.crypto
 import spack.util.executable
+import spack.util.web
 
 from spack.resource import Resource
+from spack.spec import Spec
 from spack.stage import Stage, StageComposite, ResourceStage, DIYStage
+from spack.util.file_cache import FileCache
 from spack.util.path import canonicalize_path
+from spack.version import Version
 
 # The following values are used for common fetch and stage mocking fixtures:
 _archive_base = 'test-files'
@@ -942,3 +951,215 @@ def test_cannot_access(capsys):
 
     captured = capsys.readouterr()
     assert 'Insufficient permissions' in str(captured)
+
+
+@pytest.mark.parametrize('keep_stage', [True, False])
+def test_get_checksums_for_versions(tmpdir, tmp_build_stage_dir, keep_stage):
+    """Archives are checksummed concurrently and reported in order, and the
+    first archive that can be fetched is inspected."""
+    url_dict = {Version('2.0'): 'file://' + str(tmpdir.join('missing.tgz'))}
+    expected = []
+    for minor in reversed(range(4)):
+        archive = tmpdir.join('pkg-1.{0}.tgz'.format(minor))
+        archive.write('contents of 1.{0}'.format(minor))
+        url_dict[Version('1.{0}'.format(minor))] = 'file://' + str(archive)
+        expected.append("    version('1.{0}', sha256='{1}')".format(
+            minor, spack.util.crypto.checksum(hashlib.sha256, str(archive))))
+
+    inspected = []
+    version_lines = spack.stage.get_checksums_for_versions(
+        url_dict, 'pkg', first_stage_function=lambda s, u: inspected.append(u),
+        keep_stage=keep_stage, batch=True, jobs=2)
+
+    assert version_lines.split('\n') == expected
+    assert inspected == [url_dict[Version('1.3')]]
+
+
+def test_get_checksums_for_versions_inspection_fails(
+        tmpdir, tmp_build_stage_dir, capsys):
+    """Versions whose archive cannot be inspected are skipped, and the
+    next archive is inspected instead."""
+    url_dict = {Version('2.0'): 'file://' + str(tmpdir.join('missing.tgz'))}
+    for minor in range(3):
+        archive = tmpdir.join('pkg-1.{0}.tgz'.format(minor))
+        archive.write('contents of 1.{0}'.format(minor))
+        url_dict[Version('1.{0}'.format(minor))] = 'file://' + str(archive)
+
+    inspected = []
+
+    def _inspect(stage, url):
+        inspected.append(url)
+        if len(inspected) == 1:
+            raise ValueError('cannot inspect')
+
+    version_lines = spack.stage.get_checksums_for_versions(
+        url_dict, 'pkg', first_stage_function=_inspect, batch=True, jobs=2)
+
+    assert [line.split("'")[1] for line in version_lines.split('\n')] == [
+        '1.1', '1.0']
+    assert inspected == [url_dict[Version('1.2')], url_dict[Version('1.1')]]
+    assert 'cannot inspect' in capsys.readouterr()[0]
+
+
+def test_get_checksums_for_versions_reuses_downloads(
+        tmpdir, tmp_build_stage_dir, monkeypatch):
+    """Archives inspected after the first one failed inspection are not
+    downloaded again, and their stages are removed."""
+    url_dict = {}
+    for minor in range(3):
+        archive = tmpdir.join('pkg-1.{0}.tgz'.format(minor))
+        archive.write('contents of 1.{0}'.format(minor))
+        url_dict[Version('1.{0}'.format(minor))] = 'file://' + str(archive)
+
+    fetched = []
+    fetch_from_url = spack.fetch_strategy.URLFetchStrategy._fetch_from_url
+
+    def _fetch_from_url(fetcher, url):
+        fetched.append(url)
+        return fetch_from_url(fetcher, url)
+    monkeypatch.setattr(spack.fetch_strategy.URLFetchStrategy,
+                        '_fetch_from_url', _fetch_from_url)
+
+    def _inspect(stage, url):
+        if url == url_dict[Version('1.2')]:
+            raise ValueError('cannot inspect')
+
+    version_lines = spack.stage.get_checksums_for_versions(
+        url_dict, 'pkg', first_stage_function=_inspect, batch=True, jobs=1)
+
+    assert len(version_lines.split('\n')) == 2
+    assert sorted(fetched) == sorted(url_dict.values())
+    assert not [d for d in os.listdir(spack.stage.get_stage_root())
+                if d.startswith(spack.stage.stage_prefix)]
+
+
+def test_checksum_archive_curl(
+        tmpdir, tmp_build_stage_dir, mutable_config, monkeypatch):
+    """Archives are downloaded with curl when url_fetch_method is curl."""
+    archive = tmpdir.join('pkg-1.0.tgz')
+    archive.write('contents')
+
+    def _read_from_url(url, *args, **kwargs):
+        raise AssertionError('read_from_url called for {0}'.format(url))
+    monkeypatch.setattr(spack.util.web, 'read_from_url', _read_from_url)
+    spack.config.set('config:url_fetch_method', 'curl')
+
+    checksum = spack.stage._checksum_archive('file://' + str(archive))
+    assert checksum == spack.util.crypto.checksum(
+        hashlib.sha256, str(archive))
+
+
+def test_checksum_archive_timeout(tmpdir, monkeypatch):
+    """The timeout fetch option applies to streamed downloads."""
+    archive = tmpdir.join('pkg-1.0.tgz')
+    archive.write('contents')
+    timeouts = []
+    read_from_url = spack.util.web.read_from_url
+
+    def _read_from_url(url, *args, **kwargs):
+        timeouts.append(kwargs.get('timeout'))
+        return read_from_url(url, *args, **kwargs)
+    monkeypatch.setattr(spack.util.web, 'read_from_url', _read_from_url)
+
+    url = 'file://' + str(archive)
+    checksum = spack.stage._checksum_archive(url, {'timeout': 60})
+    assert checksum == spack.util.crypto.checksum(
+        hashlib.sha256, str(archive))
+    assert timeouts == [60]
+
+
+def test_get_stage_root_for(
+        tmpdir, mutable_config, clear_stage_root, monkeypatch):
+    """Packages are staged in tmpfs_stage according to their recorded
+    stage sizes and the free space there."""
+    monkeypatch.setattr(
+        spack.caches, 'misc_cache', FileCache(str(tmpdir.join('cache'))))
+    spack.config.set('config:build_stage', str(tmpdir.join('stage')))
+    spack.config.set('config:tmpfs_stage', str(tmpdir.join('tmpfs')))
+    root = spack.stage.get_stage_root()
+    tmpfs_root = spack.stage.get_tmpfs_stage_root()
+    assert tmpfs_root.startswith(str(tmpdir.join('tmpfs')))
+
+    # Packages that were never built are staged in the build stage
+    spec, name = Spec('foo@1.0'), 'spack-stage-foo-1.0'
+    assert spack.stage.recorded_stage_size(spec) is None
+    assert spack.stage.get_stage_root_for(spec, name) == root
+
+    build = tmpdir.ensure('build', dir=True)
+    build.join('object.o').write(b'x' * 100000, mode='wb')
+    spack.stage.record_stage_size(spec, str(build))
+    assert spack.stage.recorded_stage_size(spec) >= 100000
+    assert spack.stage.recorded_stage_size(Spec('foo@2.0')) >= 100000
+    assert spack.stage.get_stage_root_for(spec, name) == tmpfs_root
+
+    # Existing stages are used where they are
+    mkdirp(os.path.join(root, name))
+    assert spack.stage.get_stage_root_for(spec, name) == root
+    os.rmdir(os.path.join(root, name))
+
+    # Too large or not enough free space
+    spack.config.set('config:tmpfs_stage_max_size', 0)
+    assert spack.stage.get_stage_root_for(spec, name) == root
+    spack.config.set('config:tmpfs_stage_max_size', 10)
+    monkeypatch.setattr(spack.stage, '_free_space', lambda path: 100000)
+    assert spack.stage.get_stage_root_for(spec, name) == root
+    monkeypatch.undo()
+    monkeypatch.setattr(
+        spack.caches, 'misc_cache', FileCache(str(tmpdir.join('cache'))))
+    spack.config.set('config:tmpfs_stage_max_size', 1)
+
+    # Failed builds in the build stage are not recorded
+    mkdirp(os.path.join(root, name))
+    spack.stage.record_stage_size(spec, os.path.join(root, name), True)
+    assert spack.stage.recorded_stage_size(spec) >= 100000
+    os.rmdir(os.path.join(root, name))
+
+    # Failed builds in tmpfs_stage are staged in the build stage next time,
+    # even if their stage still exists
+    mkdirp(os.path.join(tmpfs_root, name))
+    assert spack.stage.get_stage_root_for(spec, name) == tmpfs_root
+    spack.stage.record_stage_size(spec, os.path.join(tmpfs_root, name), True)
+    assert spack.stage.recorded_stage_size(spec) is None
+    assert spack.stage.recorded_stage_size(Spec('foo@2.0')) is None
+    assert spack.stage.get_stage_root_for(spec, name) == root
+
+    # Until they build successfully
+    spack.stage.record_stage_size(spec, str(build))
+    assert spack.stage.get_stage_root_for(spec, name) == tmpfs_root
+
+
+def test_fetch_records_stats(
+        tmpdir, mutable_config, mock_stage_archive, monkeypatch):
+    """Each fetch attempt of a stage is recorded in the session file."""
+    monkeypatch.setattr(
+        spack.caches, 'misc_cache', FileCache(str(tmpdir.join('cache'))))
+    # Start a new session, which is undone with the monkeypatch
+    monkeypatch.setenv(spack.fetch_stats.session_variable, '')
+    spack.config.set('config:fetch_stats', True)
+    archive = mock_stage_archive()
+
+    def _search_fn():
+        return [spack.fetch_strategy.URLFetchStrategy(archive.url)]
+
+    missing_url = 'file:///does-not-exist/' + os.path.basename(archive.url)
+    with Stage(missing_url, name='spack-stage-foo-1.0',
+               search_fn=_search_fn) as stage:
+        stage.fetch()
+        # Sources already in the stage are not recorded again
+        stage.fetch()
+
+    path = os.environ[spack.fetch_stats.session_variable]
+    assert path.startswith(spack.fetch_stats.stats_dir())
+    failure, success = spack.fetch_stats.read([path])
+    assert not failure['success'] and failure['bytes'] == 0
+    assert failure['url'] == missing_url and failure['previous_failures'] == 0
+    assert failure['error']
+    assert success['success'] and success['source'] == 'url'
+    assert success['url'] == archive.url and success['previous_failures'] == 1
+    assert success['bytes'] == os.path.getsize(
+        str(archive.tmpdir.join(_archive_fn)))
+
+    summary = spack.fetch_stats.summarize([failure, success])
+    assert summary['package']['foo-1.0']['fetches'] == 2
+    assert summary['package']['foo-1.0']['failures'] == 1
+    assert summary['source']['url']['bytes'] == success['bytes']
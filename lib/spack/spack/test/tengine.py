@@ -65,6 +65,20 @@ def test_to_dict(self):
         assert d['bar'] == 2
         assert d['foobar'] == 3
 
+    def test_context_properties_are_computed_once(self):
+        class D(tengine.Context):
+            calls = 0
+
+            @tengine.context_property
+            def foo(self):
+                D.calls += 1
+                return [D.calls]
+
+        d = D()
+        assert d.foo is d.foo
+        assert d.to_dict()['foo'] == [1]
+        assert D().foo == [2]
+
 
 @pytest.mark.usefixtures('config')
 class TestTengineEnvironment(object):
@@ -89,3 +103,15 @@ def test_template_retrieval(self):
         template = env.get_template('b.txt')
         text = template.render({'word': 'world'})
         assert 'Howdy world!' == text
+
+    def test_compiled_templates_are_cached(self, tmpdir):
+        template_dirs = spack.config.get('config:template_dirs')
+        template_dirs = [canonicalize_path(x) for x in template_dirs]
+
+        with spack.config.override('config:misc_cache', str(tmpdir)):
+            env = tengine.make_environment(template_dirs)
+            assert tengine.make_environment(template_dirs) is env
+
+            text = env.get_template('a.txt').render({'word': 'world'})
+            assert 'Hello world!' == text
+            assert tmpdir.join('templates').listdir()
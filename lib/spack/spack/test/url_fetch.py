@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 import collections
+import hashlib
 import os
 import pytest
 import sys
@@ -19,6 +20,7 @@
 from spack.version import ver
 import spack.util.crypto as crypto
 import spack.util.executable
+import spack.util.web
 
 
 @pytest.fixture(params=list(crypto.hashes.keys()))
@@ -26,6 +28,12 @@ def checksum_type(request):
     return request.param
 
 
+@pytest.fixture(params=['curl', 'urllib'])
+def url_fetch_method(request):
+    with spack.config.override('config:url_fetch_method', request.param):
+        yield request.param
+
+
 @pytest.fixture
 def pkg_factory():
     Pkg = collections.namedtuple(
@@ -54,7 +62,7 @@ def test_urlfetchstrategy_sans_url():
             pass
 
 
-def test_urlfetchstrategy_bad_url(tmpdir):
+def test_urlfetchstrategy_bad_url(tmpdir, url_fetch_method):
     """Ensure fetch with bad URL fails as expected."""
     testpath = str(tmpdir)
 
@@ -79,7 +87,8 @@ def test_fetch(
         secure,
         checksum_type,
         config,
-        mutable_mock_repo
+        mutable_mock_repo,
+        url_fetch_method
 ):
     """Fetch an archive and make sure we can checksum it."""
     mock_archive.url
@@ -187,9 +196,10 @@ def is_true():
     monkeypatch.setattr(tty, 'msg_enabled', is_true)
 
     fetcher = fs.URLFetchStrategy(mock_archive.url)
-    with Stage(fetcher, path=testpath) as stage:
-        assert fetcher.archive_file is None
-        stage.fetch()
+    with spack.config.override('config:url_fetch_method', 'curl'):
+        with Stage(fetcher, path=testpath) as stage:
+            assert fetcher.archive_file is None
+            stage.fetch()
 
     status = capfd.readouterr()[1]
     assert '##### 100' in status
@@ -207,6 +217,72 @@ def test_url_extra_fetch(tmpdir, mock_archive):
         fetcher.fetch()
 
 
+def test_urllib_fetch_reuses_connections(tmpdir, mock_http_server):
+    for name in ('a.tar.gz', 'b.tar.gz'):
+        mock_http_server.root.join(name).write(name)
+
+    with spack.config.override('config:url_fetch_method', 'urllib'):
+        for name in ('a.tar.gz', 'b.tar.gz'):
+            fetcher = fs.URLFetchStrategy(
+                url='{0}/{1}'.format(mock_http_server.url, name))
+            with Stage(fetcher, path=str(tmpdir.join(name))):
+                fetcher.fetch()
+                with open(fetcher.archive_file) as f:
+                    assert f.read() == name
+
+    # No requests to check that the archives exist, and no new connection
+    assert [r[0] for r in mock_http_server.requests] == ['GET', 'GET']
+    host = mock_http_server.url[len('http://'):]
+    assert spack.util.web.connection_pool.stats[host]['connections'] == 1
+
+
+def test_urllib_fetch_resumes(tmpdir, mock_http_server):
+    content = os.urandom(100000)
+    mock_http_server.root.join('a.tar.gz').write_binary(content)
+    digest = hashlib.sha256(content).hexdigest()
+
+    fetcher = fs.URLFetchStrategy(
+        url=mock_http_server.url + '/a.tar.gz', sha256=digest)
+    with spack.config.override('config:url_fetch_method', 'urllib'):
+        with Stage(fetcher, path=str(tmpdir.join('stage'))) as stage:
+            mock_http_server.options['max_bytes'] = 10000
+            with pytest.raises(fs.FailedDownloadError):
+                fetcher.fetch()
+            assert os.path.getsize(stage.save_filename + '.part') == 30000
+
+            mock_http_server.options['max_bytes'] = None
+            fetcher.fetch()
+            fetcher.check()
+
+    assert mock_http_server.requests[-1][2]['Range'] == 'bytes=30000-99999'
+
+
+@pytest.mark.parametrize('connect_timeout,fetch_options,expected', [
+    (10, {}, 10),
+    (10, {'timeout': 60}, 60),
+    (0, {}, None),
+])
+def test_urllib_fetch_timeout(tmpdir, mock_http_server, monkeypatch,
+                              connect_timeout, fetch_options, expected):
+    """The urllib path waits as long as the curl path does."""
+    mock_http_server.root.join('a.tar.gz').write('a')
+    timeouts = []
+    urlopen = spack.util.web._urlopen
+
+    def _urlopen(req, *args, **kwargs):
+        timeouts.append(kwargs.get('timeout'))
+        return urlopen(req, *args, **kwargs)
+    monkeypatch.setattr(spack.util.web, '_urlopen', _urlopen)
+
+    fetcher = fs.URLFetchStrategy(
+        url=mock_http_server.url + '/a.tar.gz', fetch_options=fetch_options)
+    with spack.config.override('config:url_fetch_method', 'urllib'):
+        with spack.config.override('config:connect_timeout', connect_timeout):
+            with Stage(fetcher, path=str(tmpdir.join('stage'))):
+                fetcher.fetch()
+    assert timeouts == [expected]
+
+
 @pytest.mark.parametrize('url,urls,version,expected', [
     (None,
      ['https://ftpmirror.gnu.org/autoconf/autoconf-2.69.tar.gz',
@@ -247,8 +323,9 @@ def _which(*args, **kwargs):
     fetcher = fs.URLFetchStrategy(url=url)
     assert fetcher is not None
 
-    with pytest.raises(TypeError, match='object is not callable'):
-        with Stage(fetcher, path=testpath) as stage:
-            out = stage.fetch()
+    with spack.config.override('config:url_fetch_method', 'curl'):
+        with pytest.raises(TypeError, match='object is not callable'):
+            with Stage(fetcher, path=testpath) as stage:
+                out = stage.fetch()
 
-        assert err_fmt.format('curl') in out
+            assert err_fmt.format('curl') in out
@@ -0,0 +1,99 @@
+# Copyright 2013-2021 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+"""Test expansion of archives by spack.util.compression."""
+import io
+import os
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+from llnl.util.filesystem import working_dir
+
+import spack.util.compression as compression
+from spack.util.executable import which
+
+
+@pytest.fixture(params=[True, False])
+def tools_available(request, monkeypatch):
+    """Expand archives with and without tar and unzip."""
+    if not request.param:
+        def _which(name, **kwargs):
+            if name in ('tar', 'unzip'):
+                return None
+            return which(name, **kwargs)
+        monkeypatch.setattr(compression, 'which', _which)
+    return request.param
+
+
+def _add_file(tar, name, data, mode=0o644):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mode = mode
+    tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize('ext,mode', [
+    ('tar', 'w'), ('tar.gz', 'w:gz'), ('tar.bz2', 'w:bz2'),
+    ('tar.xz', 'w:xz')])
+def test_untar(tmpdir, tools_available, ext, mode):
+    archive_file = str(tmpdir.join('pkg-1.0.' + ext))
+    tar = tarfile.open(archive_file, mode)
+    _add_file(tar, 'pkg-1.0/README', b'readme')
+    _add_file(tar, 'pkg-1.0/configure', b'#!/bin/sh', mode=0o755)
+    tar.close()
+
+    with working_dir(str(tmpdir.ensure('expanded', dir=True))):
+        compression.decompressor_for(archive_file, ext)(archive_file)
+        with open('pkg-1.0/README') as f:
+            assert f.read() == 'readme'
+        assert os.stat('pkg-1.0/configure').st_mode & stat.S_IXUSR
+
+
+def test_unzip(tmpdir, tools_available):
+    archive_file = str(tmpdir.join('pkg-1.0.zip'))
+    archive = zipfile.ZipFile(archive_file, 'w')
+    info = zipfile.ZipInfo('pkg-1.0/configure')
+    info.external_attr = (stat.S_IFREG | 0o755) << 16
+    archive.writestr(info, '#!/bin/sh')
+    archive.close()
+
+    with working_dir(str(tmpdir.ensure('expanded', dir=True))):
+        compression.decompressor_for(archive_file, 'zip')(archive_file)
+        with open('pkg-1.0/configure') as f:
+            assert f.read() == '#!/bin/sh'
+        assert os.stat('pkg-1.0/configure').st_mode & stat.S_IXUSR
+
+
+def test_untar_skips_unsafe_members(tmpdir, monkeypatch):
+    monkeypatch.setattr(compression, 'which', lambda name, **kwargs: None)
+
+    archive_file = str(tmpdir.join('pkg-1.0.tar.gz'))
+    tar = tarfile.open(archive_file, 'w:gz')
+    _add_file(tar, '../outside', b'outside')
+    _add_file(tar, 'pkg-1.0/README', b'readme')
+    tar.close()
+
+    expanded = tmpdir.ensure('expanded', dir=True)
+    with working_dir(str(expanded)):
+        compression.decompressor_for(archive_file, 'tar.gz')(archive_file)
+    assert expanded.join('pkg-1.0', 'README').check(file=1)
+    assert not tmpdir.join('outside').check()
+
+
+@pytest.mark.skipif(not compression._find_decompressor('xz'),
+                    reason='requires xz 5.2 or later')
+def test_fastest_decompressor(tmpdir):
+    archive_file = str(tmpdir.join('pkg-1.0.tar.xz'))
+    tarfile.open(archive_file, 'w:xz').close()
+    command = compression.fastest_decompressor(archive_file)
+    assert os.path.basename(command[0]) == 'xz'
+    assert command[1:] == ['-dc', '-T0', archive_file]
+
+    archive_file = str(tmpdir.join('pkg-1.0.tar'))
+    tarfile.open(archive_file, 'w').close()
+    assert compression.fastest_decompressor(archive_file) is None
@@ -5,6 +5,9 @@
 
 import os
 
+from llnl.util.filesystem import touchp
+
+import spack.store
 from spack.spec import Spec
 from spack.directory_layout import YamlDirectoryLayout
 from spack.filesystem_view import YamlFilesystemView
@@ -41,3 +44,20 @@ def test_remove_extensions_ordered(install_mockery, mock_fetch, tmpdir):
 
     e1 = e2['extension1']
     view.remove_specs(e1, e2)
+
+
+def test_add_specs_links_every_file(install_mockery, mock_fetch, tmpdir):
+    spec = Spec('libelf').concretized()
+    spec.package.do_install(fake=True)
+    files = [os.path.join('share', str(i % 10), str(i)) for i in range(1000)]
+    for f in files:
+        touchp(os.path.join(spec.prefix, f))
+
+    view_dir = str(tmpdir.join('view'))
+    view = YamlFilesystemView(view_dir, spack.store.layout)
+    view.add_specs(spec)
+
+    for f in files:
+        link = os.path.join(view_dir, f)
+        assert os.readlink(link) == os.path.join(spec.prefix, f)
+    assert view._pool is None
@@ -2,7 +2,10 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import json
 import os
+import threading
+import time
 
 import ordereddict_backport
 import pytest
@@ -173,6 +176,186 @@ def test_get_header():
         spack.util.web.get_header(headers, 'ContentLength')
 
 
+def test_read_from_url_reuses_connections(mock_http_server, capfd):
+    mock_http_server.root.join('index.html').write('<a href="1.html">1</a>')
+    url = mock_http_server.url + '/index.html'
+
+    for _ in range(3):
+        _, _, response = spack.util.web.read_from_url(url, 'text/html')
+        assert response.read() == b'<a href="1.html">1</a>'
+
+    # A HEAD and a GET request for each read, all on the same connection
+    assert [r[0] for r in mock_http_server.requests] == ['HEAD', 'GET'] * 3
+    host = mock_http_server.url[len('http://'):]
+    stats = spack.util.web.connection_pool.stats[host]
+    assert stats['requests'] == 6
+    assert stats['connections'] == 1
+
+    current_debug_level = tty.debug_level()
+    tty.set_debug(1)
+    spack.util.web.connection_pool.log_stats()
+    tty.set_debug(current_debug_level)
+
+    err = capfd.readouterr()[1]
+    assert '{0}: 6 requests over 1 connections (5 reused)'.format(host) in err
+
+
+def test_connection_pool_checkouts_are_exclusive():
+    """A connection is never handed out again before the response to its
+    current request was read."""
+    class MockResponse(object):
+        length = 0
+
+        @staticmethod
+        def isclosed():
+            return True
+
+    class MockConnection(object):
+        sock = None
+
+    pool = spack.util.web.ConnectionPool()
+    lock = threading.Lock()
+    in_use = set()
+    shared = []
+
+    def worker():
+        for _ in range(20):
+            conn, _ = pool.get('key', 'example.com', MockConnection)
+            conn.sock = 'connected'
+            with lock:
+                if conn in in_use:
+                    shared.append(conn)
+                in_use.add(conn)
+            time.sleep(0.001)
+            with lock:
+                in_use.discard(conn)
+            conn._spack_response = MockResponse()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not shared
+    assert pool.stats['example.com']['requests'] == 160
+    assert pool.stats['example.com']['connections'] <= 8
+
+
+def test_download_resumes(mock_http_server, tmpdir, monkeypatch):
+    content = os.urandom(100000)
+    mock_http_server.root.join('file.tar.gz').write_binary(content)
+    url = mock_http_server.url + '/file.tar.gz'
+    path = str(tmpdir.join('file.tar.gz.part'))
+
+    # Each response is cut short, and there are only 3 attempts
+    mock_http_server.options['max_bytes'] = 30000
+    with pytest.raises(spack.util.web.SpackWebError):
+        spack.util.web.download(url, path)
+    assert os.path.getsize(path) == 90000
+    assert os.path.exists(path + '.json')
+
+    # The next download only gets the rest of the file
+    mock_http_server.options['max_bytes'] = None
+    headers = spack.util.web.download(url, path)
+    with open(path, 'rb') as f:
+        assert f.read() == content
+    assert not os.path.exists(path + '.json')
+    assert mock_http_server.requests[-1][2]['Range'] == 'bytes=90000-99999'
+    assert spack.util.web.get_header(headers, 'Content-type')
+
+
+def test_download_nothing_left(mock_http_server, tmpdir):
+    url = mock_http_server.url + '/file.tar.gz'
+    path = tmpdir.join('file.tar.gz.part')
+    path.write('data')
+
+    # The state of a download that had nothing left to fetch, as written
+    # before headers were saved
+    tmpdir.join('file.tar.gz.part.json').write(json.dumps(
+        {'url': url, 'validator': None, 'ranges': [[0, 4, 4]]}))
+    headers = spack.util.web.download(url, str(path))
+    assert not mock_http_server.requests
+    assert path.read() == 'data'
+    with pytest.raises(KeyError):
+        spack.util.web.get_header(headers, 'Content-type')
+
+
+def test_download_restarts_changed_file(mock_http_server, tmpdir):
+    mock_http_server.root.join('file.tar.gz').write_binary(b'a' * 1000)
+    url = mock_http_server.url + '/file.tar.gz'
+    path = str(tmpdir.join('file.tar.gz.part'))
+
+    mock_http_server.options['max_bytes'] = 100
+    with pytest.raises(spack.util.web.SpackWebError):
+        spack.util.web.download(url, path)
+
+    # The file changed on the server: it is downloaded again from scratch
+    mock_http_server.options['max_bytes'] = None
+    mock_http_server.root.join('file.tar.gz').write_binary(b'b' * 1000)
+    spack.util.web.download(url, path)
+    with open(path, 'rb') as f:
+        assert f.read() == b'b' * 1000
+
+
+@pytest.mark.parametrize('ranges,expected', [(True, 4), (False, 1)])
+def test_download_segments(
+        mock_http_server, tmpdir, monkeypatch, ranges, expected):
+    content = os.urandom(10000)
+    mock_http_server.root.join('file.tar.gz').write_binary(content)
+    mock_http_server.options['ranges'] = ranges
+    monkeypatch.setattr(spack.util.web, 'min_segment_size', 1000)
+
+    path = str(tmpdir.join('file.tar.gz.part'))
+    spack.util.web.download(
+        mock_http_server.url + '/file.tar.gz', path, segments=4)
+    with open(path, 'rb') as f:
+        assert f.read() == content
+
+    # A request for the first byte, then one request per segment
+    downloads = [r for r in mock_http_server.requests
+                 if r[2].get('Range') != 'bytes=0-0']
+    assert len(downloads) == expected
+
+
+def test_spider_web_cache(mock_http_server, tmpdir, mutable_config):
+    index = mock_http_server.root.join('index.html')
+    index.write('<a href="foo-1.0.tar.gz">foo</a>')
+    url = mock_http_server.url + '/index.html'
+
+    spack.config.set('config:misc_cache', str(tmpdir.join('cache')))
+    spack.config.set('config:web_cache', True)
+    spack.config.set('config:web_cache_ttl', 3600)
+
+    def spider():
+        del mock_http_server.requests[:]
+        pages, _ = spack.util.web.spider(url)
+        requests = [(r[0], r[2].get('If-None-Match') is not None)
+                    for r in mock_http_server.requests]
+        return pages.get(url), requests
+
+    # Fresh pages are read from the cache, stale pages are revalidated
+    page = '<a href="foo-1.0.tar.gz">foo</a>'
+    assert spider() == (page, [('HEAD', False), ('GET', False)])
+    assert spider() == (page, [])
+    spack.config.set('config:web_cache_ttl', 0)
+    assert spider() == (page, [('GET', True)])
+
+    # A changed page is downloaded again
+    index.write('<a href="foo-1.1.tar.gz">foo</a>')
+    page = '<a href="foo-1.1.tar.gz">foo</a>'
+    assert spider() == (page, [('GET', True)])
+    assert spider() == (page, [('GET', True)])
+
+    # In offline mode only the cache is read
+    spack.config.set('config:web_cache_offline', True)
+    index.remove()
+    assert spider() == (page, [])
+    assert spack.util.web.spider(mock_http_server.url + '/other.html') == (
+        {}, set())
+    assert not mock_http_server.requests
+
+
 def test_list_url(tmpdir):
     testpath = str(tmpdir)
 
@@ -2,10 +2,19 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import hashlib
+import json
 import sys
 import os
 
+import six
+
+import llnl.util.tty as tty
+
 import spack.config
+import spack.error
+import spack.repo
+import spack.store
 import spack.util.prefix as prefix
 import spack.util.environment as environment
 import spack.build_environment as build_env
@@ -13,6 +22,10 @@
 #: Environment variable name Spack uses to track individually loaded packages
 spack_loaded_hashes_var = 'SPACK_LOADED_HASHES'
 
+#: File in the metadata directory of a prefix recording the modifications
+#: its package and dependencies make to the run environment
+run_environment_file_name = 'run_environment.json'
+
 
 def prefix_inspections(platform):
     """Get list of prefix inspections for platform
@@ -65,33 +78,124 @@ def unconditional_environment_modifications(view):
     return env
 
 
+def _run_environment_path(spec):
+    return os.path.join(
+        spack.store.layout.metadata_path(spec), run_environment_file_name)
+
+
+def package_files_hash(spec):
+    """Hash of the current package files of spec and of its link and run
+    dependencies, which make the changes to its run environment.
+
+    The full hash of an installed spec is read from the database, so it
+    does not change when these files do.
+    """
+    sha = hashlib.sha1()
+    for s in spec.traverse(deptype=('link', 'run')):
+        repo = spack.repo.path.repo_for_pkg(s)
+        with open(repo.filename_for_package_name(s.name), 'rb') as f:
+            sha.update(s.name.encode('utf-8') + b'\0' + f.read())
+    return sha.hexdigest()
+
+
+def _compute_run_environment(spec):
+    # Let the extendee/dependency modify their extensions/dependents
+    # before asking for package-specific modifications
+    env = build_env.modifications_from_dependencies(spec, context='run')
+
+    # Package specific modifications
+    build_env.set_module_variables_for_package(spec.package)
+    spec.package.setup_run_environment(env)
+    return env
+
+
+def write_run_environment(spec):
+    """Record the run environment modifications of an installed spec.
+
+    The modifications are stored in the metadata directory of the prefix,
+    together with the full hash of the spec and a hash of the package
+    files that made them.
+    """
+    env = _compute_run_environment(spec)
+    with open(_run_environment_path(spec), 'w') as f:
+        json.dump({'full_hash': spec.full_hash(),
+                   'package_files': package_files_hash(spec),
+                   'environment': env.to_dict()}, f)
+
+
+def read_run_environment(spec):
+    """Run environment modifications recorded when spec was installed,
+    or None if there are none for the current hash of the spec and its
+    current package files.
+    """
+    if spec.external:
+        return None
+
+    try:
+        with open(_run_environment_path(spec)) as f:
+            data = json.load(f)
+        if data['full_hash'] != spec.full_hash() or \
+                data['package_files'] != package_files_hash(spec):
+            return None
+        return environment.EnvironmentModifications.from_dict(
+            data['environment'])
+    except (IOError, OSError, ValueError, KeyError, TypeError,
+            spack.error.SpackError) as e:
+        tty.debug('Cannot read the run environment of {0}: {1}'.format(
+            spec.cshort_spec, str(e)))
+        return None
+
+
+def run_environment_modifications(spec, projection=None):
+    """Modifications the package of spec and its dependencies make to the
+    run environment, not including the ones from prefix inspections.
+
+    These are replayed from the record written at install time if it is
+    up to date, so that package files need not be imported. Otherwise,
+    they are computed by the packages.
+
+    Args:
+        spec (Spec): concrete spec
+        projection (str): prefix of the spec in a view, if the
+            modifications are needed for the view instead of its prefix
+    """
+    env = read_run_environment(spec)
+    if env is None:
+        spec = spec.copy()
+        if projection:
+            spec.prefix = prefix.Prefix(projection)
+        return _compute_run_environment(spec)
+
+    # Point the modifications referring to the prefix to the view instead
+    if projection and projection != spec.prefix:
+        def relocate(value):
+            return value.replace(spec.prefix, projection)
+
+        for item in env:
+            value = getattr(item, 'value', None)
+            if isinstance(value, six.string_types):
+                item.update_args(value=relocate(value))
+            elif isinstance(value, list):
+                item.update_args(value=[relocate(x) for x in value])
+    return env
+
+
 def environment_modifications_for_spec(spec, view=None):
     """List of environment (shell) modifications to be processed for spec.
 
     This list is specific to the location of the spec or its projection in
     the view."""
-    spec = spec.copy()
+    projection = None
     if view and not spec.external:
-        spec.prefix = prefix.Prefix(view.get_projection_for_spec(spec))
+        projection = view.get_projection_for_spec(spec)
 
     # generic environment modifications determined by inspecting the spec
     # prefix
     env = environment.inspect_path(
-        spec.prefix,
+        projection or spec.prefix,
         prefix_inspections(spec.platform),
         exclude=environment.is_system_path
     )
 
-    # Let the extendee/dependency modify their extensions/dependents
-    # before asking for package-specific modifications
-    env.extend(
-        build_env.modifications_from_dependencies(
-            spec, context='run'
-        )
-    )
-
-    # Package specific modifications
-    build_env.set_module_variables_for_package(spec.package)
-    spec.package.setup_run_environment(env)
-
+    env.extend(run_environment_modifications(spec, projection))
     return env
@@ -5,8 +5,15 @@
 
 import re
 import os
+import shutil
+import subprocess
+import tarfile
 from itertools import product
-from spack.util.executable import which
+
+import llnl.util.tty as tty
+from llnl.util.lang import memoized
+
+from spack.util.executable import which, ProcessError
 
 # Supported archive extensions.
 PRE_EXTS   = ["tar", "TAR"]
@@ -35,14 +42,135 @@ def _gunzip(archive_file):
     destination_abspath = os.path.join(working_dir, decompressed_file)
     with gzip.open(archive_file, "rb") as f_in:
         with open(destination_abspath, "wb") as f_out:
-            f_out.write(f_in.read())
+            shutil.copyfileobj(f_in, f_out, 1 << 20)
+
+
+def _unzip(archive_file):
+    """Like unzip, but in-process. Used where unzip is not available.
+
+    Args:
+        archive_file (str): absolute path of the archive to be expanded
+    """
+    import zipfile
+    archive = zipfile.ZipFile(archive_file)
+    try:
+        for info in archive.infolist():
+            path = archive.extract(info)
+            # zipfile does not restore permissions, e.g. of scripts
+            mode = (info.external_attr >> 16) & 0o777
+            if mode and not info.filename.endswith('/'):
+                os.chmod(path, mode)
+    finally:
+        archive.close()
+
+
+#: Magic numbers of compressed files, and programs decompressing them to
+#: stdout with multiple threads, fastest first
+_parallel_decompressors = [
+    (b'\x1f\x8b', [['pigz', '-dc']]),
+    (b'BZh', [['lbzip2', '-dc'], ['pbzip2', '-dc']]),
+    (b'\xfd7zXZ\x00', [['xz', '-dc', '-T0']]),
+    (b'\x28\xb5\x2f\xfd', [['zstd', '-dcq', '-T0']]),
+]
+
+
+@memoized
+def _find_decompressor(name):
+    exe = which(name)
+    if exe and name == 'xz':
+        # Only xz 5.2 and later have the -T option
+        version = exe('--version', output=str, error=os.devnull,
+                      fail_on_error=False)
+        match = re.search(r'(\d+)\.(\d+)', version)
+        if not match or tuple(int(x) for x in match.groups()) < (5, 2):
+            return None
+    return exe
+
+
+def fastest_decompressor(archive_file):
+    """Multi-threaded program that can decompress an archive to stdout.
+
+    Args:
+        archive_file (str): path of a compressed archive
+
+    Returns:
+        (list or None): command line decompressing the archive, or None if
+            no such program is available
+    """
+    with open(archive_file, 'rb') as f:
+        magic = f.read(6)
+    for prefix, commands in _parallel_decompressors:
+        if magic.startswith(prefix):
+            for command in commands:
+                exe = _find_decompressor(command[0])
+                if exe:
+                    return [exe.path] + command[1:] + [archive_file]
+    return None
+
+
+def _extract_stream(stream):
+    """Extract a tar stream in the current working directory in-process,
+    skipping members that would be written outside of it."""
+    archive = tarfile.open(fileobj=stream, mode='r|*')
+    try:
+        for member in archive:
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.split(os.sep)[0] == '..':
+                tty.warn('Skipping unsafe archive member: ' + member.name)
+                continue
+            archive.extract(member)
+    finally:
+        archive.close()
+
+
+def _untar(archive_file):
+    """Like ``tar -oxf``, but decompresses the archive with the fastest
+    available program.
+
+    A multi-threaded decompressor, if there is one for the archive, runs
+    in its own process and streams the tarball to tar, so decompression
+    and extraction happen at the same time and the uncompressed tarball is
+    never written to disk. Archives are extracted in-process where tar is
+    not available.
+
+    Args:
+        archive_file (str): absolute path of the archive to be expanded
+    """
+    tar = which('tar')
+    command = fastest_decompressor(archive_file)
+    if not command:
+        if tar:
+            tar('-oxf', archive_file)
+        else:
+            tty.debug('Expanding {0} in-process'.format(archive_file))
+            with open(archive_file, 'rb') as f:
+                _extract_stream(f)
+        return
+
+    tty.debug('Decompressing {0} with {1}'.format(
+        archive_file, os.path.basename(command[0])))
+    decompressor = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        if tar:
+            tar('-oxf', '-', input=decompressor.stdout)
+        else:
+            _extract_stream(decompressor.stdout)
+    finally:
+        decompressor.stdout.close()
+        returncode = decompressor.wait()
+    if returncode != 0:
+        raise ProcessError(
+            'Command exited with status {0}:'.format(returncode),
+            ' '.join(command))
 
 
 def decompressor_for(path, extension=None):
     """Get the appropriate decompressor for a path."""
     if ((extension and re.match(r'\.?zip$', extension)) or
             path.endswith('.zip')):
-        unzip = which('unzip', required=True)
+        unzip = which('unzip')
+        if not unzip:
+            return _unzip
         unzip.add_default_arg('-q')
         return unzip
     if extension and re.match(r'gz', extension):
@@ -50,9 +178,7 @@ def decompressor_for(path, extension=None):
     if extension and re.match(r'bz2', extension):
         bunzip2 = which('bunzip2', required=True)
         return bunzip2
-    tar = which('tar', required=True)
-    tar.add_default_arg('-oxf')
-    return tar
+    return _untar
 
 
 def strip_extension(path):
@@ -334,6 +334,20 @@ def execute(self, env):
         env[self.name] = self.separator.join(directories)
 
 
+#: Types of environment modifications, by name
+modifier_types = dict((cls.__name__, cls) for cls in (
+    SetEnv, AppendFlagsEnv, UnsetEnv, RemoveFlagsEnv, SetPath, AppendPath,
+    PrependPath, RemovePath, DeprioritizeSystemPaths, PruneDuplicatePaths))
+
+
+def _serializable(value):
+    if isinstance(value, (list, tuple)):
+        return [str(x) for x in value]
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    return str(value)
+
+
 class EnvironmentModifications(object):
     """Keeps track of requests to modify the current environment.
 
@@ -501,6 +515,29 @@ def prune_duplicate_paths(self, name, **kwargs):
         item = PruneDuplicatePaths(name, **kwargs)
         self.env_modifications.append(item)
 
+    def to_dict(self):
+        """Returns a representation of the modifications that can be
+        serialized to JSON or YAML.
+        """
+        return {'modifications': [
+            {'type': type(x).__name__,
+             'args': dict((k, _serializable(v)) for k, v in x.args.items())}
+            for x in self]}
+
+    @staticmethod
+    def from_dict(data):
+        """Constructs modifications from the output of ``to_dict()``.
+
+        Args:
+            data (dict): serialized environment modifications
+        """
+        env = EnvironmentModifications()
+        for item in data['modifications']:
+            cls = modifier_types[item['type']]
+            args = dict((str(k), v) for k, v in item['args'].items())
+            env.env_modifications.append(cls(**args))
+        return env
+
     def group_by_name(self):
         """Returns a dict of the modifications grouped by variable name.
 
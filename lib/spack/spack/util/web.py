@@ -5,20 +5,29 @@
 
 from __future__ import print_function
 
+import atexit
 import codecs
 import errno
+import hashlib
+import json
 import multiprocessing.pool
 import os
 import os.path
 import re
 import shutil
+import socket
 import ssl
 import sys
+import threading
+import time
 import traceback
 
 import six
-from six.moves.urllib.error import URLError
-from six.moves.urllib.request import urlopen, Request
+from six.moves import http_client
+from six.moves.urllib.error import HTTPError, URLError
+from six.moves.urllib.request import (
+    build_opener, HTTPHandler, HTTPSHandler, Request)
+from six.moves.urllib.response import addinfourl
 
 from llnl.util.filesystem import mkdirp
 import llnl.util.tty as tty
@@ -86,26 +95,47 @@ def uses_ssl(parsed_url):
     ))(sys.version_info)
 
 
-def read_from_url(url, accept_content_type=None):
-    url = url_util.parse(url)
-    context = None
+#: SSL contexts, by whether they verify certificates. Contexts are reused
+#: so that connections made with them can be pooled.
+_ssl_contexts = {}
+
+
+def _ssl_context(verify_ssl):
+    if verify_ssl not in _ssl_contexts:
+        if verify_ssl:
+            _ssl_contexts[verify_ssl] = ssl.create_default_context()  # novm
+        else:
+            _ssl_contexts[verify_ssl] = ssl._create_unverified_context()
+    return _ssl_contexts[verify_ssl]
+
 
+def _context_for(url):
+    """SSL context to use for a parsed URL, according to config."""
     verify_ssl = spack.config.get('config:verify_ssl')
 
     # Don't even bother with a context unless the URL scheme is one that uses
     # SSL certs.
-    if uses_ssl(url):
-        if verify_ssl:
-            if __UNABLE_TO_VERIFY_SSL:
-                # User wants SSL verification, but it cannot be provided.
-                warn_no_ssl_cert_checking()
-            else:
-                # User wants SSL verification, and it *can* be provided.
-                context = ssl.create_default_context()  # novm
-        else:
-            # User has explicitly indicated that they do not want SSL
-            # verification.
-            context = ssl._create_unverified_context()
+    if not uses_ssl(url):
+        return None
+
+    if not verify_ssl:
+        # User has explicitly indicated that they do not want SSL
+        # verification.
+        return _ssl_context(False)
+
+    if __UNABLE_TO_VERIFY_SSL:
+        # User wants SSL verification, but it cannot be provided.
+        warn_no_ssl_cert_checking()
+        return None
+
+    # User wants SSL verification, and it *can* be provided.
+    return _ssl_context(True)
+
+
+def read_from_url(url, accept_content_type=None, timeout=None):
+    timeout = timeout or _timeout
+    url = url_util.parse(url)
+    context = _context_for(url)
 
     req = Request(url_util.format(url))
     content_type = None
@@ -117,7 +147,7 @@ def read_from_url(url, accept_content_type=None):
         # one round-trip.  However, most servers seem to ignore the header
         # if you ask for a tarball with Accept: text/html.
         req.get_method = lambda: "HEAD"
-        resp = _urlopen(req, timeout=_timeout, context=context)
+        resp = _urlopen(req, timeout=timeout, context=context)
 
         content_type = get_header(resp.headers, 'Content-type')
 
@@ -125,7 +155,7 @@ def read_from_url(url, accept_content_type=None):
     req.get_method = lambda: "GET"
 
     try:
-        response = _urlopen(req, timeout=_timeout, context=context)
+        response = _urlopen(req, timeout=timeout, context=context)
     except URLError as err:
         raise SpackWebError('Download failed: {ERROR}'.format(
             ERROR=str(err)))
@@ -149,6 +179,265 @@ def read_from_url(url, accept_content_type=None):
     return response.geturl(), response.headers, response
 
 
+#: minimum size in bytes of each range of a segmented download
+min_segment_size = 16 * 1024 * 1024
+
+#: number of times an interrupted download is continued before giving up
+download_attempts = 3
+
+
+def _open_range(url, start, end, validator, timeout=_timeout):
+    """Requests bytes ``start`` to ``end`` (excluded, or up to the end of
+    the file if None) of a URL. The whole file is requested when the range
+    is the whole file."""
+    url = url_util.parse(url)
+    req = Request(url_util.format(url))
+    if start > 0 or end is not None:
+        req.add_header('Range', 'bytes={0}-{1}'.format(
+            start, '' if end is None else end - 1))
+        if validator:
+            # Get the whole file instead if it changed
+            req.add_header('If-Range', validator)
+    return _urlopen(req, timeout=timeout, context=_context_for(url))
+
+
+def _validator(headers):
+    """Returns a value identifying the version of a file on a server,
+    suitable for an ``If-Range`` header, if there is one."""
+    for name in ('ETag', 'Last-Modified'):
+        try:
+            value = get_header(headers, name)
+        except KeyError:
+            continue
+        # Weak ETags are not allowed in If-Range
+        if value and not value.startswith('W/'):
+            return value
+    return None
+
+
+def _content_size(headers, partial):
+    """Returns the size of a whole file from the headers of a response
+    with all of it, or part of it, if known."""
+    try:
+        if partial:
+            content_range = get_header(headers, 'Content-Range')
+            return int(content_range.rsplit('/', 1)[1])
+        return int(get_header(headers, 'Content-Length'))
+    except (KeyError, ValueError, IndexError, TypeError, AttributeError):
+        # Missing or malformed headers
+        return None
+
+
+class _Download(object):
+    """State of a download to a local file, which is saved next to the
+    file when the download is interrupted."""
+
+    def __init__(self, url, path, timeout=_timeout):
+        self.url = url
+        self.path = path
+        self.timeout = timeout
+        self.state_path = path + '.json'
+        self.validator = None
+        self.headers = None
+        # Each range is a list of the first byte, the byte after the last
+        # one (or None for the end of the file) and the next byte to get
+        self.ranges = [[0, None, 0]]
+
+    def resume(self):
+        """Reads the state of a previous download of the same URL, or
+        removes data left by a download of a different URL."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state['url'] == self.url and os.path.exists(self.path):
+                self.validator = state['validator']
+                self.ranges = state['ranges']
+                self.headers = state.get('headers')
+                return True
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        self.clear()
+        return False
+
+    def save(self):
+        headers = None
+        if self.headers is not None:
+            headers = dict(self.headers.items())
+        with open(self.state_path, 'w') as f:
+            json.dump({'url': self.url, 'validator': self.validator,
+                       'ranges': self.ranges, 'headers': headers}, f)
+
+    def clear(self):
+        for path in (self.path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.validator = None
+        self.headers = None
+        self.ranges = [[0, None, 0]]
+
+    @property
+    def remaining(self):
+        return [r for r in self.ranges if r[1] is None or r[2] < r[1]]
+
+    @property
+    def done(self):
+        return sum(r[2] - r[0] for r in self.ranges)
+
+    def split(self, segments):
+        """Splits a new download in ranges fetched concurrently, if the
+        server supports it and the file is large enough."""
+        try:
+            response = _open_range(self.url, 0, 1, None, self.timeout)
+            if response.getcode() != 206:
+                # Do not download the whole file just to find this out
+                response.close()
+                return
+            response.read()
+        except (URLError, socket.error, http_client.HTTPException):
+            return
+        size = _content_size(response.headers, True)
+        if size is None:
+            return
+
+        segments = min(segments, size // min_segment_size)
+        if segments < 2:
+            return
+        self.validator = _validator(response.headers)
+        bounds = [size * i // segments for i in range(segments + 1)]
+        self.ranges = [[bounds[i], bounds[i + 1], bounds[i]]
+                       for i in range(segments)]
+        # Ranges are written concurrently to the same file
+        open(self.path, 'wb').close()
+
+    def fetch_range(self, rng):
+        """Fetches the rest of a range, recording its progress."""
+        response = _open_range(
+            self.url, rng[2], rng[1], self.validator, self.timeout)
+        if self.headers is None:
+            self.headers = response.headers
+
+        partial = response.getcode() == 206
+        if not partial and rng[2] > 0:
+            # The server sent the whole file, e.g. because it changed
+            if len(self.ranges) > 1:
+                raise _RestartDownload()
+            rng[2] = 0
+        if len(self.ranges) == 1:
+            if rng[2] == 0:
+                self.validator = _validator(response.headers)
+            # Know where the file ends, to detect truncated responses
+            rng[1] = _content_size(response.headers, partial)
+
+        mode = 'r+b' if os.path.exists(self.path) else 'wb'
+        with open(self.path, mode) as f:
+            f.seek(rng[2])
+            if len(self.ranges) == 1:
+                f.truncate()
+            while rng[1] is None or rng[2] < rng[1]:
+                size = 1024 * 1024
+                if rng[1] is not None:
+                    size = min(size, rng[1] - rng[2])
+                chunk = response.read(size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                rng[2] += len(chunk)
+
+        if rng[1] is None:
+            # The whole file was read
+            rng[1] = rng[2]
+        elif rng[2] < rng[1]:
+            raise http_client.IncompleteRead(b'', rng[1] - rng[2])
+
+
+class _RestartDownload(Exception):
+    """Raised when a partial download must be discarded."""
+
+
+def download(url, path, segments=1, timeout=_timeout):
+    """Downloads a URL to a local file, continuing an earlier download.
+
+    Data is written to ``path`` as it is received. If the download is
+    interrupted, the data received so far is kept, along with a small
+    ``<path>.json`` file describing it, and the next download of the same
+    URL requests only the missing data with HTTP ``Range`` requests. Files
+    that changed on the server since then (according to their ``ETag`` or
+    ``Last-Modified`` header), and servers that do not support ranges,
+    send the whole file again. Callers should verify the checksum of the
+    downloaded file.
+
+    Args:
+        url (str): URL to download
+        path (str): local file to download to
+        segments (int): number of ranges of large files to download
+            concurrently, if the server supports ranges
+        timeout (float or None): seconds to wait for the server to connect
+            or send data, or None to wait forever
+
+    Returns:
+        The headers of the first response, which are saved along with
+        interrupted downloads, or an empty dict if they are unknown
+
+    Raises:
+        SpackWebError: if the download failed
+    """
+    state = _Download(url, path, timeout)
+    if state.resume():
+        tty.debug('Resuming download of {0} after {1} bytes'.format(
+            url, state.done))
+    elif segments > 1:
+        state.split(segments)
+
+    attempts = download_attempts
+    while True:
+        remaining = state.remaining
+        try:
+            if len(remaining) > 1:
+                tp = multiprocessing.pool.ThreadPool(len(remaining))
+                try:
+                    tp.map(state.fetch_range, remaining)
+                finally:
+                    tp.terminate()
+                    tp.join()
+            elif remaining:
+                state.fetch_range(remaining[0])
+            break
+        except _RestartDownload:
+            # The file changed on the server since the download started
+            error = 'file changed during the download'
+            state.clear()
+        except HTTPError as e:
+            error = e
+            if e.code == 416:
+                # The partial download is larger than the file
+                state.clear()
+            elif e.code < 500:
+                state.clear()
+                raise SpackWebError('Download failed: {0}'.format(e))
+            else:
+                state.save()
+        except (URLError, socket.error, http_client.HTTPException) as e:
+            error = e
+            state.save()
+        except BaseException:
+            # Keep the data received so far, e.g. on keyboard interrupts
+            state.save()
+            raise
+
+        attempts -= 1
+        if attempts <= 0:
+            raise SpackWebError('Download failed: {0}'.format(error))
+        tty.debug('Download of {0} interrupted after {1} bytes ({2}), '
+                  'resuming'.format(url, state.done, error))
+
+    if os.path.exists(state.state_path):
+        os.remove(state.state_path)
+    if not os.path.exists(path):
+        # The file is empty
+        open(path, 'wb').close()
+    return state.headers if state.headers is not None else {}
+
+
 def warn_no_ssl_cert_checking():
     tty.warn("Spack will not check SSL certificates. You need to update "
              "your Python to enable certificate verification.")
@@ -360,6 +649,114 @@ def list_url(url, recursive=False):
             for key in _iter_s3_prefix(s3, url)))
 
 
+def _page_cache_path(url):
+    """Path of the web cache entry of a URL, in the misc cache."""
+    import spack.caches
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(
+        spack.caches.misc_cache_location(), 'web', digest + '.json')
+
+
+def _read_cached_page(url):
+    try:
+        with open(_page_cache_path(url)) as f:
+            entry = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    return entry if entry.get('url') == url else None
+
+
+def _write_cached_page(entry):
+    # Write and rename, so that concurrent readers never see partial
+    # entries; the last writer wins.
+    path = _page_cache_path(entry['url'])
+    tmp = '{0}.{1}.{2}.tmp'.format(
+        path, os.getpid(), threading.current_thread().ident)
+    try:
+        mkdirp(os.path.dirname(path))
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.rename(tmp, path)
+    except (IOError, OSError) as e:
+        tty.debug('Cannot cache {0}: {1}'.format(entry['url'], str(e)))
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_page(url):
+    """Reads the text of an HTML page, from the web cache if possible.
+
+    When ``config:web_cache`` is enabled, HTTP(S) pages are stored in the
+    misc cache along with their ETag and Last-Modified headers. Entries
+    younger than ``config:web_cache_ttl`` seconds are used as they are,
+    older ones are revalidated with a conditional request. When
+    ``config:web_cache_offline`` is set, pages are only read from the cache.
+
+    Returns:
+        (tuple): URL of the page after redirects and its text, or
+            (None, None) if the URL is not an HTML page
+
+    Raises:
+        NoNetworkConnectionError: if the page is not cached in offline mode
+    """
+    parsed = url_util.parse(url)
+    url = url_util.format(parsed)
+    if parsed.scheme not in ('http', 'https') or \
+            not spack.config.get('config:web_cache', False):
+        response_url, _, response = read_from_url(url, 'text/html')
+        if not response:
+            return None, None
+        return response_url, codecs.getreader('utf-8')(response).read()
+
+    entry = _read_cached_page(url)
+    if spack.config.get('config:web_cache_offline', False):
+        if not entry:
+            raise NoNetworkConnectionError('not in the web cache', url)
+        return entry['response_url'], entry['page']
+
+    now = time.time()
+    ttl = spack.config.get('config:web_cache_ttl', 0)
+    if entry and now - entry['time'] < ttl:
+        tty.debug('Using cached page {0}'.format(url))
+        return entry['response_url'], entry['page']
+
+    if entry and entry['page'] is not None and \
+            (entry['etag'] or entry['last_modified']):
+        req = Request(url)
+        if entry['etag']:
+            req.add_header('If-None-Match', entry['etag'])
+        if entry['last_modified']:
+            req.add_header('If-Modified-Since', entry['last_modified'])
+        try:
+            response = _urlopen(
+                req, timeout=_timeout, context=_context_for(parsed))
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            tty.debug('Cached page {0} is up to date'.format(url))
+            entry['time'] = now
+            _write_cached_page(entry)
+            return entry['response_url'], entry['page']
+        response_url, headers = response.geturl(), response.headers
+    else:
+        # Pages that are not HTML are cached too, to skip them without
+        # a request until they expire
+        response_url, headers, response = read_from_url(url, 'text/html')
+
+    page = None
+    if response:
+        page = codecs.getreader('utf-8')(response).read()
+    _write_cached_page({
+        'url': url,
+        'response_url': response_url,
+        'page': page,
+        'etag': headers.get('ETag') if headers else None,
+        'last_modified': headers.get('Last-Modified') if headers else None,
+        'time': now,
+    })
+    return response_url, page
+
+
 def spider(root_urls, depth=0, concurrency=32):
     """Get web pages from root URLs.
 
@@ -401,11 +798,10 @@ def _spider(url, collect_nested):
         subcalls = []
 
         try:
-            response_url, _, response = read_from_url(url, 'text/html')
-            if not response_url or not response:
+            response_url, page = _read_page(url)
+            if not response_url or page is None:
                 return pages, links, subcalls
 
-            page = codecs.getreader('utf-8')(response).read()
             pages[response_url] = page
 
             # Parse out the links in the page
@@ -500,25 +896,206 @@ def _spider(url, collect_nested):
     return pages, links
 
 
+class _PendingResponse(object):
+    """Response of connections whose request was not answered yet."""
+
+    @staticmethod
+    def isclosed():
+        return False
+
+
+_pending_response = _PendingResponse()
+
+
+class ConnectionPool(object):
+    """Persistent HTTP(S) connections, reused across requests to a host.
+
+    Connections are kept open for as long as servers allow it, so that
+    repeated requests to the same host skip the TCP and TLS handshakes. A
+    connection is reused only once the response to its previous request
+    was read completely. The pool is safe to use from multiple threads,
+    and is emptied in processes forked from the one that filled it.
+    """
+
+    #: maximum number of connections kept for each host
+    max_connections = 32
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self.stats = {}
+
+    def get(self, key, host, factory):
+        """Returns an idle connection for ``key``, or a new one made by
+        ``factory``, and whether it was reused.
+
+        The connection is busy until the caller stores the response to its
+        request in ``_spack_response`` and that response is read, so it is
+        never handed out to two threads at the same time.
+        """
+        if os.getpid() != self._pid:
+            # Sockets are shared with the parent process: never use them
+            self._reset()
+
+        with self._lock:
+            connections = self._connections.setdefault(key, [])
+            conn = next((c for c in connections if self._idle(c)), None)
+            if conn is None:
+                conn = factory()
+                connections.append(conn)
+                if len(connections) > self.max_connections:
+                    # Forget the oldest connection with an unread response
+                    busy = next(c for c in connections if not self._idle(c))
+                    connections.remove(busy)
+
+            stats = self.stats.setdefault(host, {
+                'requests': 0, 'connections': 0,
+                'tls': isinstance(conn, http_client.HTTPSConnection)})
+            stats['requests'] += 1
+            reused = conn.sock is not None
+            if not reused:
+                stats['connections'] += 1
+            conn._spack_response = _pending_response
+            return conn, reused
+
+    def discard(self, key, conn):
+        """Closes a connection and removes it from the pool."""
+        conn.close()
+        with self._lock:
+            connections = self._connections.get(key, [])
+            if conn in connections:
+                connections.remove(conn)
+
+    @staticmethod
+    def _idle(conn):
+        response = getattr(conn, '_spack_response', None)
+        # Responses closed before being read completely leave data on the
+        # connection, which is then never reused
+        return response is None or (
+            response.isclosed() and not getattr(response, 'length', None))
+
+    def log_stats(self):
+        """Prints in debug output how often connections were reused."""
+        for host, stats in sorted(self.stats.items()):
+            msg = '{0}: {1} requests over {2} connections ({3} reused'.format(
+                host, stats['requests'], stats['connections'],
+                stats['requests'] - stats['connections'])
+            if stats['tls']:
+                msg += ', {0} TLS handshakes'.format(stats['connections'])
+            tty.debug('HTTP CONNECTIONS: ' + msg + ')')
+
+
+#: Pool of the connections opened by ``read_from_url``
+connection_pool = ConnectionPool()
+atexit.register(lambda: connection_pool.log_stats())
+
+
+class KeepAliveMixin(object):
+    """Opens HTTP(S) requests on connections of the ``connection_pool``,
+    instead of a new connection for each request."""
+
+    def _open_pooled(self, http_class, req, **http_conn_args):
+        if getattr(req, '_tunnel_host', None):
+            # Requests through a proxy tunnel are not pooled
+            return self.do_open(http_class, req, **http_conn_args)
+
+        host = req.host if hasattr(req, 'selector') else req.get_host()
+        selector = req.selector if hasattr(req, 'selector') \
+            else req.get_selector()
+        if not host:
+            raise URLError('no host given')
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict(
+            (k, v) for k, v in req.headers.items() if k not in headers))
+        headers = dict((k.title(), v) for k, v in headers.items())
+
+        # Connections with different SSL settings are never shared
+        key = (http_class.__name__, host, id(http_conn_args.get('context')))
+
+        def factory():
+            return http_class(host, timeout=req.timeout, **http_conn_args)
+
+        while True:
+            conn, reused = connection_pool.get(key, host, factory)
+            conn.timeout = req.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(req.timeout)
+            try:
+                conn.request(req.get_method(), selector, req.data, headers)
+                response = conn.getresponse()
+                break
+            except (socket.error, http_client.HTTPException) as e:
+                connection_pool.discard(key, conn)
+                # Servers close idle connections at any time: in that case,
+                # retry on a new connection.
+                if not reused:
+                    raise URLError(e)
+
+        # Responses without a body, e.g. to HEAD requests, are complete
+        if req.get_method() == 'HEAD' or response.length == 0:
+            response.read()
+
+        conn._spack_response = response
+        if sys.version_info >= (3, 0):
+            response.url = req.get_full_url()
+            response.msg = response.reason
+            return response
+
+        # Python 2 expects a file-like object with extra attributes
+        response.recv = response.read
+        fp = socket._fileobject(response, close=True)
+        resp = addinfourl(fp, response.msg, req.get_full_url())
+        resp.code = response.status
+        resp.msg = response.reason
+        return resp
+
+
+class KeepAliveHTTPHandler(KeepAliveMixin, HTTPHandler):
+    def http_open(self, req):
+        return self._open_pooled(http_client.HTTPConnection, req)
+
+
+class KeepAliveHTTPSHandler(KeepAliveMixin, HTTPSHandler):
+    def https_open(self, req):
+        kwargs = {}
+        if getattr(self, '_context', None) is not None:
+            kwargs['context'] = self._context
+        return self._open_pooled(http_client.HTTPSConnection, req, **kwargs)
+
+
+#: URL openers, by SSL context
+_openers = {}
+
+
 def _urlopen(req, *args, **kwargs):
-    """Wrapper for compatibility with old versions of Python."""
+    """Open a request, reusing connections from the ``connection_pool``."""
     url = req
     try:
         url = url.get_full_url()
     except AttributeError:
         pass
 
-    # We don't pass 'context' parameter because it was only introduced starting
-    # with versions 2.7.9 and 3.4.3 of Python.
-    if 'context' in kwargs:
-        del kwargs['context']
+    # The 'context' parameter was only introduced starting with versions
+    # 2.7.9 and 3.4.3 of Python, and is None in older versions.
+    context = kwargs.pop('context', None)
 
-    opener = urlopen
     if url_util.parse(url).scheme == 's3':
         import spack.s3_handler
-        opener = spack.s3_handler.open
+        return spack.s3_handler.open(req, *args, **kwargs)
+
+    if context not in _openers:
+        https_handler = KeepAliveHTTPSHandler()
+        if context is not None:
+            https_handler = KeepAliveHTTPSHandler(context=context)
+        _openers[context] = build_opener(
+            KeepAliveHTTPHandler(), https_handler)
 
-    return opener(req, *args, **kwargs)
+    return _openers[context].open(req, *args, **kwargs)
 
 
 def find_versions_of_archive(
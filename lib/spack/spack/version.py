@@ -30,6 +30,8 @@
 from functools import wraps
 from six import string_types
 
+from llnl.util.lang import memoized
+
 import spack.error
 from spack.util.spack_yaml import syaml_dict
 
@@ -719,7 +721,7 @@ def from_dict(dictionary):
         if 'versions' in dictionary:
             return VersionList(dictionary['versions'])
         elif 'version' in dictionary:
-            return VersionList([dictionary['version']])
+            return VersionList([_shared_version(dictionary['version'])])
         else:
             raise ValueError("Dict must have 'version' or 'versions' in it.")
 
@@ -864,6 +866,13 @@ def _string_to_version(string):
         return Version(string)
 
 
+@memoized
+def _shared_version(string):
+    """Versions are immutable, so the ones read from dictionaries (e.g. for
+    every spec in a database) are shared instead of parsed again."""
+    return Version(string)
+
+
 def ver(obj):
     """Parses a Version, VersionRange, or VersionList from a string
        or list of strings.